@@ -1,34 +1,32 @@
 from flask import Flask, render_template, request, redirect, url_for, g, flash, jsonify
-from config import SystemConfig, SocialConfig
+from jinja2 import pass_context
+from markupsafe import Markup
+from config import SystemConfig, SocialConfig, env_flag
 from threading import Thread
 from helpers import send_email_admin
+import assets
+import cache
+import strapi_client
 from strapi_client import get_shop_products, get_gallery_images, get_homepage_content
+import cms_journal
+import gallery as gallery_module
+import json_codec
+import mapped_catalog
+import metrics
+import profiling
+import related
+import server_timing
+import snapshots
+import warmup
+from snapshot_cache import SnapshotCache
+import hashlib
+import hmac
 import json
 import os
-import random
-from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
-import requests
 
 app = Flask(__name__)
-
-def safe_fetch(url, headers=None):
-    try:
-        res = requests.get(url, headers=headers, timeout=5)
-
-        if res.status_code != 200:
-            print("API ERROR:", res.text)
-            return None
-
-        return res.json()
-
-    except requests.exceptions.Timeout:
-        print("Request timeout:", url)
-        return None
-
-    except requests.exceptions.RequestException as e:
-        print("Request failed:", e)
-        return None
+app.json = json_codec.FastJSONProvider(app)
 
 def load_env_file(path=".env"):
     if not os.path.isfile(path):
@@ -46,6 +44,64 @@ def load_env_file(path=".env"):
 
 
 load_env_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+server_timing.init_app(app, enabled=env_flag("SERVER_TIMING_ENABLED"))
+assets.init_app(app)
+metrics.init_app(
+    app,
+    enabled=env_flag("METRICS_ENABLED"),
+    multiproc_dir=os.getenv("METRICS_MULTIPROC_DIR", "").strip(),
+    flush_seconds=float(os.getenv("METRICS_FLUSH_SECONDS", "1")),
+)
+profiling.init_app(
+    app,
+    enabled=env_flag("PROFILER_ENABLED"),
+    directory=os.getenv("PROFILER_DIR", "profiles").strip() or "profiles",
+    sample_rate=float(os.getenv("PROFILER_SAMPLE_RATE", "0")),
+    secret=os.getenv("PROFILER_SECRET", "").strip(),
+    slow_ms=int(os.getenv("PROFILER_SLOW_MS", "0")),
+    max_files=int(os.getenv("PROFILER_MAX_FILES", "200")),
+)
+cms_journal.configure(int(os.getenv("CMS_JOURNAL_SIZE", "500")))
+strapi_client.set_client(strapi_client.StrapiClient.from_env())
+cache.set_cache(cache.from_env())
+CMS_CACHE_SECONDS = int(os.getenv("CMS_CACHE_SECONDS", "60"))
+FRAGMENT_CACHE_SECONDS = int(os.getenv("FRAGMENT_CACHE_SECONDS", "300"))
+
+# Created at the bottom of this module, once the catalog indexers below exist.
+snapshot_store = None
+
+
+def cms_data(kind, fetch):
+    """Host-wide snapshot value when ``SNAPSHOT_DIR`` is set and published, else the CMS via ``cache``."""
+    if snapshot_store is not None:
+        value = snapshot_store.get(kind)
+        if value is not None:
+            return value
+    def fetch_on_miss():
+        with cms_journal.cache_outcome("miss"):
+            return fetch()
+
+    key = f"cms:{kind}:{strapi_client.get_client().base_url}"
+    return cache.get_cache().get_or_compute(key, fetch_on_miss, ttl=CMS_CACHE_SECONDS, tags=("cms",))
+
+
+def load_gallery_snapshot():
+    items = cms_data("gallery", get_gallery_images)
+    if items is None:
+        return None
+    return gallery_module.build_snapshot(items, normalize=normalize_text)
+
+
+gallery_cache = SnapshotCache(
+    "gallery", load_gallery_snapshot, ttl=int(os.getenv("GALLERY_CACHE_SECONDS", "300"))
+)
+
+SHOP_PER_PAGE = 12
+GALLERY_PER_PAGE = 12
+REVIEWS_PER_PAGE = 16  # 4x4 grid
+API_MAX_LIMIT = 48
+API_CACHE_SECONDS = int(os.getenv("API_CACHE_SECONDS", "60"))
+INFINITE_SCROLL = env_flag("INFINITE_SCROLL_ENABLED")
 
 
 def resolve_media_url(path):
@@ -59,7 +115,14 @@ def resolve_media_url(path):
         return cleaned
 
     # 🔥 FIX: prepend Strapi base URL
-    return f"https://cms.apparelbrandingcompany.in{cleaned}"
+    if cleaned.startswith('/uploads/'):
+        strapi_url = strapi_client.get_client().base_url or "https://cms.apparelbrandingcompany.in"
+        return f"{strapi_url}{cleaned}"
+
+    if cleaned.startswith('/'):
+        return cleaned
+
+    return url_for('static', filename=cleaned)
 
 
 def description_to_text(value):
@@ -96,7 +159,7 @@ def derive_brand(product):
 
 
 def load_shop_products():
-    products_from_strapi = get_shop_products()
+    products_from_strapi = cms_data("catalog", get_shop_products)
     if products_from_strapi is not None:
         return products_from_strapi
     return {}
@@ -197,52 +260,12 @@ def default_home_content():
 
 
 def load_home_content():
-    from_cms = get_homepage_content()
+    from_cms = cms_data("homepage", get_homepage_content)
     if from_cms is not None:
         return from_cms
     return default_home_content()
 
 
-def is_url_reachable(url, timeout=3):
-    try:
-        req = Request(url=url, method="GET")
-        with urlopen(req, timeout=timeout):
-            return True
-    except HTTPError:
-        return True
-    except (URLError, TimeoutError, ValueError):
-        return False
-
-
-def extract_images(p):
-    BASE = "https://cms.apparelbrandingcompany.in"
-    images = []
-    main_image = None
-
-    try:
-        for img in p.get("images", []):
-            color = img.get("color", "default")
-
-            for i in img.get("image", []):
-                url = i.get("url")
-                if not url:
-                    continue
-
-                full_url = BASE + url
-
-                images.append({
-                    "image_path": full_url,
-                    "color": color
-                })
-
-                if not main_image:
-                    main_image = full_url
-
-    except Exception as e:
-        print("Image parsing error:", e)
-
-    return main_image, images
-
 @app.context_processor
 def inject_globals():
     g.facebook_url = SocialConfig.FACEBOOK_URL
@@ -261,9 +284,63 @@ def inject_globals():
     )
 
 
+NAV_PATHS = {'/', '/about', '/faq', '/gallery', '/testimonials', '/contact'}
+
+
+def active_nav(path):
+    """The only part of the URL ``header.html`` depends on: which nav entry is highlighted."""
+    if path.startswith('/shop'):
+        return '/shop'
+    return path if path in NAV_PATHS else ''
+
+
+_template_digests = {}
+
+
+def template_digest(name):
+    template = app.jinja_env.get_template(name)
+    mtime = os.stat(template.filename).st_mtime_ns
+    cached = _template_digests.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(template.filename, 'rb') as f:
+            cached = _template_digests[name] = (mtime, hashlib.sha1(f.read()).hexdigest()[:12])
+    return cached[1]
+
+
+def site_content_digest():
+    digest = g.get('site_content_digest')
+    if digest is None:
+        content = getattr(g, 'site_content', None) or default_home_content()
+        digest = g.site_content_digest = hashlib.sha1(json_codec.dumps_bytes(content, sort_keys=True)).hexdigest()[:12]
+    return digest
+
+
+@pass_context
+def cached_include(context, name, *vary):
+    """``{% include name %}`` through ``cache``, keyed by the template source, CMS content, asset build and ``vary``.
+
+    For fragments that read nothing from the page context beyond
+    ``site_content`` and what the caller passes as ``vary``.
+    """
+    key = ':'.join(['fragment', name, template_digest(name), site_content_digest(), assets.version(), *map(str, vary)])
+    html = cache.get_cache().get_or_compute(
+        key,
+        lambda: app.jinja_env.get_template(name).render(context.get_all()),
+        ttl=FRAGMENT_CACHE_SECONDS,
+        tags=("cms", "fragments"),
+    )
+    return Markup(html)
+
+
+app.jinja_env.globals.update(cached_include=cached_include, active_nav=active_nav)
+
+
 @app.before_request
 def inject_site_content():
-    g.site_content = load_home_content()
+    if request.path.startswith("/healthz/"):
+        return
+    with server_timing.span("home"):
+        g.site_content = load_home_content()
 
 
 # setup sttaic folder
@@ -302,75 +379,38 @@ def about():
     return render_template('about.html')
 
 
-@app.route('/gallery')
-def gallery():
-    all_gallery_images = []
-    seen_paths = set()
-
-<<<<<<< HEAD
+def gallery_listing():
+    """Return ``(snapshot, selected_color, images)`` for the current request's filters."""
     # Images are now fully driven by Strapi, discarding the local folder fallback
-    gallery_from_strapi = get_gallery_images() or []
-    for item in gallery_from_strapi:
-        image_url = item.get('url')
-        if not image_url:
-            continue
-        if image_url in seen_paths:
-            continue
-        seen_paths.add(image_url)
-        all_gallery_images.append({
-            'url': image_url,
-            'color': item.get('color', 'Gallery')
-        })
-
-    # Randomize order so colors are mixed in gallery.
-=======
-    abc_root = os.path.join(app.static_folder, 'abc_upload')
-
-    max_images = 300  # prevent memory overload
-
-    if os.path.isdir(abc_root):
-        for root, _, files in os.walk(abc_root):
-            color = os.path.basename(root)
-
-            for file_name in sorted(files):
-                if len(all_gallery_images) >= max_images:
-                    break
-
-                if not file_name.lower().endswith(allowed_ext):
-                    continue
-
-                full_path = os.path.join(root, file_name)
-                rel_path = os.path.relpath(full_path, app.static_folder).replace("\\", "/")
+    snapshot = gallery_cache.get() or gallery_module.build_snapshot([])
 
-                if rel_path in seen_paths:
-                    continue
+    selected_color = normalize_text(request.args.get('color'))
+    if selected_color:
+        images = snapshot["by_color"].get(selected_color, [])
+    else:
+        images = snapshot["images"]
+    return snapshot, selected_color, images
 
-                seen_paths.add(rel_path)
 
-                all_gallery_images.append({
-                    'url': url_for('static', filename=rel_path),
-                    'color': color
-                })
-
->>>>>>> f3025387d8e2326436640e00906cf1ef18ad292d
-    random.shuffle(all_gallery_images)
+@app.route('/gallery')
+def gallery():
+    snapshot, selected_color, images = gallery_listing()
 
     page = request.args.get('page', 1, type=int)
-    per_page = 12
-
-    total_images = len(all_gallery_images)
-    total_pages = max(1, (total_images + per_page - 1) // per_page)
-
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-
-    current_gallery_images = all_gallery_images[start_idx:end_idx]
+    per_page = GALLERY_PER_PAGE
+    current_gallery_images, total_pages = gallery_module.page_of(images, page, per_page)
 
     return render_template(
         'gallery.html',
         gallery_images=current_gallery_images,
         current_page=page,
-        total_pages=total_pages
+        total_pages=total_pages,
+        gallery_colors=snapshot["colors"],
+        gallery_total=len(snapshot["images"]),
+        selected_color=selected_color,
+        infinite_scroll=INFINITE_SCROLL,
+        infinite_scroll_source=listing_api_url('api_gallery'),
+        next_cursor=next_cursor(max(page, 1) * per_page, len(images))
     )
 
 
@@ -387,16 +427,20 @@ def faq():
     return render_template('faq.html')
 
 
-@app.route('/testimonials')
-def testimonials():
+def load_reviews():
     try:
         with open('content/reviews.json', 'r', encoding='utf-8') as f:
-            all_reviews = json.load(f)
+            return json.load(f)
     except FileNotFoundError:
-        all_reviews = []
+        return []
+
+
+@app.route('/testimonials')
+def testimonials():
+    all_reviews = load_reviews()
 
     page = request.args.get('page', 1, type=int)
-    per_page = 16  # 4x4 grid
+    per_page = REVIEWS_PER_PAGE
 
     total_reviews = len(all_reviews)
     total_pages = (total_reviews + per_page - 1) // per_page
@@ -408,95 +452,97 @@ def testimonials():
     return render_template('testimonials.html',
                            reviews=current_reviews,
                            current_page=page,
-                           total_pages=total_pages)
-
-
-@app.route('/shop')
-def shop():
-
-    products_dict = {}   # ✅ ALWAYS DEFINE
-
-    try:
-        BASE = "https://cms.apparelbrandingcompany.in"
-        TOKEN = os.getenv("STRAPI_API_TOKEN")  # ✅ single source
+                           total_pages=total_pages,
+                           infinite_scroll=INFINITE_SCROLL,
+                           infinite_scroll_source=listing_api_url('api_testimonials'),
+                           next_cursor=next_cursor(end_idx, total_reviews))
+
+
+def listing_product(product_id, product):
+    """Copy of ``product`` with the listing fields: ``id``, ``brand`` and ``available_colors``."""
+    product = dict(product)
+    product['id'] = product_id
+    product['brand'] = derive_brand(product)
+    images = product.get('images', []) or []
+    available_colors = []
+    for img in images:
+        color = (img or {}).get('color')
+        if color and color not in available_colors:
+            available_colors.append(color)
+    if not available_colors and product.get('image_path'):
+        available_colors = ['default']
+    product['available_colors'] = available_colors
+    return product
+
+
+def listing_filter_options(all_products):
+    return {
+        'brands': sorted({p.get('brand', 'General') for p in all_products}),
+        'sizes': sorted({size for p in all_products for size in (p.get('Sizes') or [])}),
+        'deliveries': sorted({p.get('delivery_time', '').strip() for p in all_products if p.get('delivery_time')}),
+        'categories': sorted({p.get('category', '').strip() for p in all_products if p.get('category')}),
+        'colors': sorted({c for p in all_products for c in (p.get('available_colors') or []) if c}),
+    }
 
-        url = f"{BASE}/api/products?populate=images.image&pagination[pageSize]=20"
 
-        headers = {}
-        if TOKEN:
-            headers["Authorization"] = f"Bearer {TOKEN}"
+def product_search_text(product):
+    return (
+        f"{product.get('name', '')} "
+        f"{product.get('desc', '')} "
+        f"{' '.join(product.get('keywords', []))}"
+    ).lower()
+
+
+def catalog_indexes(products):
+    """Indexes stored in the mapped catalog file, so workers never scan every product.
+
+    Facet postings hold the record positions per lower-cased brand, category and
+    delivery value and per size. Filter options, related products and the
+    documentId lookup are precomputed as well.
+    """
+    listing = [listing_product(key, product) for key, product in products.items()]
+    postings = {'brand': {}, 'category': {}, 'delivery': {}, 'size': {}}
+    document_ids = {}
+    for position, product in enumerate(listing):
+        values = {
+            'brand': [(product.get('brand') or '').lower()],
+            'category': [(product.get('category') or '').lower()],
+            'delivery': [(product.get('delivery_time') or '').lower()],
+            'size': (product.get('Sizes') or []) + (product.get('extended_sizes') or []),
+        }
+        for facet, facet_values in values.items():
+            for value in dict.fromkeys(facet_values):
+                if value and isinstance(value, str):
+                    postings[facet].setdefault(value, []).append(position)
+        if product.get('documentId') is not None:
+            document_ids.setdefault(str(product['documentId']), product['id'])
+    return {
+        'filter_options': listing_filter_options(listing),
+        'postings': postings,
+        'related': related.build_index(products, k=4, normalize=normalize_text),
+        'document_ids': document_ids,
+    }
 
-        data = safe_fetch(url, headers)
 
-        if not data:
-            products = []
+def mapped_listing_positions(catalog, selected_filters):
+    """Record positions matching the filters; same rules as ``product_matches`` below."""
+    postings = catalog.indexes['postings']
+    matched = None
+    for facet in ('brand', 'category', 'delivery', 'size'):
+        wanted = selected_filters[facet]
+        if not wanted:
+            continue
+        if facet == 'size':
+            positions = set(postings['size'].get(wanted, ()))
         else:
-            products = data.get("data", [])
-
-
-        for item in (data or {}).get("data", []):
-            p = item
-
-            # ✅ FIX IMAGE EXTRACTION
-            all_images = []
-            main_image = None
-
-            try:
-                for img in p.get("images", []):
-                    color = img.get("color", "default")
-
-                    for i in img.get("image", []):
-                        url = i.get("url")
-                        if not url:
-                            continue
-
-                        full_url = BASE + url
-
-                        all_images.append({
-                            "image_path": full_url,
-                            "color": color
-                        })
-
-                        # set first image as main
-                        if not main_image:
-                            main_image = full_url
-
-            except Exception as e:
-                print("Image error:", e)
-
-            products_dict[str(p.get("documentId"))] = {
-                "id": p.get("id"),
-                "documentId": p.get("documentId"),
-                "name": p.get("name") or "No Name",
-                "price": p.get("price") or "",
-                "category": p.get("category") or "",
-                "discount": p.get("discount") or "",
-                "delivery_time": p.get("delivery_time") or "",
-                "desc": p.get("desc") or "",
-                "image_path": main_image   # ✅ NOW WORKS
-                "image_alt": p.get("image_alt") or "",
-                "images": all_images,
-                "Sizes": p.get("sizes") or [],
-                "extended_sizes": p.get("extended_sizes") or []
-            }
-
-    except Exception as e:
-        print("🔥 STRAPI FAILED:", e)
+            wanted = wanted.lower()
+            positions = {p for value, ids in postings[facet].items() if wanted in value for p in ids}
+        matched = positions if matched is None else matched & positions
+    return range(len(catalog)) if matched is None else sorted(matched)
 
-    all_products = list(products_dict.values())
-
-    for product in all_products:
-        product['brand'] = derive_brand(product)
-        images = product.get('images', []) or []
-        available_colors = []
-        for img in images:
-            color = (img or {}).get('color')
-            if color and color not in available_colors:
-                available_colors.append(color)
-        if not available_colors and product.get('image_path'):
-            available_colors = ['default']
-        product['available_colors'] = available_colors
 
+def shop_listing():
+    """Return ``(filtered_products, filter_options, selected_filters)`` for the current request."""
     selected_filters = {
         'brand': request.args.get('brand', '').strip(),
         'size': request.args.get('size', '').strip(),
@@ -505,13 +551,15 @@ def shop():
         'color': request.args.get('color', '').strip(),
     }
 
-    filter_options = {
-        'brands': sorted({p.get('brand', 'General') for p in all_products}),
-        'sizes': sorted({size for p in all_products for size in (p.get('Sizes') or [])}),
-        'deliveries': sorted({p.get('delivery_time', '').strip() for p in all_products if p.get('delivery_time')}),
-        'categories': sorted({p.get('category', '').strip() for p in all_products if p.get('category')}),
-        'colors': sorted({c for p in all_products for c in (p.get('available_colors') or []) if c}),
-    }
+    products = load_shop_products()
+    if isinstance(products, mapped_catalog.MappedCatalog):
+        # Only the products on the requested page get decoded.
+        positions = mapped_listing_positions(products, selected_filters)
+        filtered_products = mapped_catalog.Records(products, positions, listing_product)
+        return filtered_products, products.indexes['filter_options'], selected_filters
+
+    all_products = [listing_product(product_id, product) for product_id, product in products.items()]
+    filter_options = listing_filter_options(all_products)
 
     def product_matches(product):
         if selected_filters['brand']:
@@ -534,9 +582,15 @@ def shop():
         return True
 
     filtered_products = [p for p in all_products if product_matches(p)]
+    return filtered_products, filter_options, selected_filters
+
+
+@app.route('/shop')
+def shop():
+    filtered_products, filter_options, selected_filters = shop_listing()
 
     page = request.args.get('page', 1, type=int)
-    per_page = 12
+    per_page = SHOP_PER_PAGE
 
     total_products = len(filtered_products)
     total_pages = (total_products + per_page - 1) // per_page
@@ -550,94 +604,131 @@ def shop():
                            current_page=page,
                            total_pages=total_pages,
                            filter_options=filter_options,
-                           selected_filters=selected_filters)
+                           selected_filters=selected_filters,
+                           infinite_scroll=INFINITE_SCROLL,
+                           infinite_scroll_source=listing_api_url('api_shop'),
+                           next_cursor=next_cursor(end_idx, total_products))
 
 
-@app.route('/shop-details')
-@app.route('/product/<product_id>')
-def shop_details(product_id=None):
-    """Handle shop details page with error handling and data validation."""
+# -------------------------
+# JSON pagination APIs (infinite scroll)
+# -------------------------
 
-    product_id = product_id or request.args.get('id')
+def next_cursor(offset, total):
+    return str(offset) if 0 < offset < total else None
+
+
+def listing_api_url(endpoint):
+    """URL of the JSON endpoint for ``endpoint`` with the current filters (minus paging)."""
+    args = {k: v for k, v in request.args.items() if k not in ('page', 'cursor') and v}
+    return url_for(endpoint, **args)
 
-    if not product_id:
-        flash('Product ID is required', 'error')
-        return redirect(url_for('shop'))
 
+def api_page(items, per_page, serialize, **extra):
+    """Slice ``items`` by ``?cursor=<offset>`` (or ``?page=``) and return a cacheable JSON response."""
     try:
-        BASE = "https://cms.apparelbrandingcompany.in"
-        TOKEN = os.getenv("STRAPI_API_TOKEN")
+        limit = min(max(int(request.args.get('limit', per_page)), 1), API_MAX_LIMIT)
+    except ValueError:
+        limit = per_page
+    cursor = request.args.get('cursor')
+    try:
+        if cursor is not None:
+            offset = max(int(cursor), 0)
+        else:
+            offset = (max(request.args.get('page', 1, type=int), 1) - 1) * limit
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+
+    end = offset + limit
+    response = jsonify({
+        "items": [serialize(item) for item in items[offset:end]],
+        "total": len(items),
+        "next_cursor": next_cursor(end, len(items)),
+        **extra,
+    })
+    response.headers['Cache-Control'] = f'public, max-age={API_CACHE_SECONDS}'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def shop_item(product):
+    return {
+        'id': product['id'],
+        'name': product.get('name', ''),
+        'price': product.get('price', ''),
+        'discount': product.get('discount', ''),
+        'category': product.get('category', ''),
+        'brand': product.get('brand', ''),
+        'image': resolve_media_url(product.get('image_path')),
+        'image_alt': product.get('image_alt') or product.get('name', ''),
+        'url': f"/product/{product['id']}",
+        'colors': product.get('available_colors', []),
+    }
 
-        print("STEP 1: route started")
 
-        # ✅ Strapi v5 filter (correct)
-        import time
+@app.route('/api/shop')
+def api_shop():
+    filtered_products, _, _ = shop_listing()
+    return api_page(filtered_products, SHOP_PER_PAGE, shop_item)
 
-        url = (
-            f"{BASE}/api/products"
-            f"?populate[images][populate]=image"
-            f"&pagination[pageSize]=20"
-            f"&sort=createdAt:desc"
-            f"&_={int(time.time())}"
-        )
 
-        headers = {}
-        if TOKEN:
-            headers["Authorization"] = f"Bearer {TOKEN}"
+@app.route('/api/gallery')
+def api_gallery():
+    snapshot, _, images = gallery_listing()
+    return api_page(images, GALLERY_PER_PAGE, dict, version=snapshot["version"])
 
-        print("STEP 2: calling API", url)
 
-        data = safe_fetch(url, headers)
+@app.route('/api/testimonials')
+def api_testimonials():
+    def review_item(review):
+        return {
+            'name': review.get('name', ''),
+            'designation': review.get('designation', ''),
+            'message': review.get('message', ''),
+            'image_path': review.get('image_path', ''),
+            'rating': review.get('rating', 5),
+        }
 
-        if not data:
-            flash('Failed to fetch product', 'error')
-            return redirect(url_for('shop'))
+    return api_page(load_reviews(), REVIEWS_PER_PAGE, review_item)
 
-        product_data = data.get("data", [])
 
-        # ✅ FIND CORRECT PRODUCT USING documentId
-        p = None
-        for item in product_data:
-            if str(item.get("documentId")) == str(product_id):
-                p = item
-                break
+@app.route('/shop-details')
+@app.route('/product/<product_id>')
+def shop_details(product_id=None):
+    """Handle shop details page with error handling and data validation."""
+
+    product_id = product_id or request.args.get('id')
+
+    if not product_id:
+        flash('Product ID is required', 'error')
+        return redirect(url_for('shop'))
+
+    try:
+        products = load_shop_products()
+        p = products.get(str(product_id))
+        if p is None:
+            # Older links used the Strapi documentId instead of the catalog key.
+            if isinstance(products, mapped_catalog.MappedCatalog):
+                key = products.indexes['document_ids'].get(str(product_id))
+                if key is not None:
+                    product_id, p = key, products[key]
+            else:
+                for key, item in products.items():
+                    if str(item.get("documentId")) == str(product_id):
+                        product_id, p = key, item
+                        break
 
-        # ✅ HANDLE NOT FOUND
         if not p:
             print("Product not found:", product_id)
             flash('Product not found', 'error')
             return redirect(url_for('shop'))
 
-        # ✅ FIXED IMAGE HANDLING (Strapi v5 safe)
-
-        try:
-            images = p.get("images", [])
-
-            if images and len(images) > 0:
-                first = images[0]
-
-                if first.get("image") and len(first["image"]) > 0:
-                    image_url = "https://cms.apparelbrandingcompany.in" + first["image"][0]["url"]
-
-        except Exception as e:
-            print("Details image error:", e)
-
-        # ✅ Build product object
-        product = {
-            "id": str(p.get("id")),
-            "documentId": p.get("documentId"),
-            "name": p.get("name", ""),
-            "desc": p.get("desc", ""),
-            "description": p.get("description", ""),
-            "category": p.get("category", ""),
-            "price": p.get("price", ""),
-            "delivery_time": p.get("delivery_time", ""),
-            "image_path": main_image,
-            "image_alt": p.get("image_alt", ""),
-            "images": all_images,
-            "Sizes": p.get("sizes", []),
-            "extended_sizes": p.get("extended_sizes", [])
-        }
+        product = dict(p)
+        product['id'] = str(product_id)
+        product.setdefault('images', [])
+        product.setdefault('Sizes', [])
+        product.setdefault('extended_sizes', [])
+        product.setdefault('image_path', '')
 
         # ✅ Brand
         product['brand'] = derive_brand(product)
@@ -677,7 +768,6 @@ def shop_details(product_id=None):
             if resolved not in product['color_images'][color]:
                 product['color_images'][color].append(resolved)
 
-<<<<<<< HEAD
         product['available_colors'] = list(product['color_images'].keys())
             
         # Ensure product has all required fields
@@ -696,9 +786,6 @@ def shop_details(product_id=None):
                 'image_alt': product.get('image_alt', product.get('name', 'Product')),
                 'color': 'default'
             }]
-=======
-        # ✅ Ensure at least one image
->>>>>>> f3025387d8e2326436640e00906cf1ef18ad292d
         if not product['color_images'] and product.get('image_path'):
             resolved = resolve_media_url(product['image_path'])
             product['color_images'] = {'default': [resolved]}
@@ -722,49 +809,19 @@ def shop_details(product_id=None):
         # ✅ RELATED PRODUCTS
         # -------------------------
         related_products = []
-
-        from urllib.parse import quote
-
-        try:
-            category = product.get("category", "")
-            product_id = product.get("documentId")
-
-            rel_url = f"{BASE}/api/products?filters[category][$eq]={quote(category)}&populate[images][populate]=image&pagination[pageSize]=10"
-            rel_res = requests.get(rel_url, timeout=5)
-
-            if rel_res.status_code != 200:
-                print("Related API failed:", rel_res.status_code)
-                rel_data = []
-            else:
-                rel_data = rel_res.json().get("data", [])
-    
-                for item in rel_data:
-                    if item.get("documentId") == product_id:
-                        continue  
-
-                    # ✅ GET IMAGE (MISSING LINE — CRITICAL FIX)
-                    img_url = extract_image(item)
-
-                    # ✅ MAKE FULL URL SAFELY
-                    if img_url and not img_url.startswith("http"):
-                        img_url = BASE + img_url
-
-                    # ✅ FINAL FALLBACK
-                    if not img_url:
-                        img_url = "/static/images/logo.png"
-
-                    related_products.append({    
-                        "documentId": item.get("documentId"),
-                        "name": item.get("name"),
-                        "price": item.get("price"),
-                        "image_path": img_url
-                    })
-
-            related_products = related_products[:4]
-
-
-        except Exception as e:
-            print("Related products error:", str(e))
+        if isinstance(products, mapped_catalog.MappedCatalog):
+            related_keys = products.indexes['related'].get(product['id'], [])
+        else:
+            related_keys = related.related_index(products, k=4, normalize=normalize_text).get(product['id'], [])
+        for key in related_keys:
+            item = products[key]
+            related_products.append({
+                "id": key,
+                "name": item.get("name"),
+                "price": item.get("price"),
+                "category": item.get("category"),
+                "image_path": item.get("image_path") or "/static/images/logo.png",
+            })
 
         # -------------------------
         # ✅ FINAL RENDER
@@ -798,16 +855,15 @@ def search_api():
 
     try:
         products_dict = load_shop_products()
+        if isinstance(products_dict, mapped_catalog.MappedCatalog):
+            # The search text is scanned in the mapped file; only matches are decoded.
+            matches = ((products_dict.key(i), products_dict.record(i)) for i in products_dict.search(query))
+        else:
+            matches = ((product_id, product) for product_id, product in products_dict.items()
+                       if query in product_search_text(product))
         results = []
 
-        for product_id, product in products_dict.items():
-
-            # ✅ FIXED SEARCH TEXT (NO SYNTAX ERROR)
-            search_text = (
-                f"{product.get('name', '')} "
-                f"{product.get('desc', '')} "
-                f"{' '.join(product.get('keywords', []))}"
-            ).lower()
+        for product_id, product in matches:
 
             # -------------------------
             # CATEGORY FILTER
@@ -825,24 +881,22 @@ def search_api():
                     if category_map[category] not in product_category:
                         continue
 
-            # -------------------------
-            # MATCH SEARCH
-            # -------------------------
-            if query in search_text:
+            desc = product.get('desc', '')
 
-                desc = product.get('desc', '')
+            results.append({
+                'id': product_id,
+                'name': product.get('name', ''),
+                'desc': desc[:100] + '...' if len(desc) > 100 else desc,
+                'image': resolve_media_url(product.get('image_path')),
+                'price': product.get('price', ''),
+                'url': f'/product/{product_id}'
+            })
 
-                results.append({
-                    'id': product_id,
-                    'name': product.get('name', ''),
-                    'desc': desc[:100] + '...' if len(desc) > 100 else desc,
-                    'image': resolve_media_url(product.get('image_path')),
-                    'price': product.get('price', ''),
-                    'url': f'/product/{product_id}'
-                })
+            # Limit results
+            if len(results) == 8:
+                break
 
-        # Limit results
-        return jsonify(results[:8])
+        return jsonify(results)
 
     except Exception as e:
         print("Search API ERROR:", str(e))
@@ -871,10 +925,6 @@ def search_api():
 
 @app.route('/debug/strapi-env')
 def debug_strapi_env():
-    import os
-    from urllib.request import Request, urlopen
-    import json
-
     strapi_url = os.getenv("STRAPI_URL", "NOT SET").strip().rstrip("/")
     token = os.getenv("STRAPI_API_TOKEN", "NOT SET").strip()
     collection = os.getenv("STRAPI_PRODUCTS_COLLECTION", "products").strip("/")
@@ -891,7 +941,7 @@ def debug_strapi_env():
     try:
         req = Request(url=test_url, headers=headers)
         with urlopen(req, timeout=8) as r:
-            body = json.loads(r.read().decode())
+            body = json_codec.loads(r.read())
             return {
                 "strapi_url": strapi_url,
                 "collection": collection,
@@ -917,5 +967,103 @@ def debug_strapi_env():
         }
 
 
+def debug_token_ok():
+    expected = os.getenv("DEBUG_TOKEN", "").strip()
+    supplied = request.headers.get("X-Debug-Token") or request.args.get("token", "")
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+
+@app.route('/cms/webhook', methods=['POST'])
+def cms_webhook():
+    """Strapi webhook target: drop cached CMS data and fragments after an entry changes.
+
+    Configure the webhook with the header ``Authorization: Bearer <CMS_WEBHOOK_TOKEN>``.
+    """
+    expected = os.getenv("CMS_WEBHOOK_TOKEN", "").strip()
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not expected or not hmac.compare_digest(supplied.encode(), expected.encode()):
+        return jsonify({"error": "not found"}), 404
+    cache.get_cache().invalidate_tag("cms")
+    gallery_cache.clear()
+    return jsonify({"invalidated": ["cms"]})
+
+
+@app.route('/debug/strapi-calls')
+def debug_strapi_calls():
+    if not debug_token_ok():
+        return jsonify({"error": "not found"}), 404
+
+    entries = cms_journal.recent()
+    try:
+        limit = max(int(request.args.get("limit", 100)), 0)
+    except ValueError:
+        limit = 100
+    return jsonify({
+        "journal_size": len(entries),
+        "recent": entries[:limit],
+        **cms_journal.summary(entries),
+    })
+
+
+def warm_homepage():
+    # ``load_home_content`` falls back to the built-in defaults; readiness wants the CMS copy.
+    return cms_data("homepage", get_homepage_content) is not None
+
+
+def warm_catalog():
+    products = cms_data("catalog", get_shop_products)
+    if not products:
+        return False
+    # A mapped catalog carries its related index in the file.
+    if not isinstance(products, mapped_catalog.MappedCatalog):
+        related.related_index(products, k=4, normalize=normalize_text)
+    return True
+
+
+def warm_gallery():
+    return gallery_cache.get() is not None
+
+
+def caches_ready():
+    """Whether the homepage, catalog and gallery are loaded from the CMS.
+
+    Runs the warm-up steps, so a worker started without ``WARMUP_ENABLED`` loads
+    them on its first probe. Each is served from the cache once loaded; failed
+    fetches are not cached, so each probe retries them until the CMS answers.
+    """
+    if not strapi_client.get_client().configured:
+        return True
+    # A list, not a generator: every step runs even after one fails.
+    return all([step() for _, step in WARMUP_STEPS])
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "").strip()
+if SNAPSHOT_DIR:
+    snapshot_store = snapshots.SnapshotStore(
+        SNAPSHOT_DIR,
+        refresh_seconds=int(os.getenv("SNAPSHOT_REFRESH_SECONDS", "300")),
+        catalog_options={"search_text": product_search_text, "indexes": catalog_indexes},
+    )
+    if not snapshots.PREFORK:
+        snapshot_store.start_refresher()
+
+
+WARMUP_STEPS = [
+    ("homepage", warm_homepage),
+    ("catalog", warm_catalog),
+    ("gallery", warm_gallery),
+]
+WARMUP_BUDGET_SECONDS = float(os.getenv("WARMUP_BUDGET_SECONDS", "15"))
+
+warmup.init_app(
+    app,
+    steps=WARMUP_STEPS,
+    enabled=env_flag("WARMUP_ENABLED"),
+    budget_seconds=WARMUP_BUDGET_SECONDS,
+    ready_check=caches_ready,
+    # Pre-forked masters warm up synchronously so workers inherit the result.
+    background=not snapshots.PREFORK,
+)
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
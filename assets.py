@@ -0,0 +1,173 @@
+"""CSS/JS bundles for the site templates.
+
+``build_assets.py`` compiles the SCSS, concatenates and minifies the bundles
+below into ``static/dist/`` under content-hashed names, and extracts critical
+CSS for the pages listed in ``CRITICAL``. It then writes
+``static/dist/manifest.json``. Templates call:
+
+- ``asset_styles(page)`` in ``<head>``. On pages with critical CSS, this
+  inlines it and loads the full bundle without blocking the first paint.
+- ``asset_scripts(page)`` before ``</body>``.
+- ``asset_url(bundle)`` for a single bundle, e.g. the optional infinite-scroll
+  script.
+
+Without a manifest (a checkout that has not run the build), the helpers emit
+one tag per source file, so development needs no build step. Hashed files
+are served with a one-year immutable ``Cache-Control``.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from flask import request, url_for
+from markupsafe import Markup, escape
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+STATIC_DIR = PROJECT_ROOT / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+
+VENDOR_CSS = [
+    "icon/flaticon_glamer.css",
+    "vendor/bootstrap/bootstrap.min.css",
+    "vendor/splide/splide.min.css",
+    "vendor/swiper/swiper-bundle.min.css",
+    "vendor/slim-select/slimselect.css",
+    "vendor/animate-wow/animate.min.css",
+]
+VENDOR_JS = [
+    "vendor/bootstrap/bootstrap.bundle.min.js",
+    "vendor/splide/splide.min.js",
+    "vendor/splide/splide-extension-auto-scroll.min.js",
+    "vendor/swiper/swiper-bundle.min.js",
+    "vendor/slim-select/slimselect.min.js",
+    "vendor/animate-wow/wow.min.js",
+    "vendor/splittype/index.min.js",
+    "vendor/mixitup/mixitup.min.js",
+    "vendor/fslightbox/fslightbox.js",
+]
+
+# Bundle name -> source files (relative to static/), in load order.
+BUNDLES = {
+    "site.css": VENDOR_CSS + ["css/style.css"],
+    "shop.css": VENDOR_CSS + ["vendor/no-ui-slider/nouislider.min.css", "css/style.css"],
+    # Linked from inside header.html, after each page's own <style> blocks; kept
+    # separate so it still overrides them.
+    "responsive.css": ["css/responsive-global.css"],
+    # Shared by every page, so the browser caches it once for the whole site.
+    "vendor.js": VENDOR_JS,
+    # main_v2.js stays alone: a parse error in one source of a concatenated
+    # bundle would stop every other source in it from running.
+    "main.js": ["js/main_v2.js"],
+    "index.js": ["js/countdown.js"],
+    "faq.js": ["js/accordion.js"],
+    "shop.js": ["vendor/no-ui-slider/nouislider.min.js"],
+    "infinite-scroll.js": ["js/infinite-scroll.js"],
+}
+
+# Page -> its stylesheet bundle and script bundles.
+PAGES = {
+    "index": {"css": ["site.css"], "js": ["vendor.js", "main.js", "index.js"]},
+    "shop": {"css": ["shop.css"], "js": ["vendor.js", "shop.js", "main.js"]},
+    "faq": {"css": ["site.css"], "js": ["vendor.js", "main.js", "faq.js"]},
+    "about": {"css": ["site.css"], "js": ["vendor.js", "main.js"]},
+    "contact": {"css": ["site.css"], "js": ["vendor.js", "main.js"]},
+    "gallery": {"css": ["site.css"], "js": ["vendor.js", "main.js"]},
+    "testimonials": {"css": ["site.css"], "js": ["vendor.js", "main.js"]},
+    "shop-details": {"css": ["site.css"], "js": ["vendor.js", "main.js"]},
+    "header": {"css": ["responsive.css"], "js": []},
+}
+
+# Page -> (URL rendered for the fold, number of top-level <main> children above the fold).
+CRITICAL = {
+    "index": ("/", 2),
+    "shop": ("/shop", 2),
+}
+
+_manifest = {}
+_critical = {}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Read the build manifest (``{}`` when the assets have not been built)."""
+    global _manifest, _critical
+    try:
+        with open(path, "rb") as f:
+            manifest = json_codec.loads(f.read())
+    except FileNotFoundError:
+        manifest = {}
+    critical = {}
+    for page, filename in manifest.get("critical", {}).items():
+        try:
+            with open(Path(path).parent.parent / filename, encoding="utf-8") as f:
+                critical[page] = f.read()
+        except FileNotFoundError:
+            # e.g. a partial deploy; the page then links its stylesheets normally.
+            logger.warning("Critical CSS %s for %r is missing; not inlining it", filename, page)
+    _manifest, _critical = manifest, critical
+    return manifest
+
+
+def version():
+    """Build id, or ``""`` when serving unbundled sources."""
+    return _manifest.get("version", "")
+
+
+def _source_url(filename):
+    try:
+        mtime = int(os.stat(STATIC_DIR / filename).st_mtime)
+    except OSError:
+        return url_for("static", filename=filename)
+    return url_for("static", filename=filename, v=mtime)
+
+
+def bundle_urls(bundle):
+    built = _manifest.get("bundles", {}).get(bundle)
+    if built:
+        return [url_for("static", filename=built)]
+    return [_source_url(filename) for filename in BUNDLES[bundle]]
+
+
+def asset_url(bundle):
+    return bundle_urls(bundle)[0]
+
+
+def asset_styles(page):
+    parts = []
+    critical = _critical.get(page)
+    for bundle in PAGES[page]["css"]:
+        for url in bundle_urls(bundle):
+            href = escape(url)
+            if critical is None:
+                parts.append(f'<link rel="stylesheet" href="{href}">')
+            else:
+                parts.append(
+                    f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+                    f'<noscript><link rel="stylesheet" href="{href}"></noscript>'
+                )
+    if critical is not None:
+        parts.insert(0, f"<style>{critical}</style>")
+    return Markup("\n".join(parts))
+
+
+def asset_scripts(page):
+    return Markup("\n".join(
+        f'<script src="{escape(url)}"></script>' for bundle in PAGES[page]["js"] for url in bundle_urls(bundle)
+    ))
+
+
+def init_app(app, manifest_path=MANIFEST_PATH):
+    load_manifest(manifest_path)
+    app.jinja_env.globals.update(asset_styles=asset_styles, asset_scripts=asset_scripts, asset_url=asset_url)
+
+    @app.after_request
+    def immutable_dist_files(response):
+        if (request.path.startswith("/static/dist/") and not request.path.endswith("manifest.json")
+                and response.status_code == 200):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -0,0 +1,107 @@
+"""Micro-benchmark: stdlib JSON vs. the json_codec backend.
+
+Times the two hot paths the codec replaces: decoding a Strapi products page
+from raw response bytes, and serializing /search/api-style payloads through
+the Flask JSON provider.
+
+Usage: python -m benchmarks.bench_codec [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_codec  # noqa: E402
+import strapi_client  # noqa: E402
+from benchmarks.synthetic import product_rows  # noqa: E402
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _search_results(products):
+    results = []
+    for product_id, product in products.items():
+        desc = product.get("desc", "")
+        results.append(
+            {
+                "id": product_id,
+                "name": product.get("name", ""),
+                "desc": desc[:100] + "..." if len(desc) > 100 else desc,
+                "image": product.get("image_path"),
+                "price": product.get("price", ""),
+                "url": f"/product/{product_id}",
+            }
+        )
+    return results
+
+
+def run(rows=10000, repeat=5):
+    body = json.dumps({"data": product_rows(rows), "meta": {"pagination": {"pageCount": 1}}}).encode("utf-8")
+
+    decode_stdlib = _best_of(lambda: json.loads(body.decode("utf-8")), repeat)
+    decode_codec = _best_of(lambda: json_codec.loads(body), repeat)
+
+    payload = json_codec.loads(body)
+    products = {}
+    cache = {}
+    for index, row in enumerate(payload["data"], start=1):
+        compiled = strapi_client._compiled_for(row, cache, strapi_client._compile_product_normalizer, "http://localhost:1337")
+        product = compiled(row, f"1-{index}")
+        products[product["id"]] = product
+    results = _search_results(products)
+
+    stdlib_app = Flask("bench_stdlib")
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app = Flask("bench_fast")
+    fast_app.json = json_codec.FastJSONProvider(fast_app)
+
+    def respond(app, obj):
+        with app.app_context():
+            return app.json.response(obj).get_data()
+
+    search_page = results[:8]
+    encode_stdlib = _best_of(lambda: [respond(stdlib_app, search_page) for _ in range(1000)], repeat)
+    encode_codec = _best_of(lambda: [respond(fast_app, search_page) for _ in range(1000)], repeat)
+    bulk_stdlib = _best_of(lambda: respond(stdlib_app, results), repeat)
+    bulk_codec = _best_of(lambda: respond(fast_app, results), repeat)
+
+    def row(case, stdlib_s, codec_s):
+        return {
+            "case": case,
+            "backend": json_codec.BACKEND,
+            "stdlib_ms": round(stdlib_s * 1000, 2),
+            "codec_ms": round(codec_s * 1000, 2),
+            "speedup": round(stdlib_s / codec_s, 2) if codec_s else None,
+        }
+
+    return [
+        row(f"decode products page ({rows} rows, {len(body) // 1024} KiB)", decode_stdlib, decode_codec),
+        row("search api response x1000 (8 results)", encode_stdlib, encode_codec),
+        row(f"jsonify {len(results)} results", bulk_stdlib, bulk_codec),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(rows=args.rows, repeat=args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark: per-row alias probing vs. schema-compiled normalizers.
+
+Usage: python -m benchmarks.bench_normalizers [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import strapi_client  # noqa: E402
+from benchmarks.synthetic import gallery_rows, product_rows  # noqa: E402
+
+STRAPI_URL = "http://localhost:1337"
+
+
+def _legacy_products(rows):
+    return [strapi_client._normalize_product(row, f"1-{i}", STRAPI_URL) for i, row in enumerate(rows, start=1)]
+
+
+def _compiled_products(rows):
+    cache = {}
+    out = []
+    for i, row in enumerate(rows, start=1):
+        compiled = strapi_client._compiled_for(row, cache, strapi_client._compile_product_normalizer, STRAPI_URL)
+        out.append(compiled(row, f"1-{i}"))
+    return out
+
+
+def _legacy_gallery(rows):
+    return [strapi_client._gallery_item_to_image(row, STRAPI_URL) for row in rows]
+
+
+def _compiled_gallery(rows):
+    cache = {}
+    out = []
+    for row in rows:
+        compiled = strapi_client._compiled_for(row, cache, strapi_client._compile_gallery_normalizer, STRAPI_URL)
+        out.append(compiled(row))
+    return out
+
+
+def _best_of(fn, rows, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(rows=10000, repeat=5):
+    results = []
+    cases = [
+        ("products", product_rows, _legacy_products, _compiled_products),
+        ("gallery", gallery_rows, _legacy_gallery, _compiled_gallery),
+    ]
+    for name, make_rows, legacy, compiled in cases:
+        for shape in ("v4", "v5"):
+            payload = make_rows(rows, shape=shape)
+            legacy_s, legacy_out = _best_of(legacy, payload, repeat)
+            compiled_s, compiled_out = _best_of(compiled, payload, repeat)
+            if legacy_out != compiled_out:
+                raise SystemExit(f"{name}/{shape}: compiled output differs from legacy normalizer")
+            results.append(
+                {
+                    "case": f"{name}/{shape}",
+                    "rows": rows,
+                    "legacy_ms": round(legacy_s * 1000, 2),
+                    "compiled_ms": round(compiled_s * 1000, 2),
+                    "speedup": round(legacy_s / compiled_s, 2) if compiled_s else None,
+                }
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(rows=args.rows, repeat=args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Compare two ``benchmarks.run`` reports.
+
+Usage: python -m benchmarks.compare base.json head.json [--metric median]
+"""
+
+import argparse
+import json
+
+
+def _index(report, metric):
+    return {
+        (r["shape"], r["size"], r["latency_ms"], r["error_rate"], r["name"]): r["ms"][metric]
+        for r in report["results"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--metric", default="median", choices=["min", "median", "p95", "mean"])
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+
+    base_ms = _index(base, args.metric)
+    head_ms = _index(head, args.metric)
+    print(f"{base['meta']['commit']} -> {head['meta']['commit']} ({args.metric} ms)")
+    print(f"{'shape':<6}{'size':>8}  {'case':<20}{'base':>12}{'head':>12}{'change':>10}")
+    for key in sorted(set(base_ms) & set(head_ms)):
+        shape, size, _, _, name = key
+        before, after = base_ms[key], head_ms[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{shape:<6}{size:>8}  {name:<20}{before:>12.2f}{after:>12.2f}{change:>10}")
+
+
+if __name__ == "__main__":
+    main()
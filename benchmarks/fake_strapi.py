@@ -0,0 +1,300 @@
+"""A stdlib HTTP server that imitates the Strapi REST endpoints the site reads.
+
+Serves ``/api/products``, ``/api/galleries`` and ``/api/homepages`` with Strapi's
+pagination envelope, in either the v4 (``attributes``) or v5 (flat) row shape,
+plus ``/uploads/<file>`` so media URLs resolve (with an ``ETag`` honouring
+``If-None-Match``; paths in ``missing_uploads`` answer 404). Catalog size,
+per-request latency and error rate are configurable so benchmarks can model a
+slow or flaky CMS.
+
+The media library is modelled too: ``POST /api/upload`` stores the file's name,
+size and ``fileInfo`` caption in ``media`` (bytes received are counted in
+``upload_bytes``), and ``GET /api/upload/files`` lists it. Statuses queued in
+``upload_statuses`` are answered to the next uploads instead, with
+``Retry-After: 0``.
+
+    with FakeStrapi(products=1000, shape="v4", latency=0.02) as cms:
+        os.environ["STRAPI_URL"] = cms.url
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.synthetic import gallery_row, product_row
+
+MAX_PAGE_SIZE = 100
+PNG_BYTES = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+    b"\x00\x00\x00\rIDATx\x9cc\xf8\xff\xff?\x00\x05\xfe\x02\xfe\xa7\x35\x81\x84\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+PNG_ETAG = '"%s"' % hashlib.sha1(PNG_BYTES).hexdigest()[:16]
+
+
+def homepage_row(shape="v5"):
+    def media(file_id, path):
+        item = {"id": file_id, "url": path, "mime": "image/png"}
+        return {"data": {"id": file_id, "attributes": item}} if shape == "v4" else item
+
+    def media_list(items):
+        if shape == "v4":
+            return {"data": [{"id": item["id"], "attributes": item} for item in items]}
+        return items
+
+    attrs = {
+        "hero_title": "Casual and Stylish for All Seasons",
+        "hero_subtitle": "Perfect for Summer Evenings",
+        "hero_images": media_list([{"id": 900 + n, "url": f"/uploads/hero_{n}.png"} for n in range(3)]),
+        "logo": media(950, "/uploads/logo.png"),
+        "header_ticker_items": ["limited time offer"],
+        "nav_links": [
+            {"label": "Home", "url": "/"},
+            {"label": "Shop", "url": "/shop"},
+            {"label": "Our Gallery", "url": "/gallery"},
+        ],
+        "common": [
+            {"title": f"Service {n}", "description": "Branding service.", "image": media(960 + n, f"/uploads/service_{n}.svg")}
+            for n in range(3)
+        ],
+        "footer_columns": [
+            {"title": "Our Products", "links": [{"label": "Customized T-Shirts", "url": "/shop"}]},
+        ],
+    }
+    if shape == "v4":
+        return {"id": 1, "attributes": attrs}
+    return {"id": 1, "documentId": "home1", **attrs}
+
+
+class FakeStrapi:
+    """Threaded fake Strapi server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, products=100, galleries=100, shape="v5", latency=0.0, error_rate=0.0, seed=0,
+                 host="127.0.0.1", port=0, missing_uploads=()):
+        self.products = products
+        self.galleries = galleries
+        self.shape = shape
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self.missing_uploads = set(missing_uploads)
+        self.media = []
+        self.upload_statuses = []
+        self.upload_bytes = 0
+        self.requests = Counter()
+        self.errors = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._server = None
+        self._thread = None
+        self.url = ""
+
+    def collection_rows(self, name):
+        if name == "products":
+            return self.products, lambda i: product_row(i, shape=self.shape, rng=random.Random(self.seed * 1000003 + i))
+        if name == "galleries":
+            return self.galleries, lambda i: gallery_row(i, shape=self.shape, rng=random.Random(self.seed * 1000003 + i))
+        if name == "homepages":
+            return 1, lambda i: homepage_row(self.shape)
+        return None, None
+
+    def page_body(self, name, page, page_size, filters):
+        total, make_row = self.collection_rows(name)
+        if filters:
+            rows = [make_row(i) for i in range(1, total + 1)]
+            rows = [row for row in rows if _matches(row, filters)]
+            total = len(rows)
+            start = (page - 1) * page_size
+            data = rows[start:start + page_size]
+        else:
+            key = (name, page, page_size)
+            with self._lock:
+                cached = self._pages.get(key)
+            if cached is not None:
+                return cached
+            start = (page - 1) * page_size
+            data = [make_row(i) for i in range(start + 1, min(total, start + page_size) + 1)]
+        body = json.dumps(
+            {
+                "data": data,
+                "meta": {
+                    "pagination": {
+                        "page": page,
+                        "pageSize": page_size,
+                        "pageCount": max(1, (total + page_size - 1) // page_size),
+                        "total": total,
+                    }
+                },
+            }
+        ).encode("utf-8")
+        if not filters:
+            with self._lock:
+                self._pages[(name, page, page_size)] = body
+        return body
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                route = parts.path.rstrip("/")
+                with fake._lock:
+                    fake.requests[route if not route.startswith("/uploads/") else "/uploads"] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake.should_fail():
+                    with fake._lock:
+                        fake.errors[route] += 1
+                    self._send(500, b'{"data":null,"error":{"status":500,"name":"InternalServerError"}}')
+                    return
+
+                if route.startswith("/uploads/"):
+                    if route in fake.missing_uploads:
+                        self._send(404, b'{"data":null,"error":{"status":404,"name":"NotFoundError"}}')
+                    elif self.headers.get("If-None-Match") == PNG_ETAG:
+                        self._send(304, b"", "image/png", {"ETag": PNG_ETAG})
+                    else:
+                        self._send(200, PNG_BYTES, "image/png", {"ETag": PNG_ETAG})
+                    return
+
+                if route == "/api/upload/files":
+                    with fake._lock:
+                        self._send(200, json.dumps(fake.media).encode())
+                    return
+
+                name = route[len("/api/"):] if route.startswith("/api/") else ""
+                total, _ = fake.collection_rows(name)
+                if total is None:
+                    self._send(404, b'{"data":null,"error":{"status":404,"name":"NotFoundError"}}')
+                    return
+
+                query = parse_qs(parts.query)
+                page = _int_param(query, "pagination[page]", 1)
+                page_size = min(_int_param(query, "pagination[pageSize]", 25), MAX_PAGE_SIZE)
+                filters = {
+                    key[len("filters["):].split("]", 1)[0]: values[0]
+                    for key, values in query.items()
+                    if key.startswith("filters[") and key.endswith("[$eq]")
+                }
+                self._send(200, fake.page_body(name, max(1, page), max(1, page_size), filters))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                route = urlsplit(self.path).path.rstrip("/")
+                with fake._lock:
+                    fake.requests["POST " + route] += 1
+                    status = fake.upload_statuses.pop(0) if fake.upload_statuses else None
+                if route != "/api/upload":
+                    self._send(404, b'{"data":null,"error":{"status":404,"name":"NotFoundError"}}')
+                    return
+                if status is not None:
+                    self._send(status, b'{"data":null,"error":{"status":%d}}' % status, headers={"Retry-After": "0"})
+                    return
+                parts = _multipart(body, self.headers.get("Content-Type", ""))
+                filename, content = parts.get("files", ("", b""))
+                caption = json.loads(parts.get("fileInfo", ("", b"{}"))[1] or b"{}").get("caption")
+                size = len(content)
+                with fake._lock:
+                    fake.upload_bytes += size
+                    media = {
+                        "id": len(fake.media) + 1,
+                        "documentId": f"media{len(fake.media) + 1}",
+                        "name": filename,
+                        "size": round(size / 1024, 2),
+                        "caption": caption,
+                        "url": f"/uploads/media{len(fake.media) + 1}",
+                    }
+                    fake.media.append(media)
+                self._send(201, json.dumps([media]).encode())
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def env(self, timeout=8):
+        """``STRAPI_*`` environment variables that point the app at this server."""
+        return {
+            "STRAPI_URL": self.url,
+            "STRAPI_API_TOKEN": "",
+            "STRAPI_PRODUCTS_COLLECTION": "products",
+            "STRAPI_GALLERY_COLLECTION": "galleries",
+            "STRAPI_HOME_COLLECTION": "homepages",
+            "STRAPI_TIMEOUT_SECONDS": str(timeout),
+        }
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _multipart(body, content_type):
+    """``{field: (filename, content)}`` for a ``multipart/form-data`` body."""
+    boundary = re.search(r'boundary="?([^";]+)', content_type)
+    fields = {}
+    if not boundary:
+        return fields
+    for part in body.split(b"--" + boundary.group(1).encode())[1:-1]:
+        head, _, content = part.partition(b"\r\n\r\n")
+        name = re.search(rb'name="([^"]*)"', head)
+        filename = re.search(rb'filename="([^"]*)"', head)
+        if name:
+            fields[name.group(1).decode()] = (filename.group(1).decode() if filename else "", content[:-2])
+    return fields
+
+
+def _int_param(query, key, default):
+    try:
+        return int(query.get(key, [default])[0])
+    except (TypeError, ValueError):
+        return default
+
+
+def _matches(row, filters):
+    attrs = row.get("attributes", row)
+    return all(str(attrs.get(field, row.get(field))) == value for field, value in filters.items())
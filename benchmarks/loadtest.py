@@ -0,0 +1,369 @@
+"""Concurrent load generator for the Flask site.
+
+Replays a weighted mix of realistic traffic (home page, shop listings with random
+filters, product details, search-as-you-type keystroke sequences, gallery pages)
+at a target concurrency and request rate, then reports throughput, p50/p95/p99
+latency and error rate per route.
+
+Either point it at a running deployment::
+
+    python -m benchmarks.loadtest --url https://staging.example.com --concurrency 16 --duration 60
+
+or let it start the app in-process on a local port, backed by a simulated CMS::
+
+    python -m benchmarks.loadtest --fake-cms --cms-products 5000 --cms-latency-ms 80 \\
+        --concurrency 16 --rps 50 --duration 30 --env CACHE_BACKEND=filesystem
+
+``--env`` applies to the in-process app only, so the same traffic can be replayed
+against different configurations before deploying. The overrides take precedence
+over ``.env``; the report names the cache backend the app ended up with.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import CATEGORIES  # noqa: E402
+
+DEFAULT_MIX = "home=2,shop=3,product=3,search=2,gallery=1"
+SEARCH_TERMS = ["polo", "cotton", "hoodie", "t-shirt", "jacket", "custom"]
+SIZES = ["S", "M", "L", "XL", "2XL"]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown route in --mix: {name} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not mix:
+        raise SystemExit("--mix must name at least one route")
+    return mix
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Catalog:
+    """Product ids, categories and gallery page count used to build requests."""
+
+    def __init__(self, product_ids, categories, gallery_pages=5):
+        self.product_ids = product_ids or ["000001"]
+        self.categories = categories or list(CATEGORIES)
+        self.gallery_pages = max(1, gallery_pages)
+
+    @classmethod
+    def discover(cls, session, base_url):
+        product_ids = set()
+        categories = set()
+        for page in range(1, 4):
+            try:
+                html = session.get(f"{base_url}/shop", params={"page": page}, timeout=30).text
+            except requests.RequestException:
+                break
+            product_ids.update(re.findall(r'href="/product/([^"/?]+)"', html))
+            categories.update(re.findall(r'/shop\?category=([^"&]+)"', html))
+        return cls(sorted(product_ids), sorted(categories))
+
+
+def scenario_home(rng, catalog):
+    return [("home", "/")]
+
+
+def scenario_shop(rng, catalog):
+    params = []
+    if rng.random() < 0.5:
+        params.append(f"category={rng.choice(catalog.categories)}")
+    if rng.random() < 0.3:
+        params.append(f"size={rng.choice(SIZES)}")
+    if rng.random() < 0.4:
+        params.append(f"page={rng.randint(1, 3)}")
+    return [("shop", "/shop" + ("?" + "&".join(params) if params else ""))]
+
+
+def scenario_product(rng, catalog):
+    return [("product", f"/product/{rng.choice(catalog.product_ids)}")]
+
+
+def scenario_search(rng, catalog):
+    term = rng.choice(SEARCH_TERMS)
+    # The live search box fires one request per keystroke from the second character.
+    return [("search", f"/search/api?q={term[:n]}") for n in range(2, len(term) + 1)]
+
+
+def scenario_gallery(rng, catalog):
+    return [("gallery", f"/gallery?page={rng.randint(1, catalog.gallery_pages)}")]
+
+
+SCENARIOS = {
+    "home": scenario_home,
+    "shop": scenario_shop,
+    "product": scenario_product,
+    "search": scenario_search,
+    "gallery": scenario_gallery,
+}
+
+
+class LoadRun:
+    def __init__(self, base_url, catalog, mix, concurrency, rps, duration, max_requests, timeout, seed):
+        self.base_url = base_url.rstrip("/")
+        self.catalog = catalog
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.concurrency = concurrency
+        self.rps = rps
+        self.duration = duration
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.seed = seed
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.started = 0.0
+        self.deadline = 0.0
+
+    def _next_slot(self):
+        """Reserve the next request slot; returns its scheduled start time or None when done."""
+        with self.lock:
+            if self.max_requests and self.sent >= self.max_requests:
+                return None
+            index = self.sent
+            self.sent += 1
+        scheduled = self.started + index / self.rps if self.rps else time.perf_counter()
+        if scheduled >= self.deadline:
+            return None
+        return scheduled
+
+    def _worker(self, worker_id):
+        rng = random.Random(self.seed * 7919 + worker_id)
+        session = requests.Session()
+        while True:
+            scenario = SCENARIOS[rng.choices(self.names, weights=self.weights)[0]]
+            for route, path in scenario(rng, self.catalog):
+                scheduled = self._next_slot()
+                if scheduled is None:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                begin = time.perf_counter()
+                failed = False
+                try:
+                    response = session.get(self.base_url + path, timeout=self.timeout, allow_redirects=False)
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                elapsed = time.perf_counter() - begin
+                with self.lock:
+                    self.latencies[route].append(elapsed)
+                    if failed:
+                        self.errors[route] += 1
+
+    def run(self):
+        self.started = time.perf_counter()
+        self.deadline = self.started + self.duration if self.duration else float("inf")
+        threads = [threading.Thread(target=self._worker, args=(i,), daemon=True) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - self.started)
+
+    def report(self, wall_seconds):
+        routes = {}
+        all_samples = []
+        total_errors = 0
+        for route in sorted(self.latencies):
+            samples = sorted(self.latencies[route])
+            all_samples.extend(samples)
+            errors = self.errors[route]
+            total_errors += errors
+            routes[route] = _stats(samples, errors, wall_seconds)
+        all_samples.sort()
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "concurrency": self.concurrency,
+            "target_rps": self.rps,
+            "total": _stats(all_samples, total_errors, wall_seconds),
+            "routes": routes,
+        }
+
+
+def _stats(samples, errors, wall_seconds):
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+    }
+
+
+def print_report(report, stream=sys.stdout):
+    print(
+        f"{report['wall_seconds']}s wall, concurrency={report['concurrency']}, "
+        f"target_rps={report['target_rps'] or 'unbounded'}"
+        + (f", cache={report['cache_backend']}" if report.get("cache_backend") else ""),
+        file=stream,
+    )
+    header = f"{'route':<10}{'reqs':>8}{'rps':>9}{'err%':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    print(header, file=stream)
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, s in rows:
+        print(
+            f"{route:<10}{s['requests']:>8}{s['throughput_rps']:>9.1f}{s['error_rate'] * 100:>7.2f}%"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}",
+            file=stream,
+        )
+
+
+def start_in_process(host="127.0.0.1"):
+    """Serve the Flask app from a background thread; returns (base_url, server)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import app as webapp
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, 0, webapp.app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://{host}:{server.server_port}", server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test with per-route latency percentiles.")
+    target = parser.add_argument_group("target")
+    target.add_argument("--url", default="", help="base URL of a running site (default: start the app in-process)")
+    target.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="environment override for the in-process app (repeatable)")
+    cms = parser.add_argument_group("simulated CMS (in-process only)")
+    cms.add_argument("--fake-cms", action="store_true", help="back the in-process app with benchmarks.fake_strapi")
+    cms.add_argument("--cms-products", type=int, default=1000)
+    cms.add_argument("--cms-galleries", type=int, default=300)
+    cms.add_argument("--cms-shape", default="v5", choices=["v4", "v5"])
+    cms.add_argument("--cms-latency-ms", type=float, default=0.0)
+    cms.add_argument("--cms-error-rate", type=float, default=0.0)
+    load = parser.add_argument_group("load")
+    load.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted route mix (default: {DEFAULT_MIX})")
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--rps", type=float, default=0.0, help="target requests per second (0 = as fast as possible)")
+    load.add_argument("--duration", type=float, default=30.0, help="seconds to run (0 = until --requests)")
+    load.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    load.add_argument("--timeout", type=float, default=30.0)
+    load.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="", help="also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if not args.duration and not args.requests:
+        parser.error("set --duration and/or --requests")
+    if args.url and (args.fake_cms or args.env):
+        parser.error("--fake-cms and --env only apply to the in-process app")
+
+    fake = None
+    server = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            catalog = Catalog.discover(requests.Session(), base_url)
+        else:
+            overrides = {}
+            if args.fake_cms:
+                from benchmarks.fake_strapi import FakeStrapi
+
+                fake = FakeStrapi(
+                    products=args.cms_products,
+                    galleries=args.cms_galleries,
+                    shape=args.cms_shape,
+                    latency=args.cms_latency_ms / 1000.0,
+                    error_rate=args.cms_error_rate,
+                    seed=args.seed,
+                ).start()
+                overrides.update(fake.env())
+            for item in args.env:
+                key, _, value = item.partition("=")
+                overrides[key.strip()] = value
+            # app.py reads its configuration when imported, after loading .env
+            # over the environment. The overrides go in before the import for
+            # settings read only then, and again after it so .env cannot undo
+            # them; the CMS client and cache are rebuilt from the result.
+            os.environ.update(overrides)
+            import app as webapp
+
+            os.environ.update(overrides)
+            webapp.strapi_client.set_client(webapp.strapi_client.StrapiClient.from_env())
+            webapp.cache.set_cache(webapp.cache.from_env())
+
+            base_url, server = start_in_process()
+            if args.fake_cms:
+                catalog = Catalog(
+                    [f"{i:06d}" for i in range(1, args.cms_products + 1)],
+                    list(CATEGORIES),
+                    gallery_pages=(args.cms_galleries + 11) // 12,
+                )
+            else:
+                catalog = Catalog.discover(requests.Session(), base_url)
+
+        run = LoadRun(
+            base_url,
+            catalog,
+            parse_mix(args.mix),
+            concurrency=max(1, args.concurrency),
+            rps=max(0.0, args.rps),
+            duration=args.duration,
+            max_requests=args.requests,
+            timeout=args.timeout,
+            seed=args.seed,
+        )
+        report = run.run()
+        report["target"] = args.url or "in-process"
+        if not args.url:
+            report["cache_backend"] = type(webapp.cache.get_cache()).__name__
+        if fake is not None:
+            report["cms"] = {
+                "requests": sum(fake.requests.values()),
+                "errors": sum(fake.errors.values()),
+                "latency_ms": args.cms_latency_ms,
+                "products": args.cms_products,
+            }
+        print_report(report)
+        if fake is not None:
+            print(f"CMS requests: {report['cms']['requests']} ({report['cms']['errors']} injected errors)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if fake is not None:
+            fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""End-to-end benchmark suite against a local fake Strapi server.
+
+Times ``get_shop_products`` and the ``/shop``, ``/search/api``, ``/gallery`` and
+``/product/<id>`` routes through the Flask test client, for every combination of
+catalog size and payload shape, and writes a JSON report that
+``benchmarks/compare.py`` can diff across commits.
+
+Usage:
+    python -m benchmarks.run --sizes 100,1000,10000 --shapes v4,v5 \\
+        --latency-ms 5 --error-rate 0 --iterations 5 --output benchmarks/results/head.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as webapp  # noqa: E402
+import cache  # noqa: E402
+import json_codec  # noqa: E402
+import strapi_client  # noqa: E402
+from benchmarks.fake_strapi import FakeStrapi  # noqa: E402
+
+ROUTES = [
+    ("/shop", "/shop"),
+    ("/shop?filters", "/shop?category=Custom&size=M&page=2"),
+    ("/search/api", "/search/api?q=polo"),
+    ("/gallery", "/gallery?page=2"),
+    ("/product/<id>", "/product/000001"),
+]
+
+
+def configure_env(cms, timeout=8):
+    os.environ.update(cms.env(timeout))
+    strapi_client.set_client(strapi_client.StrapiClient.from_env())
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, max(0, int(round(0.95 * len(ordered))) - 1))
+    return {
+        "min": round(ordered[0] * 1000, 3),
+        "median": round(statistics.median(ordered) * 1000, 3),
+        "p95": round(ordered[p95_index] * 1000, 3),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def time_calls(fn, iterations, cms):
+    samples = []
+    failures = 0
+    before = sum(cms.requests.values())
+    for _ in range(iterations):
+        started = time.perf_counter()
+        ok = fn()
+        samples.append(time.perf_counter() - started)
+        if not ok:
+            failures += 1
+    cms_requests = sum(cms.requests.values()) - before
+    return {
+        "ms": summarize(samples),
+        "iterations": iterations,
+        "failures": failures,
+        "cms_requests_per_call": round(cms_requests / iterations, 2),
+    }
+
+
+def run_case(size, shape, latency_ms, error_rate, iterations, gallery_size=None, warmup=1):
+    fake = FakeStrapi(
+        products=size,
+        galleries=gallery_size if gallery_size is not None else size,
+        shape=shape,
+        latency=latency_ms / 1000.0,
+        error_rate=error_rate,
+    )
+    results = []
+    with fake as cms:
+        configure_env(cms)
+        webapp.gallery_cache.clear()
+        cache.get_cache().clear()
+        client = webapp.app.test_client()
+        cases = [("get_shop_products", lambda: strapi_client.get_shop_products() is not None)]
+        for name, path in ROUTES:
+            cases.append((name, lambda path=path: client.get(path).status_code < 400))
+
+        for name, fn in cases:
+            for _ in range(warmup):
+                fn()
+            result = time_calls(fn, iterations, cms)
+            result.update({"name": name, "size": size, "shape": shape, "latency_ms": latency_ms, "error_rate": error_rate})
+            results.append(result)
+            print(
+                f"{shape:>3} size={size:<7} {name:<18} median={result['ms']['median']:>10.2f}ms "
+                f"p95={result['ms']['p95']:>10.2f}ms cms_calls={result['cms_requests_per_call']}",
+                file=sys.stderr,
+                flush=True,
+            )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the site against a fake Strapi server.")
+    parser.add_argument("--sizes", default="100,1000", help="comma-separated catalog sizes (100 to 100000)")
+    parser.add_argument("--shapes", default="v4,v5", help="comma-separated payload shapes: v4, v5")
+    parser.add_argument("--gallery-size", type=int, default=None, help="gallery rows (defaults to catalog size)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="artificial CMS latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of CMS requests answered with 500")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default="", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for shape in [s.strip() for s in args.shapes.split(",") if s.strip()]:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            results.extend(
+                run_case(size, shape, args.latency_ms, args.error_rate, args.iterations, args.gallery_size, args.warmup)
+            )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": json_codec.BACKEND,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    body = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(body + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
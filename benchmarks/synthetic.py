@@ -0,0 +1,102 @@
+"""Synthetic Strapi payloads shaped like the live ``products`` / ``galleries`` collections."""
+
+import random
+
+COLORS = ["Black", "Navy", "White", "Bottle Green", "Burgundy", "Charcoal Melange", "Royal Blue", "Maroon"]
+CATEGORIES = ["Custom", "Corporate Uniforms", "School Uniforms", "Sports Uniforms", "Men", "Women", "Kids"]
+FABRICS = ["Cotton", "Polyester", "Dri-Fit", "Pique", "Lycra", "Linen"]
+STYLES = ["Polo", "T-Shirt", "Hoodie", "Jacket", "Shirt", "Trouser", "Cap"]
+
+
+def _media_file(file_id, path):
+    return {
+        "id": file_id,
+        "documentId": f"media{file_id}",
+        "name": path.rsplit("/", 1)[-1],
+        "url": path,
+        "mime": "image/png",
+        "size": 120.5,
+    }
+
+
+def _wrap_media(value):
+    """Convert a v5 media value (file or list of files) to the v4 ``{"data": ...}`` shape."""
+    if isinstance(value, list):
+        return {"data": [{"id": item["id"], "attributes": item} for item in value]}
+    if isinstance(value, dict):
+        return {"data": {"id": value["id"], "attributes": value}}
+    return {"data": None}
+
+
+def product_row(index, shape="v5", colors_per_product=3, rng=None):
+    rng = rng or random.Random(index)
+    fabric = rng.choice(FABRICS)
+    style = rng.choice(STYLES)
+    gsm = rng.choice([160, 180, 200, 220, 240])
+    colors = rng.sample(COLORS, k=min(colors_per_product, len(COLORS)))
+    base_id = index * 100
+    images = []
+    for offset, color in enumerate(colors):
+        media = [_media_file(base_id + offset * 10 + n, f"/uploads/p{index}_{color.replace(' ', '_')}_{n}.png") for n in range(2)]
+        images.append(
+            {
+                "id": base_id + offset,
+                "color": color,
+                "image_alt": f"{fabric} {style} {color}",
+                "image": _wrap_media(media) if shape == "v4" else media,
+            }
+        )
+    cover = _media_file(base_id + 99, f"/uploads/p{index}_cover.png")
+    attrs = {
+        "external_id": f"{index:06d}",
+        "name": f"{fabric} {style} {gsm} GSM",
+        "category": rng.choice(CATEGORIES),
+        "keywords": [f"{style} {fabric}", f"Custom {style}", f"{gsm} GSM"],
+        "desc": f"Premium {fabric.lower()} {style.lower()} built for everyday branding.",
+        "description": f"Our {fabric.lower()} {style.lower()} at {gsm} GSM offers comfort and durability.",
+        "price": "72 Hours Delivery",
+        "sizes": ["S", "M", "L", "XL", "2XL"],
+        "extended_sizes": ["XS", "3XL", "4XL"],
+        "extended_moq": "100 MOQ",
+        "image_alt": f"{fabric} {style}",
+        "decorations": ["DTF (No MOQ)", "Embroidery (10 MOQ)"],
+        "delivery_time": rng.choice(["72 Hours Delivery", "7 Days Delivery"]),
+        "instructions": ["Machine wash cold"],
+        "discount": "",
+        "colors_available": str(len(colors)),
+        "custom_color": "",
+        "product_details": [f"{gsm} GSM", f"100% {fabric}"],
+        "images": images,
+        "image_path": _wrap_media(cover) if shape == "v4" else cover,
+        "createdAt": "2025-01-01T00:00:00.000Z",
+        "updatedAt": "2025-01-02T00:00:00.000Z",
+        "publishedAt": "2025-01-02T00:00:00.000Z",
+    }
+    if shape == "v4":
+        return {"id": index, "attributes": attrs}
+    return {"id": index, "documentId": f"doc{index:06d}", **attrs}
+
+
+def gallery_row(index, shape="v5", rng=None):
+    rng = rng or random.Random(index)
+    color = rng.choice(COLORS)
+    media = _media_file(500000 + index, f"/uploads/gallery_{index}_{color.replace(' ', '_')}.png")
+    attrs = {
+        "title": f"Gallery {index}",
+        "color": color,
+        "sort_order": index,
+        "image": _wrap_media(media) if shape == "v4" else media,
+    }
+    if shape == "v4":
+        return {"id": index, "attributes": attrs}
+    return {"id": index, "documentId": f"gal{index:06d}", **attrs}
+
+
+def product_rows(count, shape="v5", seed=0):
+    rng = random.Random(seed)
+    return [product_row(i, shape=shape, rng=rng) for i in range(1, count + 1)]
+
+
+def gallery_rows(count, shape="v5", seed=0):
+    rng = random.Random(seed)
+    return [gallery_row(i, shape=shape, rng=rng) for i in range(1, count + 1)]
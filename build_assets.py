@@ -0,0 +1,479 @@
+"""Build the CSS/JS bundles and critical CSS listed in ``assets.py``.
+
+    python build_assets.py [--no-scss] [--no-critical]
+
+Steps:
+
+1. Compile ``static/scss/style.scss`` to ``static/css/style.css`` with the
+   Dart Sass CLI (``SASS_BINARY``, else ``sass`` on ``PATH``). libsass cannot
+   compile this SCSS. Without the CLI the committed ``style.css`` is used.
+2. Concatenate each bundle in ``assets.BUNDLES``. CSS is minified and its
+   ``url()``s are rebased to ``static/dist/``. JS is minified with ``rjsmin``
+   when installed; sources already named ``.min.js`` are only concatenated.
+3. For each page in ``assets.CRITICAL``, render the page and keep the rules of
+   its stylesheets whose selectors only use tags, classes, ids and attributes
+   found above the fold.
+4. Write everything to ``static/dist/`` under content-hashed names and record
+   them in ``static/dist/manifest.json``, which the templates read at start.
+   Files from older builds are removed.
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+from html.parser import HTMLParser
+
+try:
+    import rjsmin
+except ImportError:  # optional: JS bundles are then concatenated unminified
+    rjsmin = None
+
+import assets
+import json_codec
+
+STATIC_DIR = assets.STATIC_DIR
+DIST_DIR = assets.DIST_DIR
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+# -- SCSS -------------------------------------------------------------------
+
+def compile_scss():
+    """Compile the site SCSS; ``False`` when no Sass CLI is available."""
+    sass = os.getenv("SASS_BINARY") or shutil.which("sass")
+    if not sass:
+        print("sass not found (set SASS_BINARY or install dart-sass); using the committed css/style.css")
+        return False
+    subprocess.run([sass, "--style=expanded", "scss/style.scss", "css/style.css"], cwd=STATIC_DIR, check=True)
+    return True
+
+
+# -- CSS parsing --------------------------------------------------------------
+
+def _skip_string(text, i):
+    """Index just past the string literal starting at ``text[i]``."""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == "\\" else 1
+    return i + 1
+
+
+def strip_comments(css):
+    out = []
+    i = 0
+    while i < len(css):
+        ch = css[i]
+        if ch in "\"'":
+            end = _skip_string(css, i)
+            out.append(css[i:end])
+            i = end
+        elif css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = len(css) if end == -1 else end + 2
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def squash(text):
+    """Collapse whitespace outside strings and drop it around punctuation."""
+    out = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "\"'":
+            end = _skip_string(text, i)
+            out.append(text[i:end])
+            i = end
+        elif ch.isspace():
+            while i < len(text) and text[i].isspace():
+                i += 1
+            if out and out[-1][-1:] not in "{};:,>(" and i < len(text) and text[i] not in "{};,>)!":
+                out.append(" ")
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out).strip()
+
+
+def _find(text, i, stops):
+    """Index of the first ``stops`` character at paren depth 0, skipping strings."""
+    depth = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "\"'":
+            i = _skip_string(text, i)
+            continue
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif depth <= 0 and ch in stops:
+            return i
+        i += 1
+    return len(text)
+
+
+def _block_end(text, i):
+    """Index of the ``}`` closing the block whose ``{`` is at ``text[i]``."""
+    depth = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "\"'":
+            i = _skip_string(text, i)
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(text)
+
+
+def parse_css(css):
+    """Parse comment-free CSS into nodes.
+
+    Nodes are ``("rule", selectors, declarations)``, ``("group", prelude, children)``
+    for ``@media``/``@supports``/``@layer`` blocks, ``("block", prelude, body)``
+    for other at-rules with a body (``@font-face``, ``@keyframes``) and
+    ``("statement", text)`` for ``@import``/``@charset``.
+    """
+    nodes = []
+    i = 0
+    while i < len(css):
+        while i < len(css) and (css[i].isspace() or css[i] == ";"):
+            i += 1
+        if i >= len(css):
+            break
+        end = _find(css, i, "{;}")
+        prelude = squash(css[i:end])
+        if end >= len(css) or css[end] != "{":
+            if prelude.startswith("@"):
+                nodes.append(("statement", prelude))
+            i = end + 1
+            continue
+        close = _block_end(css, end)
+        body = css[end + 1:close]
+        if re.match(r"@(?:-\w+-)?(?:media|supports|layer|document|container)\b", prelude):
+            nodes.append(("group", prelude, parse_css(body)))
+        elif prelude.startswith("@"):
+            nodes.append(("block", prelude, body))
+        else:
+            nodes.append(("rule", split_selectors(prelude), body))
+        i = close + 1
+    return nodes
+
+
+def split_selectors(prelude):
+    selectors = []
+    i = 0
+    while i <= len(prelude):
+        end = _find(prelude, i, ",")
+        selectors.append(prelude[i:end].strip())
+        i = end + 1
+    return [selector for selector in selectors if selector]
+
+
+def minify_declarations(body):
+    declarations = []
+    i = 0
+    while i < len(body):
+        end = _find(body, i, ";")
+        name, colon, value = squash(body[i:end]).partition(":")
+        if name:
+            declarations.append(name.rstrip() + colon + value)
+        i = end + 1
+    return ";".join(declarations)
+
+
+def serialize(nodes):
+    out = []
+    for node in nodes:
+        kind = node[0]
+        if kind == "statement":
+            out.append(node[1] + ";")
+        elif kind == "rule":
+            out.append(",".join(node[1]) + "{" + minify_declarations(node[2]) + "}")
+        elif kind == "group":
+            inner = serialize(node[2])
+            if inner:
+                out.append(node[1] + "{" + inner + "}")
+        elif node[1].startswith(("@font-face", "@page")):
+            out.append(node[1] + "{" + minify_declarations(node[2]) + "}")
+        else:
+            out.append(node[1] + "{" + serialize(parse_css(node[2])) + "}")
+    return "".join(out)
+
+
+URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]*)\1\s*\)""")
+
+
+def rebase_urls(css, source_dir, locate):
+    """Rewrite relative ``url()``s in CSS loaded from ``source_dir`` (relative to static/).
+
+    ``locate(path)`` maps the static-relative target to the URL to emit. Absolute,
+    protocol-relative, ``data:`` and fragment-only URLs are left alone.
+    """
+    def replace(match):
+        url = match.group(2).strip()
+        if not url or re.match(r"(?:[a-z][a-z0-9+.-]*:|/|#)", url, re.I):
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        target = posixpath.normpath(posixpath.join(source_dir, path))
+        return f'url("{locate(target)}{suffix}")'
+
+    return URL_RE.sub(replace, css)
+
+
+def build_css(sources):
+    """Concatenate and minify ``sources`` (relative to static/) for serving from dist/."""
+    statements, licenses, bodies = [], [], []
+    for filename in sources:
+        with open(STATIC_DIR / filename, encoding="utf-8") as f:
+            css = f.read()
+        css = rebase_urls(css, posixpath.dirname(filename), lambda path: posixpath.relpath(path, "dist"))
+        licenses.extend(re.findall(r"/\*!.*?\*/", css, re.S))
+        for node in parse_css(strip_comments(css)):
+            if node[0] == "statement":
+                # @charset and @import are only valid at the top of a stylesheet.
+                if node[1].startswith("@import") and node[1] not in statements:
+                    statements.append(node[1])
+            else:
+                bodies.append(node)
+    return ('@charset "UTF-8";' + "".join(license + "\n" for license in licenses)
+            + "".join(statement + ";" for statement in statements) + serialize(bodies))
+
+
+# -- JS -------------------------------------------------------------------------
+
+def build_js(sources):
+    parts = []
+    for filename in sources:
+        with open(STATIC_DIR / filename, encoding="utf-8") as f:
+            js = f.read()
+        js = re.sub(r"^\s*//[#@] sourceMappingURL=.*$", "", js, flags=re.M).strip()
+        if rjsmin is not None and not filename.endswith(".min.js"):
+            js = rjsmin.jsmin(js, keep_bang_comments=True)
+        parts.append(js)
+    # The separator ends a source that lacks a trailing semicolon before the next one starts.
+    return "\n;\n".join(parts) + "\n"
+
+
+# -- Critical CSS -------------------------------------------------------------
+
+class FoldScanner(HTMLParser):
+    """Collect the tags, classes, ids and attribute names above the fold.
+
+    The fold is everything in ``<body>`` before ``<main>`` plus the first
+    ``main_children`` top-level children of ``<main>``.
+    """
+
+    def __init__(self, main_children):
+        super().__init__()
+        self.main_children = main_children
+        self.tags, self.classes, self.ids, self.attrs = {"html", "body"}, set(), set(), set()
+        self._stack = []
+        self._main_depth = None
+        self._children = 0
+        self._in_body = False
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self._in_body = True
+        if self._done:
+            return
+        if self._main_depth is not None and len(self._stack) == self._main_depth:
+            self._children += 1
+            if self._children > self.main_children:
+                self._done = True
+                return
+        if tag == "main" and self._main_depth is None:
+            self._main_depth = len(self._stack) + 1
+        if self._in_body:
+            self.tags.add(tag)
+            for name, value in attrs:
+                self.attrs.add(name)
+                if name == "class" and value:
+                    self.classes.update(value.split())
+                elif name == "id" and value:
+                    self.ids.add(value)
+        if tag not in VOID_TAGS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if not self._done and tag not in VOID_TAGS and self._stack and self._stack[-1] == tag:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag in self._stack:
+            while self._stack.pop() != tag:
+                pass
+        if tag == "main" and self._main_depth is not None:
+            self._done = True
+
+
+PSEUDO_RE = re.compile(r"::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?")
+ATTR_RE = re.compile(r"\[\s*([\w-]+)[^\]]*\]")
+
+
+def selector_used(selector, scanner):
+    """``True`` when every simple selector in ``selector`` names something the fold has."""
+    attrs = ATTR_RE.findall(selector)
+    selector = PSEUDO_RE.sub("", ATTR_RE.sub("", selector))
+    classes = re.findall(r"\.(-?[_a-zA-Z][\w-]*)", selector)
+    ids = re.findall(r"#(-?[_a-zA-Z][\w-]*)", selector)
+    tags = re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", selector)
+    return (set(classes) <= scanner.classes and set(ids) <= scanner.ids
+            and {tag.lower() for tag in tags} <= scanner.tags and set(attrs) <= scanner.attrs)
+
+
+def critical_nodes(nodes, scanner):
+    kept = []
+    for node in nodes:
+        kind = node[0]
+        if kind == "rule":
+            selectors = [selector for selector in node[1] if selector_used(selector, scanner)]
+            if selectors:
+                kept.append(("rule", selectors, node[2]))
+        elif kind == "group":
+            children = critical_nodes(node[2], scanner)
+            if children:
+                kept.append(("group", node[1], children))
+    return kept
+
+
+def at_blocks_used(nodes, kept_css):
+    """``@font-face`` and ``@keyframes`` blocks that ``kept_css`` refers to."""
+    used = []
+    for node in nodes:
+        if node[0] == "block" and node[1].startswith("@font-face"):
+            family = re.search(r"font-family\s*:\s*['\"]?([^;'\"]+)", node[2])
+            if family and family.group(1).strip() in kept_css:
+                used.append(node)
+        elif node[0] == "block" and re.match(r"@(?:-\w+-)?keyframes\b", node[1]):
+            name = node[1].split(None, 1)[-1]
+            if re.search(r"animation[\w-]*:[^;}]*\b" + re.escape(name) + r"\b", kept_css):
+                used.append(node)
+    return used
+
+
+def extract_critical(css, html, main_children):
+    """Rules of (dist-relative, minified) ``css`` needed to paint the fold of ``html``."""
+    scanner = FoldScanner(main_children)
+    scanner.feed(html)
+    nodes = parse_css(strip_comments(css))
+    kept = serialize(critical_nodes(nodes, scanner))
+    critical = serialize(at_blocks_used(nodes, kept)) + kept
+    # Inlined into the page, so URLs must be absolute and the text must not end the <style>.
+    critical = rebase_urls(critical, "dist", lambda path: "/static/" + path)
+    return critical.replace("</", "<\\/")
+
+
+def render_page(url):
+    import app  # imported lazily: bundling alone needs no app configuration
+
+    with app.app.test_client() as client:
+        response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return response.get_data(as_text=True)
+
+
+# -- Output -------------------------------------------------------------------------
+
+def write_hashed(name, content):
+    """Write ``content`` to ``dist/<stem>.<hash><ext>``; return the static-relative path."""
+    data = content.encode("utf-8")
+    stem, ext = posixpath.splitext(name)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+    with open(DIST_DIR / filename, "wb") as f:
+        f.write(data)
+    return f"dist/{filename}"
+
+
+def blocking_css_bytes(page, manifest):
+    """Raw and gzipped size of the stylesheets that block ``page``'s first paint."""
+    if manifest is None:
+        chunks = [(STATIC_DIR / source).read_bytes()
+                  for bundle in assets.PAGES[page]["css"] + assets.PAGES["header"]["css"]
+                  for source in assets.BUNDLES[bundle]]
+    else:
+        bundles = assets.PAGES["header"]["css"]
+        if page not in manifest["critical"]:
+            bundles = assets.PAGES[page]["css"] + bundles
+        chunks = [(STATIC_DIR / manifest["bundles"][bundle]).read_bytes() for bundle in bundles]
+        if page in manifest["critical"]:
+            chunks.append((STATIC_DIR / manifest["critical"][page]).read_bytes())
+    data = b"".join(chunks)
+    return len(data), len(gzip.compress(data))
+
+
+def request_count(page, manifest):
+    bundles = assets.PAGES[page]["css"] + assets.PAGES[page]["js"] + assets.PAGES["header"]["css"]
+    if manifest is None:
+        return sum(len(assets.BUNDLES[bundle]) for bundle in bundles)
+    return len(bundles)
+
+
+def remove_stale(keep):
+    for path in DIST_DIR.iterdir():
+        if path.name != "manifest.json" and f"dist/{path.name}" not in keep:
+            path.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-scss", action="store_true", help="use the committed css/style.css as is")
+    parser.add_argument("--no-critical", action="store_true", help="skip critical CSS extraction")
+    args = parser.parse_args(argv)
+
+    if not args.no_scss:
+        compile_scss()
+    if rjsmin is None:
+        print("rjsmin not installed; JS bundles are concatenated without minifying")
+    DIST_DIR.mkdir(exist_ok=True)
+
+    contents = {}
+    bundles = {}
+    for name, sources in assets.BUNDLES.items():
+        contents[name] = build_css(sources) if name.endswith(".css") else build_js(sources)
+        bundles[name] = write_hashed(name, contents[name])
+        print(f"{bundles[name]:<40} {len(contents[name]):>9,} bytes  ({len(sources)} sources)")
+
+    critical = {}
+    if not args.no_critical:
+        for page, (url, main_children) in assets.CRITICAL.items():
+            html = render_page(url)
+            css = "".join(contents[bundle] for bundle in assets.PAGES[page]["css"])
+            critical[page] = write_hashed(f"critical-{page}.css", extract_critical(css, html, main_children))
+            print(f"{critical[page]:<40} {os.path.getsize(STATIC_DIR / critical[page]):>9,} bytes  (inlined on {url})")
+
+    version = hashlib.sha256("".join(sorted(bundles.values()) + sorted(critical.values())).encode()).hexdigest()[:10]
+    manifest = {"version": version, "bundles": bundles, "critical": critical}
+    remove_stale(set(bundles.values()) | set(critical.values()))
+    tmp_path = DIST_DIR / "manifest.json.tmp"
+    tmp_path.write_bytes(json_codec.dumps_bytes(manifest))
+    os.replace(tmp_path, assets.MANIFEST_PATH)
+    print(f"wrote {assets.MANIFEST_PATH.relative_to(assets.PROJECT_ROOT)} (version {version})")
+
+    for page in assets.CRITICAL:
+        before, after = blocking_css_bytes(page, None), blocking_css_bytes(page, manifest)
+        print(f"{page}: {request_count(page, None)} -> {request_count(page, manifest)} CSS/JS requests; "
+              f"render-blocking CSS {before[0]:,} -> {after[0]:,} bytes ({before[1]:,} -> {after[1]:,} gzipped)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
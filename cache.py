@@ -0,0 +1,557 @@
+"""Cache layer shared by the CMS loaders and rendered template fragments.
+
+    store = cache.get_cache()                      # backend chosen by CACHE_BACKEND
+    home = store.get_or_compute("cms:homepage", fetch, ttl=60, tags=("cms",))
+    store.invalidate_tag("cms")                    # e.g. from a Strapi webhook
+
+Every backend has ``get``/``set``/``delete`` with a TTL per entry, and tags.
+An entry remembers the version of each of its tags when it was computed.
+``invalidate_tag`` bumps the version, so every entry carrying that tag reads
+as a miss from then on, in every process sharing the backend.
+
+``get_or_compute`` is single-flight. Within a process, one thread per key
+computes and the others wait for its result. ``FileCache`` and ``RedisCache``
+also take a short-lived lock entry, so one process per host (filesystem) or
+per cluster (Redis) computes while the others poll for the value. ``None`` is
+never cached, so a failed CMS fetch is retried by the next caller.
+
+Backends, selected with ``CACHE_BACKEND``:
+
+- ``memory`` (default): per-process LRU bounded by ``CACHE_MAX_BYTES``,
+  sized by pickled length (text by its length). A value larger than the
+  whole cache is not stored: it is logged once per key and counted in
+  ``cache_oversize_total``, and every caller recomputes it. Set the limit
+  above the pickled CMS catalog, the largest entry.
+- ``filesystem``: pickled files under ``CACHE_DIR``, shared by the processes
+  of one host and kept across restarts.
+- ``redis``: ``CACHE_REDIS_URL``, needs ``pip install redis``. Any client
+  with the redis-py API (``fakeredis.FakeRedis()`` in tests) can be passed
+  as ``client``.
+
+The shared backends keep a process-local memo of decoded entries in front of
+the storage, bounded by ``CACHE_MAX_BYTES`` of stored size. It is keyed on the
+stored entry's version (the file's inode, mtime and size, or a token written
+ahead of the Redis value), so a warm worker checks the version and unpickles
+nothing until another process writes the entry. Like ``memory``, every hit
+then returns the same object, which callers must not mutate.
+
+The filesystem and Redis backends unpickle what they read. Point them only
+at storage this application alone writes to.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import metrics
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+
+def _metric_name(key):
+    # "cms:homepage:https://cms..." -> "cms:homepage"
+    return ":".join(key.split(":", 2)[:2])
+
+
+class Cache:
+    """Base class: TTL, tags and single-flight on top of a backend's storage primitives."""
+
+    name = "cache"
+
+    def __init__(self, default_ttl=300, lock_seconds=30, poll_seconds=0.05):
+        self.default_ttl = default_ttl
+        self.lock_seconds = lock_seconds
+        self.poll_seconds = poll_seconds
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    # -- backend primitives ---------------------------------------------------
+
+    def _load(self, key):
+        """``(value, tag_versions)`` or ``None`` when absent or expired."""
+        raise NotImplementedError
+
+    def _store(self, key, value, ttl, tag_versions):
+        raise NotImplementedError
+
+    def _remove(self, key):
+        raise NotImplementedError
+
+    def _tag_versions(self, tags):
+        raise NotImplementedError
+
+    def _bump_tags(self, tags):
+        raise NotImplementedError
+
+    def _try_lock(self, key):
+        return True
+
+    def _unlock(self, key):
+        pass
+
+    def clear(self):
+        raise NotImplementedError
+
+    # -- public API -----------------------------------------------------------
+
+    def get(self, key, default=None):
+        entry = self._load(key)
+        if entry is None:
+            return default
+        value, tag_versions = entry
+        if tag_versions and self._tag_versions(tag_versions) != tag_versions:
+            self._remove(key)
+            return default
+        return value
+
+    def set(self, key, value, ttl=None, tags=()):
+        """Store ``value`` for ``ttl`` seconds (``default_ttl`` if ``None``; ``<= 0`` stores nothing)."""
+        self._set(key, value, ttl, self._tag_versions(tags) if tags else {})
+
+    def _set(self, key, value, ttl, tag_versions):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl > 0 and value is not None:
+            self._store(key, value, ttl, tag_versions)
+
+    def delete(self, key):
+        self._remove(key)
+
+    def invalidate_tag(self, *tags):
+        self._bump_tags(tags)
+
+    def after_fork(self):
+        """Called in a forked worker to drop connections inherited from the parent."""
+
+    def get_or_compute(self, key, compute, ttl=None, tags=()):
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            metrics.record_cache(_metric_name(key), "hit")
+            return value
+        with self._flight(key):
+            value = self.get(key, MISSING)  # computed by the thread we waited for
+            if value is not MISSING:
+                metrics.record_cache(_metric_name(key), "hit")
+                return value
+            metrics.record_cache(_metric_name(key), "miss")
+            locked = self._try_lock(key)
+            try:
+                if not locked:
+                    value = self._wait_for(key)
+                    if value is not MISSING:
+                        return value
+                # Versions are read before computing, so an invalidation that
+                # lands while we compute still marks the result stale.
+                tag_versions = self._tag_versions(tags) if tags else {}
+                value = compute()
+                self._set(key, value, ttl, tag_versions)
+                return value
+            finally:
+                if locked:
+                    self._unlock(key)
+
+    @contextmanager
+    def _flight(self, key):
+        with self._flights_lock:
+            lock, users = self._flights.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._flights[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flights_lock:
+                lock, users = self._flights[key]
+                if users == 1:
+                    del self._flights[key]
+                else:
+                    self._flights[key] = (lock, users - 1)
+
+    def _wait_for(self, key):
+        """Poll while another process computes ``key``; ``MISSING`` if its lock expires first."""
+        deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_seconds)
+            value = self.get(key, MISSING)
+            if value is not MISSING:
+                return value
+            if self._try_lock(key):
+                self._unlock(key)  # the other process gave up; compute ourselves
+                return MISSING
+        return MISSING
+
+
+def _sizeof(value):
+    if isinstance(value, (str, bytes)):
+        return len(value)  # rendered fragments: no need to pickle a copy
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _Memo:
+    """Decoded entries by key, valid only while the stored entry's version matches."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, decoded, size):
+        """``size`` is the stored length, which the backend already has in hand."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (version, decoded, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+
+    def discard(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class MemoryCache(Cache):
+    """Per-process LRU holding at most ``max_bytes`` of (pickled-size) values."""
+
+    name = "memory"
+
+    def __init__(self, max_bytes=64 << 20, **kwargs):
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._oversize = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires, tag_versions, size = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value, tag_versions
+
+    def _store(self, key, value, ttl, tag_versions):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            metrics.CACHE_OVERSIZE.inc((self.name,))
+            if key not in self._oversize:
+                self._oversize.add(key)
+                logger.warning(
+                    "Not caching %s: %d bytes exceeds CACHE_MAX_BYTES=%d; it is recomputed on every request",
+                    key, size, self.max_bytes,
+                )
+            return
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            self._entries[key] = (value, time.monotonic() + ttl, tag_versions, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, _, old_size) = self._entries.popitem(last=False)
+                self.bytes -= old_size
+                evicted += 1
+        if evicted:
+            metrics.CACHE_EVICTIONS.inc((self.name,), evicted)
+
+    def _remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[3]
+
+    def _tag_versions(self, tags):
+        return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def _bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FileCache(Cache):
+    """One pickled file per entry under ``directory``; shared by a host's processes."""
+
+    name = "filesystem"
+
+    def __init__(self, directory, memo_bytes=64 << 20, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = Path(directory)
+        self._memo = _Memo(memo_bytes)
+        for sub in ("entries", "tags", "locks"):
+            (self.directory / sub).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, kind, key):
+        digest = _digest(key)
+        if kind == "entries":
+            return self.directory / kind / digest[:2] / digest
+        return self.directory / kind / digest
+
+    def _write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _version(path):
+        # os.replace publishes a new inode, so this changes on every write.
+        st = os.stat(path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load(self, key):
+        path = self._path("entries", key)
+        try:
+            version = self._version(path)
+            entry = self._memo.get(key, version)
+            if entry is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+                entry = pickle.loads(data)
+                # A write between the stat and the read only costs one more decode later.
+                self._memo.put(key, version, entry, len(data))
+        except FileNotFoundError:
+            self._memo.discard(key)
+            return None
+        except Exception as exc:  # truncated or from an incompatible release
+            logger.warning("Dropping unreadable cache entry %s: %s", path, exc)
+            self._remove(key)
+            return None
+        expires, tag_versions, value = entry
+        if expires <= time.time():
+            self._remove(key)
+            return None
+        return value, tag_versions
+
+    def _store(self, key, value, ttl, tag_versions):
+        entry = (time.time() + ttl, tag_versions, value)
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        path = self._path("entries", key)
+        self._write(path, data)
+        try:
+            self._memo.put(key, self._version(path), entry, len(data))
+        except FileNotFoundError:  # already replaced or removed by another process
+            self._memo.discard(key)
+
+    def _remove(self, key):
+        self._memo.discard(key)
+        try:
+            os.unlink(self._path("entries", key))
+        except FileNotFoundError:
+            pass
+
+    def _tag_versions(self, tags):
+        versions = {}
+        for tag in tags:
+            try:
+                versions[tag] = self._path("tags", tag).read_text()
+            except FileNotFoundError:
+                versions[tag] = ""
+        return versions
+
+    def _bump_tags(self, tags):
+        for tag in tags:
+            # A random token instead of a counter: no read-modify-write race between processes.
+            self._write(self._path("tags", tag), os.urandom(8).hex().encode())
+
+    def _try_lock(self, key):
+        path = self._path("locks", key)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime < self.lock_seconds:
+                        return False
+                    path.unlink()  # left behind by a process that died mid-compute
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def _unlock(self, key):
+        try:
+            os.unlink(self._path("locks", key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        self._memo.clear()
+        shutil.rmtree(self.directory / "entries", ignore_errors=True)
+        (self.directory / "entries").mkdir(parents=True, exist_ok=True)
+
+
+class RedisCache(Cache):
+    """Entries in Redis under ``prefix``; TTLs are Redis expiries.
+
+    Each value is stored as a random ``VERSION_BYTES`` token followed by the
+    pickle, so a memoized entry is revalidated with a ``GETRANGE`` of the token.
+    """
+
+    name = "redis"
+    VERSION_BYTES = 8
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="abc:", client=None, memo_bytes=64 << 20, **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._token = f"{os.getpid()}-{os.urandom(4).hex()}"
+        self._memo = _Memo(memo_bytes)
+
+    def after_fork(self):
+        # Sharing the parent's sockets would interleave both processes' replies, and
+        # sharing its token would let one worker release another's compute lock.
+        self.client.connection_pool.disconnect()
+        self._token = f"{os.getpid()}-{os.urandom(4).hex()}"
+
+    def _load(self, key):
+        # "e:" rather than the older unversioned "v:" values, which are left to expire.
+        redis_key = self.prefix + "e:" + key
+        version = self.client.getrange(redis_key, 0, self.VERSION_BYTES - 1)
+        if not version:
+            self._memo.discard(key)
+            return None
+        entry = self._memo.get(key, version)
+        if entry is None:
+            data = self.client.get(redis_key)
+            if data is None:
+                self._memo.discard(key)
+                return None
+            version, entry = data[:self.VERSION_BYTES], pickle.loads(data[self.VERSION_BYTES:])
+            self._memo.put(key, version, entry, len(data))
+        tag_versions, value = entry
+        return value, tag_versions
+
+    def _store(self, key, value, ttl, tag_versions):
+        entry = (tag_versions, value)
+        version = os.urandom(self.VERSION_BYTES)
+        data = version + pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        self.client.set(self.prefix + "e:" + key, data, px=max(int(ttl * 1000), 1))
+        self._memo.put(key, version, entry, len(data))
+
+    def _remove(self, key):
+        self._memo.discard(key)
+        self.client.delete(self.prefix + "e:" + key)
+
+    def _tag_versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self.client.mget([self.prefix + "t:" + tag for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def _bump_tags(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + "t:" + tag)
+
+    def _try_lock(self, key):
+        return bool(self.client.set(self.prefix + "l:" + key, self._token, nx=True,
+                                    px=int(self.lock_seconds * 1000)))
+
+    def _unlock(self, key):
+        lock_key = self.prefix + "l:" + key
+        value = self.client.get(lock_key)
+        if value is not None and value.decode() == self._token:
+            self.client.delete(lock_key)
+
+    def clear(self):
+        self._memo.clear()
+        for key in self.client.scan_iter(match=self.prefix + "e:*"):
+            self.client.delete(key)
+
+
+def from_env():
+    backend = os.getenv("CACHE_BACKEND", "memory").strip().lower() or "memory"
+    default_ttl = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+    max_bytes = int(os.getenv("CACHE_MAX_BYTES", str(64 << 20)))
+    if backend == "memory":
+        return MemoryCache(max_bytes=max_bytes, default_ttl=default_ttl)
+    if backend == "filesystem":
+        directory = os.getenv("CACHE_DIR", "").strip() or PROJECT_ROOT / ".cache"
+        return FileCache(directory, memo_bytes=max_bytes, default_ttl=default_ttl)
+    if backend == "redis":
+        return RedisCache(
+            url=os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0").strip(),
+            prefix=os.getenv("CACHE_PREFIX", "abc:"),
+            memo_bytes=max_bytes,
+            default_ttl=default_ttl,
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r} (expected memory, filesystem or redis)")
+
+
+_default = None
+
+
+def get_cache():
+    global _default
+    if _default is None:
+        _default = from_env()
+    return _default
+
+
+def set_cache(store):
+    global _default
+    _default = store
@@ -0,0 +1,134 @@
+"""Fixed-size journal of recent outbound Strapi calls for ``/debug/strapi-calls``.
+
+Each entry records the URL (credentials redacted), status, bytes, duration,
+cache outcome, and the route and request that triggered the call. Callers
+that fetch on behalf of a cache wrap the fetch in ``cache_outcome("miss")``
+(or ``"stale"`` when refreshing a value that is still being served). Calls
+made outside any cache are journaled as ``"none"``. Cache hits make no
+outbound call, so they never appear here. Grouping
+by request makes N+1 patterns visible: a route whose ``max_calls_per_request``
+grows with page size is fetching per item.
+"""
+
+import contextvars
+import itertools
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+_SECRET_PARAM = re.compile(r"token|secret|password|key|signature", re.IGNORECASE)
+_request_ids = itertools.count(1)
+_lock = threading.Lock()
+_entries = deque(maxlen=500)
+_cache_outcome = contextvars.ContextVar("cms_journal_cache_outcome", default="none")
+
+
+def configure(size):
+    """Resize the journal; ``0`` disables recording."""
+    global _entries
+    with _lock:
+        _entries = deque(_entries, maxlen=max(int(size), 0))
+
+
+@contextmanager
+def cache_outcome(outcome):
+    """Journal the CMS calls made inside the block with cache outcome ``outcome``."""
+    token = _cache_outcome.set(outcome)
+    try:
+        yield
+    finally:
+        _cache_outcome.reset(token)
+
+
+def redact(url):
+    parts = urlsplit(url)
+    netloc = parts.netloc
+    if "@" in netloc:
+        netloc = "***@" + netloc.rsplit("@", 1)[1]
+    query = parts.query
+    if query and _SECRET_PARAM.search(query):
+        query = urlencode(
+            [(k, "***" if _SECRET_PARAM.search(k) else v) for k, v in parse_qsl(query, keep_blank_values=True)],
+            safe="[]$*:",
+        )
+    return urlunsplit((parts.scheme, netloc, parts.path, query, parts.fragment))
+
+
+def _request_origin():
+    try:
+        from flask import g, has_request_context, request
+    except ImportError:  # pragma: no cover - scripts without Flask
+        return None, None
+    if not has_request_context():
+        return None, None
+    request_id = g.get("_cms_journal_request")
+    if request_id is None:
+        request_id = g._cms_journal_request = next(_request_ids)
+    return request.endpoint or "unmatched", request_id
+
+
+def record(url, status, size, seconds, cache=None):
+    if not _entries.maxlen:
+        return
+    route, request_id = _request_origin()
+    entry = {
+        "at": round(time.time(), 3),
+        "url": redact(url),
+        "collection": metrics.collection_from_url(url),
+        "status": status,
+        "bytes": size,
+        "ms": round(seconds * 1000, 1),
+        "cache": cache or _cache_outcome.get(),
+        "route": route,
+        "request": request_id,
+    }
+    with _lock:
+        _entries.append(entry)
+
+
+def recent(limit=None):
+    with _lock:
+        entries = list(_entries)
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+
+def _failed(status):
+    return not (isinstance(status, int) and 200 <= status < 400)
+
+
+def summary(entries):
+    """Aggregate ``entries`` per collection and per triggering route."""
+    by_collection = {}
+    by_route = {}
+    for entry in entries:
+        stats = by_collection.setdefault(
+            entry["collection"], {"calls": 0, "errors": 0, "bytes": 0, "total_ms": 0.0, "max_ms": 0.0, "cache": {}}
+        )
+        stats["calls"] += 1
+        stats["cache"][entry["cache"]] = stats["cache"].get(entry["cache"], 0) + 1
+        stats["errors"] += _failed(entry["status"])
+        stats["bytes"] += entry["bytes"]
+        stats["total_ms"] += entry["ms"]
+        stats["max_ms"] = max(stats["max_ms"], entry["ms"])
+
+        route = by_route.setdefault(entry["route"] or "(no request)", {"calls": 0, "total_ms": 0.0, "requests": {}})
+        route["calls"] += 1
+        route["total_ms"] += entry["ms"]
+        route["requests"][entry["request"]] = route["requests"].get(entry["request"], 0) + 1
+
+    for stats in by_collection.values():
+        stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 1)
+        stats["total_ms"] = round(stats["total_ms"], 1)
+    for route in by_route.values():
+        per_request = route.pop("requests")
+        route["requests"] = len(per_request)
+        route["calls_per_request"] = round(route["calls"] / len(per_request), 2)
+        route["max_calls_per_request"] = max(per_request.values())
+        route["total_ms"] = round(route["total_ms"], 1)
+    return {"by_collection": by_collection, "by_route": by_route}
@@ -1,5 +1,13 @@
 import os
 
+
+def env_flag(name, default=False):
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
 class SystemConfig:
     COMPANY_NAME = "ABC - Apparel Branding Company"
     COMPANY_ADDRESS = "123, Main Street, Anytown, India"
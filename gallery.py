@@ -0,0 +1,87 @@
+"""Gallery snapshot: de-duplicated images in a stable, color-mixed order.
+
+The order is computed once per gallery version (a hash of the image list), so
+every page request is a slice and page N shows the same images until the
+gallery changes in Strapi.
+"""
+
+import hashlib
+import random
+import time
+
+
+def gallery_version(images):
+    digest = hashlib.sha1()
+    for image in images:
+        digest.update(f"{image['url']}\t{image['color']}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def mixed_order(images, seed):
+    """Spread each color evenly through the list, deterministically for ``seed``.
+
+    Every color group is shuffled with a seeded RNG, then each image gets a
+    position key ``(i + offset) / len(group)``. Sorting by that key interleaves
+    large and small groups in proportion, not round-robin.
+    """
+    rng = random.Random(seed)
+    groups = {}
+    for image in images:
+        groups.setdefault(image["color"].strip().lower(), []).append(image)
+
+    keyed = []
+    for group in groups.values():
+        rng.shuffle(group)
+        offset = rng.random()
+        for index, image in enumerate(group):
+            keyed.append(((index + offset) / len(group), rng.random(), image))
+    keyed.sort(key=lambda item: (item[0], item[1]))
+    return [image for _, _, image in keyed]
+
+
+def _normalize_color(value):
+    return str(value or "").strip().lower()
+
+
+def build_snapshot(items, normalize=_normalize_color):
+    """Build the gallery snapshot from ``get_gallery_images()`` output.
+
+    ``by_color`` maps each normalized color to its images, in the same mixed
+    order as ``images``. ``colors`` lists ``{key, label, count}`` for the filter UI.
+    """
+    images = []
+    seen_urls = set()
+    for item in items:
+        url = item.get("url")
+        if not url or url in seen_urls:
+            continue
+        seen_urls.add(url)
+        images.append({"url": url, "color": str(item.get("color") or "Gallery")})
+
+    version = gallery_version(images)
+    ordered = mixed_order(images, seed=version)
+
+    by_color = {}
+    labels = {}
+    for image in ordered:
+        key = normalize(image["color"])
+        by_color.setdefault(key, []).append(image)
+        labels.setdefault(key, image["color"].strip())
+
+    return {
+        "version": version,
+        "images": ordered,
+        "by_color": by_color,
+        "colors": [
+            {"key": key, "label": labels[key], "count": len(by_color[key])}
+            for key in sorted(by_color, key=lambda key: labels[key].lower())
+        ],
+        "built_at": time.time(),
+    }
+
+
+def page_of(images, page, per_page):
+    """Return ``(images, total_pages)`` for a 1-based ``page`` of ``images``."""
+    total_pages = max(1, (len(images) + per_page - 1) // per_page)
+    start = (max(page, 1) - 1) * per_page
+    return images[start:start + per_page], total_pages
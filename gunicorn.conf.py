@@ -0,0 +1,19 @@
+"""Gunicorn settings for ``wsgi:app``; see ``wsgi.py`` for the pre-fork loading."""
+
+import multiprocessing
+import os
+import sys
+
+wsgi_app = "wsgi:app"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Import the app (and load the CMS snapshot) once in the master, then fork.
+preload_app = True
+
+
+def post_fork(server, worker):
+    wsgi = sys.modules.get("wsgi")
+    if wsgi is not None:  # only when serving wsgi:app, not e.g. "gunicorn app:app" picking up this file
+        wsgi.post_fork()
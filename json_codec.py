@@ -0,0 +1,100 @@
+"""Fast JSON encoding and decoding (orjson, msgspec or the stdlib, chosen by ``JSON_CODEC``)."""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+
+def _select_backend():
+    requested = os.getenv("JSON_CODEC", "auto").strip().lower() or "auto"
+    if requested in ("auto", "orjson") and orjson is not None:
+        return "orjson"
+    if requested in ("auto", "msgspec") and msgspec is not None:
+        return "msgspec"
+    return "json"
+
+
+BACKEND = _select_backend()
+
+if msgspec is not None:
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def loads(data):
+    """Decode JSON from ``bytes`` (preferred, no intermediate ``str``) or ``str``.
+
+    Decode errors are always raised as ``ValueError`` so existing
+    ``except ValueError`` handlers keep working whatever the backend.
+    """
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if BACKEND == "msgspec":
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+    return json.loads(data)
+
+
+def dumps_bytes(obj, default=None, sort_keys=False):
+    """Encode ``obj`` as compact UTF-8 JSON bytes.
+
+    ``default`` is called for values the backend cannot serialize natively,
+    including datetimes so they render the same way under every backend.
+    """
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # Integers beyond 64 bits and similar edge cases.
+            pass
+    elif BACKEND == "msgspec" and default is None:
+        try:
+            return msgspec.json.encode(obj, order="sorted" if sort_keys else None)
+        except (TypeError, msgspec.EncodeError):
+            pass
+    return json.dumps(
+        obj, default=default, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by :mod:`json_codec`.
+
+    Compact responses (the production default) are encoded straight to bytes;
+    indented debug output and calls with extra ``json.dumps`` arguments use the
+    stdlib provider unchanged.
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, default=self.default, sort_keys=self.sort_keys).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps_bytes(obj, default=self.default, sort_keys=self.sort_keys) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,269 @@
+"""Catalog snapshot in one binary file, shared between processes through ``mmap``.
+
+Layout (native byte order; the file never leaves the host that wrote it)::
+
+    header      MAGIC, version, count, table_at, keys_at, index_at, text_at, text_len
+    records     one JSON document per product, back to back
+    keys        product keys in catalog order, UTF-8, back to back
+    text        lower-cased search text per product, NUL-terminated
+    table       count + 1 record offsets, count + 1 text offsets, count + 1 key
+                offsets, then the positions sorted by key (uint64)
+    index       the caller's ``indexes`` as nested tables (see ``Table``)
+
+``write`` publishes with ``os.replace``, so a reader sees either the old or the
+new file, never a partial one. ``MappedCatalog`` maps the file read-only. The
+pages live in the OS page cache once per host however many workers map them,
+and a worker decodes nothing when it opens the file. Keys are found by binary
+search over the sorted position table. Looking up a product decodes that one
+record, and an index entry decodes only the value read. ``search`` scans the
+text section in place and decodes nothing.
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+
+import json_codec
+
+MAGIC = b"ABCCAT02"
+HEADER = struct.Struct("=8s7Q")
+
+# Kinds of value in an index table row.
+TABLE, JSON, POSITIONS = range(3)
+ROW = 5  # key_at, key_len, kind, value_at, value_len
+
+
+def _append(out, base, data, align=1):
+    """Append ``data`` to ``out``, which starts at file offset ``base``; returns its offset."""
+    out.extend(b"\0" * (-(base + len(out)) % align))
+    at = base + len(out)
+    out.extend(data)
+    return at
+
+
+def _pack(value, out, base):
+    """Append ``value`` to ``out`` and return its ``(kind, value_at, value_len)`` row fields.
+
+    Dicts become tables sorted by UTF-8 key, lists of non-negative ints become
+    uint64 arrays, and everything else is JSON.
+    """
+    if isinstance(value, Mapping):
+        rows = array("Q", [0])
+        for encoded, item in sorted({str(key).encode("utf-8"): item for key, item in value.items()}.items()):
+            fields = _pack(item, out, base)
+            rows.extend((_append(out, base, encoded), len(encoded), *fields))
+        rows[0] = (len(rows) - 1) // ROW
+        return TABLE, _append(out, base, rows.tobytes(), align=8), rows[0]
+    if isinstance(value, list) and value and all(type(item) is int and item >= 0 for item in value):
+        return POSITIONS, _append(out, base, array("Q", value).tobytes(), align=8), len(value)
+    data = json_codec.dumps_bytes(value)
+    return JSON, _append(out, base, data), len(data)
+
+
+def _search(count, needle, key_at):
+    """First position in ``range(count)`` whose ``key_at(position)`` is not below ``needle``."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(middle) < needle:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def write(path, products, version, search_text=None, indexes=None):
+    """Serialize ``products`` (``{key: product}``) to ``path`` and publish it atomically.
+
+    ``search_text(product)`` gives the text ``MappedCatalog.search`` matches
+    against. ``indexes(products)`` returns a dict of JSON-able values stored
+    alongside, such as facet postings keyed by record position.
+    """
+    keys = [str(key).encode("utf-8") for key in products]
+    records = [json_codec.dumps_bytes(product) for product in products.values()]
+    texts = [str(search_text(product) if search_text else "").lower().encode("utf-8") + b"\0"
+             for product in products.values()]
+
+    record_offsets = array("Q", [0])
+    for record in records:
+        record_offsets.append(record_offsets[-1] + len(record))
+    text_offsets = array("Q", [0])
+    for text in texts:
+        text_offsets.append(text_offsets[-1] + len(text))
+    key_offsets = array("Q", [0])
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+    order = array("Q", sorted(range(len(keys)), key=keys.__getitem__))
+
+    records_at = HEADER.size
+    keys_at = records_at + record_offsets[-1]
+    text_at = keys_at + key_offsets[-1]
+    table_at = text_at + text_offsets[-1]
+    table_at += -table_at % 8
+    for i in range(len(record_offsets)):
+        record_offsets[i] += records_at
+        key_offsets[i] += keys_at
+    index = bytearray()
+    index_base = table_at + 8 * (3 * len(record_offsets) + len(order))
+    index_at = _pack(indexes(products) if indexes else {}, index, index_base)[1]
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, int(version), len(keys), table_at, keys_at, index_at, text_at, text_offsets[-1]))
+        f.writelines(records)
+        f.writelines(keys)
+        f.writelines(texts)
+        f.write(b"\0" * (table_at - f.tell()))
+        f.write(record_offsets.tobytes())
+        f.write(text_offsets.tobytes())
+        f.write(key_offsets.tobytes())
+        f.write(order.tobytes())
+        f.write(index)
+    os.replace(tmp_path, path)
+
+
+class Table(Mapping):
+    """Read-only ``{str: value}`` view of a table in the index section.
+
+    Rows are fixed-width and sorted by key, so a lookup is a binary search that
+    decodes only the value found. Nested dicts come back as tables and position
+    lists as uint64 memoryviews.
+    """
+
+    def __init__(self, mm, at):
+        self._mm = mm
+        (self._count,) = struct.unpack_from("=Q", mm, at)
+        self._rows = memoryview(mm)[at + 8:at + 8 + 8 * ROW * self._count].cast("Q")
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._key(i).decode("utf-8")
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        return self._value(i)
+
+    def items(self):
+        for i in range(self._count):
+            yield self._key(i).decode("utf-8"), self._value(i)
+
+    def _key(self, i):
+        at = self._rows[ROW * i]
+        return self._mm[at:at + self._rows[ROW * i + 1]]
+
+    def _find(self, key):
+        needle = str(key).encode("utf-8")
+        i = _search(self._count, needle, self._key)
+        return i if i < self._count and self._key(i) == needle else None
+
+    def _value(self, i):
+        kind, at, length = self._rows[ROW * i + 2:ROW * i + 5]
+        if kind == TABLE:
+            return Table(self._mm, at)
+        if kind == POSITIONS:
+            return memoryview(self._mm)[at:at + 8 * length].cast("Q")
+        return json_codec.loads(self._mm[at:at + length])
+
+
+class MappedCatalog(Mapping):
+    """Read-only ``{key: product}`` view of a file written by ``write``.
+
+    Every lookup decodes a fresh dict, so callers may modify what they get.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, count, table_at, _, index_at, self._text_at, self._text_len = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        self._count = count
+        table = memoryview(self._mm)[table_at:table_at + 8 * (4 * count + 3)].cast("Q")
+        self._offsets = table[:count + 1]
+        self._text_offsets = table[count + 1:2 * count + 2]
+        self._key_offsets = table[2 * count + 2:3 * count + 3]
+        self._order = table[3 * count + 3:]
+        self.indexes = Table(self._mm, index_at)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self.key(position)
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __getitem__(self, key):
+        position = self._position(key)
+        if position is None:
+            raise KeyError(key)
+        return self.record(position)
+
+    def _key_bytes(self, position):
+        return self._mm[self._key_offsets[position]:self._key_offsets[position + 1]]
+
+    def _position(self, key):
+        needle = str(key).encode("utf-8")
+        i = _search(self._count, needle, lambda i: self._key_bytes(self._order[i]))
+        if i < self._count and self._key_bytes(self._order[i]) == needle:
+            return self._order[i]
+        return None
+
+    def key(self, position):
+        return self._key_bytes(position).decode("utf-8")
+
+    def record(self, position):
+        return json_codec.loads(self._mm[self._offsets[position]:self._offsets[position + 1]])
+
+    def search(self, query):
+        """Yield record positions, in catalog order, whose search text contains ``query``."""
+        needle = str(query).lower().encode("utf-8")
+        start, end = self._text_at, self._text_at + self._text_len
+        if not needle:
+            return
+        found = self._mm.find(needle, start, end)
+        while found != -1:
+            position = bisect_right(self._text_offsets, found - start) - 1
+            record_end = start + self._text_offsets[position + 1]
+            if found + len(needle) < record_end:  # the NUL terminator is never part of a match
+                yield position
+                found = self._mm.find(needle, record_end, end)
+            else:
+                found = self._mm.find(needle, found + 1, end)
+
+
+class Records(Sequence):
+    """Lazy list of ``transform(key, product)`` over chosen record positions.
+
+    Length and slicing need no decoding; only the items actually read are decoded.
+    """
+
+    def __init__(self, catalog, positions, transform=lambda key, product: product):
+        self._catalog = catalog
+        self._positions = positions
+        self._transform = transform
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(position) for position in self._positions[index]]
+        return self._item(self._positions[index])
+
+    def _item(self, position):
+        return self._transform(self._catalog.key(position), self._catalog.record(position))
@@ -0,0 +1,360 @@
+"""In-process metrics registry exported in the Prometheus text format.
+
+Tracks per-endpoint request latency, outbound Strapi calls (count, latency and
+bytes per collection), cache hits/misses/evictions and catalog size/snapshot age.
+``init_app`` adds request hooks and a ``/metrics`` route.
+
+With several worker processes, set ``METRICS_MULTIPROC_DIR`` to a directory
+shared by the workers of one host (and empty it on deploy). Each worker then
+writes its own snapshot there at most every ``METRICS_FLUSH_SECONDS``, and
+``/metrics`` merges every snapshot. Counters and histograms are summed. Gauges
+are combined per their ``mode``, using only processes that are still alive.
+
+Recording is a no-op until ``init_app`` enables the registry, so scripts that
+import ``strapi_client`` pay nothing.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+ENABLED = False
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1.0):
+        if not ENABLED:
+            return
+        self._check(labels)
+        with self.registry.lock:
+            self.samples[labels] = self.samples.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, registry, name, documentation, labelnames, mode="max"):
+        super().__init__(registry, name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, labels=(), value=0.0):
+        if not ENABLED:
+            return
+        self._check(labels)
+        with self.registry.lock:
+            self.samples[labels] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels=(), value=0.0):
+        if not ENABLED:
+            return
+        self._check(labels)
+        with self.registry.lock:
+            state = self.samples.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, sum and count.
+                state = self.samples[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+        self._last_flush = 0.0
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), mode="max"):
+        return self._add(Gauge(self, name, documentation, labelnames, mode=mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets=buckets))
+
+    def snapshot(self):
+        for collector in self.collectors:
+            collector()
+        with self.lock:
+            return {
+                name: [[list(labels), value if not isinstance(value, list) else list(value)]
+                       for labels, value in metric.samples.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def reset(self):
+        """Drop all samples, e.g. in a worker forked from a master that already recorded some."""
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.samples.clear()
+        self._last_flush = 0.0
+
+    # -- multiprocess ---------------------------------------------------------
+
+    def flush(self, directory, force=False, interval=1.0):
+        now = time.monotonic()
+        if not force and now - self._last_flush < interval:
+            return
+        self._last_flush = now
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pid": os.getpid(), "metrics": self.snapshot()}, f)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Could not write metrics snapshot to %s: %s", directory, exc)
+
+    def merged(self, directory=None):
+        """Return ``{name: {labels_tuple: value}}`` for this process or all processes in ``directory``."""
+        if not directory:
+            return self._merge([(os.getpid(), self.snapshot())])
+        self.flush(directory, force=True)
+        snapshots = []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not entry.name.startswith("metrics-") or not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((data.get("pid"), data.get("metrics", {})))
+        return self._merge(snapshots)
+
+    def _merge(self, snapshots):
+        merged = {name: {} for name in self.metrics}
+        for pid, metrics in snapshots:
+            live = pid == os.getpid() or _pid_alive(pid)
+            for name, samples in metrics.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                if metric.kind == "gauge" and not live:
+                    continue
+                target = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if metric.kind == "gauge" and metric.mode == "all":
+                        key = key + (str(pid),)
+                    current = target.get(key)
+                    if current is None:
+                        target[key] = list(value) if isinstance(value, list) else value
+                    elif metric.kind == "histogram":
+                        target[key] = [a + b for a, b in zip(current, value)]
+                    elif metric.kind == "counter" or metric.mode == "sum":
+                        target[key] = current + value
+                    elif metric.mode == "min":
+                        target[key] = min(current, value)
+                    else:
+                        target[key] = max(current, value)
+        return merged
+
+    def render(self, directory=None):
+        merged = self.merged(directory)
+        lines = []
+        for name, metric in self.metrics.items():
+            labelnames = metric.labelnames
+            if metric.kind == "gauge" and metric.mode == "all":
+                labelnames = labelnames + ("pid",)
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in sorted(merged[name].items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labelnames + ('le',), labels + (le,))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labelnames, labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Flask request latency by endpoint.", ("endpoint", "method")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Flask requests by endpoint and status code.", ("endpoint", "method", "status")
+)
+CMS_REQUESTS = REGISTRY.counter(
+    "strapi_requests_total", "Outbound Strapi requests by collection and outcome.", ("collection", "outcome")
+)
+CMS_REQUEST_DURATION = REGISTRY.histogram(
+    "strapi_request_duration_seconds", "Outbound Strapi request latency by collection.", ("collection",)
+)
+CMS_RESPONSE_BYTES = REGISTRY.counter(
+    "strapi_response_bytes_total", "Bytes received from Strapi by collection.", ("collection",)
+)
+CACHE_REQUESTS = REGISTRY.counter("cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+CACHE_EVICTIONS = REGISTRY.counter("cache_evictions_total", "Entries evicted from each cache.", ("cache",))
+CACHE_OVERSIZE = REGISTRY.counter(
+    "cache_oversize_total", "Values larger than the whole cache, served but not stored.", ("cache",)
+)
+CATALOG_ITEMS = REGISTRY.gauge(
+    "catalog_items", "Items in the last loaded snapshot of each collection.", ("collection",), mode="max"
+)
+SNAPSHOT_TIMESTAMP = REGISTRY.gauge(
+    "catalog_snapshot_timestamp_seconds",
+    "Unix time the oldest live worker last refreshed each collection.",
+    ("collection",),
+    mode="min",
+)
+SNAPSHOT_AGE = REGISTRY.gauge(
+    "catalog_snapshot_age_seconds", "Age of the oldest live worker snapshot of each collection.", ("collection",),
+    mode="max",
+)
+
+
+def _update_snapshot_age():
+    now = time.time()
+    with REGISTRY.lock:
+        timestamps = dict(SNAPSHOT_TIMESTAMP.samples)
+        for labels, stamp in timestamps.items():
+            SNAPSHOT_AGE.samples[labels] = round(now - stamp, 3)
+
+
+REGISTRY.collectors.append(_update_snapshot_age)
+
+
+def collection_from_url(url):
+    path = urlsplit(url).path
+    if "/api/" not in path:
+        return "other"
+    return path.split("/api/", 1)[1].split("/", 1)[0] or "other"
+
+
+def observe_cms_call(url, seconds, outcome, size=0):
+    if not ENABLED:
+        return
+    collection = collection_from_url(url)
+    CMS_REQUESTS.inc((collection, str(outcome)))
+    CMS_REQUEST_DURATION.observe((collection,), seconds)
+    if size:
+        CMS_RESPONSE_BYTES.inc((collection,), size)
+
+
+def record_cache(cache, result, evictions=0):
+    """Count a cache lookup (``result`` is ``"hit"`` or ``"miss"``) and any evictions it caused."""
+    if not ENABLED:
+        return
+    CACHE_REQUESTS.inc((cache, result))
+    if evictions:
+        CACHE_EVICTIONS.inc((cache,), evictions)
+
+
+def record_snapshot(collection, items):
+    if not ENABLED:
+        return
+    CATALOG_ITEMS.set((collection,), items)
+    SNAPSHOT_TIMESTAMP.set((collection,), time.time())
+
+
+def init_app(app, enabled=True, multiproc_dir="", flush_seconds=1.0):
+    """Enable recording, time every request of ``app`` and register ``/metrics``."""
+    global ENABLED
+    if not enabled:
+        return
+    ENABLED = True
+
+    from flask import Response, g, request
+
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        atexit.register(REGISTRY.flush, multiproc_dir, True)
+
+    @app.before_request
+    def _metrics_begin():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_observe(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.endpoint if request.url_rule is not None else "unmatched"
+            HTTP_REQUEST_DURATION.observe((endpoint, request.method), time.perf_counter() - started)
+            HTTP_REQUESTS.inc((endpoint, request.method, str(response.status_code)))
+        if multiproc_dir:
+            REGISTRY.flush(multiproc_dir, interval=flush_seconds)
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(REGISTRY.render(multiproc_dir or None), content_type=CONTENT_TYPE)
@@ -0,0 +1,197 @@
+"""Opt-in request profiler that writes per-request profiles to a bounded directory.
+
+``init_app`` wraps ``app.wsgi_app`` so the views are untouched. A request is
+profiled with ``cProfile`` (``.prof``, open with ``snakeviz`` or ``pstats``) when
+it is picked by ``sample_rate`` or carries ``X-Profile: <secret>``. With
+``slow_ms`` set, every other request is watched by a background stack sampler.
+A collapsed-stack ``.collapsed`` file (flamegraph.pl / speedscope format) is
+written only when the request turns out slower than the threshold.
+
+File names carry the time, endpoint, method, duration and pid, e.g.
+``20261019T101500-shop-GET-182ms-4242.prof``. The oldest files are removed once
+the directory holds more than ``max_files``.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+class _StackSampler:
+    """Samples the stacks of registered threads every ``interval`` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.watched = {}
+        self.thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.watched[thread_id] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self.thread.start()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.watched.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.watched:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+
+def _collapse(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", value).strip("_") or "unknown"
+
+
+class ProfilerMiddleware:
+    def __init__(self, wsgi_app, url_map, directory, sample_rate=0.0, secret="", slow_ms=0,
+                 max_files=200, interval_ms=5):
+        self.wsgi_app = wsgi_app
+        self.url_map = url_map
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.slow_seconds = slow_ms / 1000.0 if slow_ms else 0.0
+        self.max_files = max_files
+        self.sampler = _StackSampler(interval_ms / 1000.0) if slow_ms else None
+        # cProfile hooks are process-wide on recent Pythons, so profile one request at a time.
+        self._cprofile_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _requested(self, environ):
+        if self.secret:
+            header = environ.get(PROFILE_HEADER, "")
+            if header and hmac.compare_digest(header, self.secret):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if self._requested(environ) and self._cprofile_lock.acquire(blocking=False):
+            try:
+                profiler = cProfile.Profile()
+                started = time.perf_counter()
+                body = profiler.runcall(self._buffered, environ, start_response)
+                elapsed = time.perf_counter() - started
+            finally:
+                self._cprofile_lock.release()
+            self._dump(environ, elapsed, ".prof", profiler.dump_stats)
+            return body
+
+        if self.sampler is None:
+            return self.wsgi_app(environ, start_response)
+
+        thread_id = threading.get_ident()
+        self.sampler.start(thread_id)
+        started = time.perf_counter()
+        try:
+            body = self.wsgi_app(environ, start_response)
+        finally:
+            stacks = self.sampler.stop(thread_id)
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.slow_seconds and stacks:
+            self._dump(environ, elapsed, ".collapsed", lambda path: _write_collapsed(path, stacks))
+        return body
+
+    def _buffered(self, environ, start_response):
+        # Consume the response inside the profiled window so streamed bodies count.
+        body = self.wsgi_app(environ, start_response)
+        try:
+            return [b"".join(body)]
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+        except Exception:
+            return "unmatched"
+        return endpoint
+
+    def _dump(self, environ, elapsed, suffix, writer):
+        name = "{}-{}-{}-{}ms-{}{}".format(
+            time.strftime("%Y%m%dT%H%M%S"),
+            _slug(self._endpoint(environ)),
+            _slug(environ.get("REQUEST_METHOD", "GET")),
+            int(elapsed * 1000),
+            os.getpid(),
+            suffix,
+        )
+        path = os.path.join(self.directory, name)
+        try:
+            writer(path)
+            self._prune()
+        except OSError as exc:
+            logger.warning("Could not write profile %s: %s", path, exc)
+
+    def _prune(self):
+        entries = [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith((".prof", ".collapsed"))
+        ]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _write_collapsed(path, stacks):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def init_app(app, enabled=True, directory="profiles", sample_rate=0.0, secret="", slow_ms=0,
+             max_files=200, interval_ms=5):
+    """Wrap ``app.wsgi_app`` with :class:`ProfilerMiddleware`. Does nothing when ``enabled`` is false."""
+    if not enabled:
+        return
+    app.wsgi_app = ProfilerMiddleware(
+        app.wsgi_app,
+        app.url_map,
+        directory,
+        sample_rate=sample_rate,
+        secret=secret,
+        slow_ms=slow_ms,
+        max_files=max_files,
+        interval_ms=interval_ms,
+    )
@@ -0,0 +1,195 @@
+"""Related-product neighbours precomputed once per catalog version.
+
+Products are vectorized as TF-IDF over three fields: name tokens, keyword
+tokens and the category (one whole feature). The fields are weighted so that
+sharing a category or keyword counts more than a shared name word. Every
+product keeps its top-k cosine neighbours, so the detail page needs only a
+dict lookup.
+
+Both scorers walk an inverted index over the shared features, so memory
+follows the number of non-zero weights, not documents x vocabulary. With
+NumPy (in requirements.txt) the scores are accumulated a block of products
+at a time. The pure-Python fallback gives the same neighbours, only slower.
+"""
+
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+import metrics
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+FIELD_WEIGHTS = {"c": 2.0, "k": 1.5, "w": 1.0}
+STOPWORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"})
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+_lock = threading.Lock()
+_latest = (None, None, None)
+
+
+def _tokens(text):
+    return [t for t in _TOKEN.findall(str(text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _features(product, normalize):
+    counts = Counter()
+    for token in _tokens(product.get("name")):
+        counts["w:" + token] += 1
+    for keyword in product.get("keywords") or []:
+        for token in _tokens(keyword):
+            counts["k:" + token] += 1
+    category = normalize(product.get("category"))
+    if category:
+        counts["c:" + category] += 1
+    return counts
+
+
+def catalog_version(products):
+    digest = hashlib.sha1()
+    for key, product in products.items():
+        keywords = "|".join(str(k) for k in (product.get("keywords") or []))
+        digest.update(f"{key}\t{product.get('name')}\t{product.get('category')}\t{keywords}\n".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _vectors(products, normalize):
+    keys = list(products)
+    counts = [_features(products[key], normalize) for key in keys]
+    df = Counter(feature for features in counts for feature in features)
+    total = len(keys)
+
+    vectors = []
+    for features in counts:
+        weights = {
+            feature: tf * FIELD_WEIGHTS[feature[0]] * (math.log((1 + total) / (1 + df[feature])) + 1)
+            for feature, tf in features.items()
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        # Features seen in a single product never contribute to a dot product.
+        vectors.append({f: w / norm for f, w in weights.items() if df[f] > 1})
+    return keys, vectors
+
+
+def _top_groups(scored, k):
+    """Rank ``(group, score)`` pairs, keeping the best ``k + 1`` plus ties.
+
+    ``k + 1`` groups always hold ``k`` neighbours for any member, even when its
+    own group holds nothing else.
+    """
+    # Scores are rounded so summation-order noise cannot reorder equal scores.
+    ranked = sorted((-round(score, 9), group) for group, score in scored if score > 1e-12)
+    if len(ranked) > k + 1:
+        cutoff = ranked[k][0]
+        ranked = [item for item in ranked if item[0] <= cutoff]
+    return ranked
+
+
+def _group_scores_python(vectors, k):
+    postings = {}
+    for group, vector in enumerate(vectors):
+        for feature, weight in vector.items():
+            postings.setdefault(feature, []).append((group, weight))
+
+    for vector in vectors:
+        scores = {}
+        for feature, weight in vector.items():
+            for other, other_weight in postings[feature]:
+                scores[other] = scores.get(other, 0.0) + weight * other_weight
+        yield _top_groups(scores.items(), k)
+
+
+def _group_scores_numpy(vectors, k, block_cells=1 << 22):
+    """Same ranking as ``_group_scores_python``, scored a block of rows at a time.
+
+    Vectors stay sparse: per-feature postings of ``(groups, weights)`` arrays.
+    A block of rows is scored against every group in one dense
+    ``block x groups`` array of at most ``block_cells`` floats (32 MB), so
+    memory does not grow with the vocabulary.
+    """
+    postings = {}
+    for group, vector in enumerate(vectors):
+        for feature, weight in vector.items():
+            groups, weights = postings.setdefault(feature, ([], []))
+            groups.append(group)
+            weights.append(weight)
+    postings = {feature: (np.array(groups, dtype=np.intp), np.array(weights)) for feature, (groups, weights) in
+                postings.items()}
+
+    block = max(1, min(512, block_cells // len(vectors)))
+    for start in range(0, len(vectors), block):
+        rows = vectors[start:start + block]
+        block_postings = {}
+        for position, vector in enumerate(rows):
+            for feature, weight in vector.items():
+                positions, weights = block_postings.setdefault(feature, ([], []))
+                positions.append(position)
+                weights.append(weight)
+        scores = np.zeros((len(rows), len(vectors)))
+        for feature, (positions, weights) in block_postings.items():
+            groups, group_weights = postings[feature]
+            scores[np.ix_(positions, groups)] += np.outer(weights, group_weights)
+
+        for row in scores:
+            candidates = np.flatnonzero(row > 1e-12)
+            if len(candidates) > k + 1:
+                kth = np.partition(row[candidates], len(candidates) - k - 1)[len(candidates) - k - 1]
+                candidates = candidates[row[candidates] >= kth - 1e-9]
+            yield _top_groups(((int(i), float(row[i])) for i in candidates), k)
+
+
+def build_index(products, k=4, normalize=lambda value: str(value or "").strip().lower()):
+    """Return ``{product_key: [related keys, best first]}`` for ``products``.
+
+    Products with identical feature vectors are scored once as a group, which
+    keeps catalogs full of colour/size variants cheap. Ties keep catalog order.
+    """
+    keys, vectors = _vectors(products, normalize)
+    groups = {}
+    for index, vector in enumerate(vectors):
+        groups.setdefault(tuple(sorted(vector.items())), []).append(index)
+    unique = [dict(signature) for signature in groups]
+    members = [indices[: k + 1] for indices in groups.values()]
+
+    if np is not None and len(unique) > 1:
+        ranked_groups = _group_scores_numpy(unique, k)
+    else:
+        ranked_groups = _group_scores_python(unique, k)
+
+    index = {}
+    for indices, ranked in zip(groups.values(), ranked_groups):
+        for product in indices:
+            candidates = ((score, other) for score, group in ranked for other in members[group] if other != product)
+            index[keys[product]] = [keys[other] for _, other in heapq.nsmallest(k, candidates)]
+    return index
+
+
+def related_index(products, k=4, normalize=lambda value: str(value or "").strip().lower()):
+    """``build_index`` cached per catalog; a detail view costs one identity check.
+
+    The loaders hand out the same catalog object until they refetch it, so only
+    a new object is hashed with ``catalog_version``. An identical refetch keeps
+    the index instead of rebuilding it. Catalogs are never mutated in place.
+    """
+    global _latest
+    cached_products, cached_version, index = _latest
+    if products is cached_products:
+        metrics.record_cache("related", "hit")
+        return index
+    with _lock:
+        cached_products, cached_version, index = _latest
+        if products is not cached_products:
+            version = catalog_version(products)
+            if version == cached_version:
+                metrics.record_cache("related", "hit")
+            else:
+                metrics.record_cache("related", "miss", evictions=1 if cached_version else 0)
+                index = build_index(products, k=k, normalize=normalize)
+            _latest = (products, version, index)
+    return index
@@ -0,0 +1,220 @@
+"""Shared folder <-> product matching for the ABC upload scripts.
+
+    index = NameIndex({pid: prod.get('name', '') for pid, prod in shop.items()})
+    index.scores('Premium Polo 220 GSM')     # {pid: shared token count}
+    assign_products(folders, shop)            # {folder: pid or None}, one product per folder
+    FolderMatcher(folders).best(product)      # best folder for one product
+    scanner = FolderScanner(ABC)
+    scanner.color_images('Premium Polo')      # [(color, [image files])]
+    scanner.save()
+
+Matching uses token -> key inverted indexes, so a lookup only touches the
+entries that share a token instead of every product. GSM fallbacks go through
+a digit index. Folder listings use ``os.scandir`` and an mtime-keyed cache
+(``ABC_SCAN_CACHE``), so colour directories that have not changed since the
+last run are not listed again.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCAN_CACHE = os.path.join(ROOT, '.abc_scan_cache.json')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+GSM_RE = re.compile(r'(\d+)\s*GSM')
+
+
+def normalize(s):
+    return re.sub(r'[^a-z0-9]+', ' ', s.lower()).strip()
+
+
+def tokens(s):
+    return set([t for t in normalize(s).split() if len(t) > 2])
+
+
+def _digit_substrings(text):
+    """Every digit-only substring of ``text``; ``"180" in name`` is a lookup in this set."""
+    found = set()
+    for run in re.findall(r'\d+', text):
+        for start in range(len(run)):
+            for end in range(start + 1, len(run) + 1):
+                found.add(run[start:end])
+    return found
+
+
+def product_gsm(product):
+    """GSM numbers from ``product_details``, first match per line, in order."""
+    numbers = []
+    for detail in product.get('product_details', []):
+        m = GSM_RE.search(detail)
+        if m:
+            numbers.append(m.group(1))
+    return numbers
+
+
+class NameIndex:
+    """Inverted token index over ``{key: name}``; keys keep their insertion order."""
+
+    def __init__(self, names):
+        self.order = {key: i for i, key in enumerate(names)}
+        self.postings = {}
+        for key, name in names.items():
+            for token in tokens(name):
+                self.postings.setdefault(token, []).append(key)
+
+    def scores(self, name):
+        """``{key: shared token count}`` for every key sharing a token with ``name``."""
+        scores = Counter()
+        for token in tokens(name):
+            for key in self.postings.get(token, ()):
+                scores[key] += 1
+        return scores
+
+    def best(self, name):
+        """Highest-scoring key, first in insertion order on ties; ``None`` without overlap."""
+        scores = self.scores(name)
+        if not scores:
+            return None
+        return min(scores, key=lambda key: (-scores[key], self.order[key]))
+
+
+class GsmIndex:
+    """Products by GSM number, for folders whose name mentions it."""
+
+    def __init__(self, products):
+        self.order = {pid: i for i, pid in enumerate(products)}
+        self.by_gsm = {}
+        for pid, product in products.items():
+            for number in product_gsm(product):
+                self.by_gsm.setdefault(number, set()).add(pid)
+
+    def candidates(self, folder):
+        """Products with a GSM number contained in ``folder``, in catalog order."""
+        found = set()
+        for digits in _digit_substrings(folder):
+            found |= self.by_gsm.get(digits, set())
+        return sorted(found, key=self.order.__getitem__)
+
+
+class FolderDigitIndex:
+    """Folders by every digit substring of their name, in listing order."""
+
+    def __init__(self, folders):
+        self.by_digits = {}
+        for folder in folders:
+            for digits in _digit_substrings(folder):
+                self.by_digits.setdefault(digits, []).append(folder)
+
+    def first_containing(self, digits):
+        folders = self.by_digits.get(digits)
+        return folders[0] if folders else None
+
+
+def assign_products(folders, products):
+    """``{folder: product id or None}``, giving each product to at most one folder.
+
+    Folders are visited in order. Each takes the unused product sharing the
+    most name tokens with it (ties go to the higher product id). Without one,
+    it takes the first unused product, in catalog order, whose GSM number
+    appears in the folder name.
+    """
+    name_index = NameIndex({pid: prod.get('name', '') for pid, prod in products.items()})
+    gsm_index = GsmIndex(products)
+    assigned = {}
+    used = set()
+    for folder in folders:
+        ranked = sorted(((score, pid) for pid, score in name_index.scores(folder).items()), reverse=True)
+        best = next((pid for _, pid in ranked if pid not in used), None)
+        if best is None:
+            best = next((pid for pid in gsm_index.candidates(folder) if pid not in used), None)
+        if best is not None:
+            used.add(best)
+        assigned[folder] = best
+    return assigned
+
+
+class FolderMatcher:
+    """Folder for a product: most shared name tokens (first listed on ties), else the first naming its GSM."""
+
+    def __init__(self, folders):
+        self.names = NameIndex({folder: folder for folder in folders})
+        self.digits = FolderDigitIndex(folders)
+
+    def best(self, product):
+        best = self.names.best(product.get('name', ''))
+        if best is None:
+            gsm = product_gsm(product)
+            if gsm:
+                best = self.digits.first_containing(gsm[0])
+        return best
+
+
+def pick_image(color, files):
+    """Prefer a file whose name contains the colour name, else the first file."""
+    wanted = normalize(color).replace(' ', '')
+    for fn in files:
+        if wanted in fn.lower().replace(' ', ''):
+            return fn
+    return files[0]
+
+
+class FolderScanner:
+    def __init__(self, base, cache_path=None):
+        self.base = base
+        if cache_path is None:
+            cache_path = os.getenv('ABC_SCAN_CACHE', '').strip() or DEFAULT_SCAN_CACHE
+        self.cache_path = cache_path
+        self.cache = self._load()
+        self.listed = 0
+        self.reused = 0
+        self._seen = set()
+        self._results = {}
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if cache.get('base') == self.base else {}
+
+    def save(self):
+        """Write the cache, forgetting directories not seen during this run."""
+        self.cache['base'] = self.base
+        self.cache['dirs'] = {k: v for k, v in self.cache.get('dirs', {}).items() if k in self._seen}
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def folders(self):
+        """Product folder names, in directory listing order."""
+        with os.scandir(self.base) as entries:
+            return [entry.name for entry in entries if entry.is_dir()]
+
+    def color_images(self, folder):
+        """``[(color, image files)]`` for one product folder, sorted by colour, empty colours dropped."""
+        if folder in self._results:
+            return self._results[folder]
+        dirs = self.cache.setdefault('dirs', {})
+        result = []
+        with os.scandir(os.path.join(self.base, folder)) as entries:
+            colors = sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.is_dir())
+        for color, mtime in colors:
+            key = folder + '/' + color
+            self._seen.add(key)
+            cached = dirs.get(key)
+            if cached and cached['mtime'] == mtime:
+                files = cached['files']
+                self.reused += 1
+            else:
+                with os.scandir(os.path.join(self.base, folder, color)) as entries:
+                    files = [e.name for e in entries if e.name.lower().endswith(IMAGE_EXTENSIONS)]
+                dirs[key] = {'mtime': mtime, 'files': files}
+                self.listed += 1
+            if files:
+                result.append((color, files))
+        self._results[folder] = result
+        return result
@@ -0,0 +1,167 @@
+"""Optional pre-upload image optimization for the Strapi import scripts.
+
+    optimizer = optimizer_from_env()           # None unless STRAPI_UPLOAD_OPTIMIZE=1
+    prepared = optimizer.optimize_many(paths)  # {source path: file to upload}
+
+Each image is re-encoded with its longest edge capped (``max_edge``) and
+EXIF/ICC/text metadata dropped. PNGs are saved with zlib optimization, or
+quantized to a 256-colour palette with ``quantize``. ``webp`` converts to WebP
+instead. Work runs in a process pool across all cores. Outputs are cached under
+``cache_dir`` by source SHA-256 plus the settings, so re-runs do not re-encode,
+and an output that is not smaller than its source is discarded in favour of the
+original.
+
+Needs Pillow (listed in ``requirements.txt``); without it the stage is skipped
+and originals are uploaded.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_DIR = PROJECT_ROOT / ".strapi_upload_cache"
+OPTIMIZABLE = {".png", ".jpg", ".jpeg", ".webp"}
+
+
+def _env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode(source, target, settings, suffix):
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((settings["max_edge"], settings["max_edge"]), Image.LANCZOS)
+        if suffix == ".webp":
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            fmt, options = "WEBP", {"quality": settings["quality"], "method": 6}
+        elif suffix == ".png":
+            if settings["quantize"]:
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+            fmt, options = "PNG", {"optimize": True}
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            fmt, options = "JPEG", {"quality": settings["quality"], "optimize": True, "progressive": True}
+        # Copies and conversions keep ``info``, and some encoders write these back from it.
+        image.info.pop("icc_profile", None)
+        image.info.pop("exif", None)
+        image.save(target, fmt, **options)
+
+
+def _optimize_file(job):
+    """Worker: ``(source, settings, cache_dir)`` -> ``(source, output, source_bytes, output_bytes, cached)``."""
+    source, settings, cache_dir = job
+    source = Path(source)
+    source_bytes = source.stat().st_size
+    suffix = ".webp" if settings["webp"] else source.suffix.lower()
+    key = hashlib.sha256(f"{_sha256(source)}|{sorted(settings.items())}".encode("utf-8")).hexdigest()[:32]
+    # Keep the original stem so Strapi media names stay readable.
+    target = Path(cache_dir) / key / (source.stem + suffix)
+    keep_original = Path(cache_dir) / key / ".original"
+
+    if keep_original.exists():
+        return str(source), str(source), source_bytes, source_bytes, True
+    if target.exists():
+        return str(source), str(target), source_bytes, target.stat().st_size, True
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".part")
+    _encode(source, partial, settings, suffix)
+    if partial.stat().st_size >= source_bytes:
+        partial.unlink()
+        keep_original.touch()
+        return str(source), str(source), source_bytes, source_bytes, False
+    os.replace(partial, target)
+    return str(source), str(target), source_bytes, target.stat().st_size, False
+
+
+class ImageOptimizer:
+    def __init__(self, max_edge=2000, webp=False, quantize=False, quality=82, workers=None,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        self.settings = {
+            "max_edge": int(max_edge),
+            "webp": bool(webp),
+            "quantize": bool(quantize),
+            "quality": int(quality),
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = Path(cache_dir)
+        self.stats = {"optimized": 0, "cached": 0, "kept": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def optimize_many(self, paths):
+        """Return ``{path: path to upload}``; unsupported or failed files map to themselves."""
+        paths = [Path(p) for p in dict.fromkeys(paths)]
+        prepared = {path: path for path in paths}
+        if Image is None:
+            print("image optimization: Pillow is not installed; uploading originals", flush=True)
+            return prepared
+
+        jobs = [(str(p), self.settings, str(self.cache_dir)) for p in paths if p.suffix.lower() in OPTIMIZABLE]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(_optimize_file, job): Path(job[0]) for job in jobs}
+            for future, path in futures.items():
+                try:
+                    _, output, source_bytes, output_bytes, cached = future.result()
+                except Exception as exc:
+                    self.stats["failed"] += 1
+                    print(f"image optimization failed for {path.name}: {exc}; uploading original", flush=True)
+                    continue
+                prepared[path] = Path(output)
+                self._count(path, Path(output), source_bytes, output_bytes, cached)
+        saved = self.stats["bytes_in"] - self.stats["bytes_out"]
+        print(
+            f"image optimization: optimized={self.stats['optimized']} cached={self.stats['cached']} "
+            f"kept={self.stats['kept']} failed={self.stats['failed']} saved {saved / 1024:.0f} KiB",
+            flush=True,
+        )
+        return prepared
+
+    def _count(self, source, output, source_bytes, output_bytes, cached):
+        self.stats["bytes_in"] += source_bytes
+        self.stats["bytes_out"] += output_bytes
+        if output == source:
+            self.stats["kept"] += 1
+            return
+        self.stats["cached" if cached else "optimized"] += 1
+        if not cached:
+            saved = source_bytes - output_bytes
+            print(
+                f"  {source.name}: {source_bytes / 1024:.0f} KiB -> {output_bytes / 1024:.0f} KiB "
+                f"(-{saved / 1024:.0f} KiB, {100 * saved / max(source_bytes, 1):.0f}%)",
+                flush=True,
+            )
+
+
+def optimizer_from_env():
+    if not _env_flag("STRAPI_UPLOAD_OPTIMIZE"):
+        return None
+    cache_dir = os.getenv("STRAPI_UPLOAD_OPTIMIZED_DIR", "").strip()
+    return ImageOptimizer(
+        max_edge=int(os.getenv("STRAPI_UPLOAD_MAX_EDGE", "2000")),
+        webp=_env_flag("STRAPI_UPLOAD_WEBP"),
+        quantize=_env_flag("STRAPI_UPLOAD_QUANTIZE"),
+        quality=int(os.getenv("STRAPI_UPLOAD_QUALITY", "82")),
+        workers=int(os.getenv("STRAPI_UPLOAD_OPTIMIZE_WORKERS", "0")) or None,
+        cache_dir=cache_dir or DEFAULT_CACHE_DIR,
+    )
@@ -1,9 +1,10 @@
-import mimetypes
 import os
 from pathlib import Path
 
 import requests
 
+from strapi_uploader import uploader_from_env
+
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 ABC_ROOT = PROJECT_ROOT / "static" / "abc_upload"
@@ -20,20 +21,6 @@ def load_env(path=PROJECT_ROOT / ".env"):
         os.environ.setdefault(key.strip(), value.strip())
 
 
-def upload_media(base_url, token, file_path):
-    mime = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
-    headers = {"Authorization": f"Bearer {token}"}
-    with open(file_path, "rb") as fh:
-        files = {"files": (file_path.name, fh, mime)}
-        resp = requests.post(f"{base_url}/api/upload", headers=headers, files=files, timeout=120)
-    if resp.status_code not in (200, 201):
-        return None, f"upload failed ({resp.status_code})"
-    data = resp.json()
-    if not data:
-        return None, "upload returned empty data"
-    return data[0], None
-
-
 def create_gallery_entry(base_url, collection, token, media_id, title, sort_order, color):
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     payloads = [
@@ -61,11 +48,13 @@ def create_gallery_entry(base_url, collection, token, media_id, title, sort_orde
     return False, last_error
 
 
-def list_existing_gallery_urls(base_url, collection, token):
+def list_existing_gallery_media(base_url, collection, token):
+    """Return ``(urls, media_ids)`` of images already used by gallery entries."""
     headers = {"Authorization": f"Bearer {token}"}
     page = 1
     page_size = 100
     urls = set()
+    media_ids = set()
 
     while True:
         params = {
@@ -75,7 +64,7 @@ def list_existing_gallery_urls(base_url, collection, token):
         }
         resp = requests.get(f"{base_url}/api/{collection}", headers=headers, params=params, timeout=30)
         if resp.status_code != 200:
-            return urls
+            return urls, media_ids
         payload = resp.json()
         data = payload.get("data", [])
         if not isinstance(data, list):
@@ -83,16 +72,14 @@ def list_existing_gallery_urls(base_url, collection, token):
 
         for row in data:
             image = row.get("image")
-            if isinstance(image, dict):
-                url = image.get("url")
-                if url:
-                    urls.add(str(url))
-            elif isinstance(image, list):
-                for img in image:
-                    if isinstance(img, dict):
-                        url = img.get("url")
-                        if url:
-                            urls.add(str(url))
+            images = image if isinstance(image, list) else [image]
+            for img in images:
+                if isinstance(img, dict):
+                    url = img.get("url")
+                    if url:
+                        urls.add(str(url))
+                    if img.get("id") is not None:
+                        media_ids.add(img["id"])
 
         meta = payload.get("meta", {}).get("pagination", {})
         page_count = meta.get("pageCount")
@@ -102,7 +89,7 @@ def list_existing_gallery_urls(base_url, collection, token):
             break
         page += 1
 
-    return urls
+    return urls, media_ids
 
 
 def iter_local_images():
@@ -134,7 +121,7 @@ def main():
     if not ABC_ROOT.exists():
         raise SystemExit(f"Missing folder: {ABC_ROOT}")
 
-    existing_urls = list_existing_gallery_urls(base_url, collection, token)
+    existing_urls, existing_media_ids = list_existing_gallery_media(base_url, collection, token)
 
     uploaded = 0
     created = 0
@@ -143,36 +130,34 @@ def main():
     sort_order = 1
     errors = []
 
-    processed = 0
+    pending = []
     for rel, file_path, title, color in iter_local_images():
-        processed += 1
         # Avoid duplicate entries by file name URL suffix if already present.
         possible_suffix = f"/{file_path.name}"
         if any(url.endswith(possible_suffix) for url in existing_urls):
             skipped += 1
-            if processed % 25 == 0:
-                print(
-                    f"progress processed={processed} uploaded={uploaded} created={created} "
-                    f"skipped={skipped} failed={failed}",
-                    flush=True,
-                )
             continue
+        pending.append((rel, file_path, title, color))
+    print(f"gallery import: {len(pending)} to upload, {skipped} already present", flush=True)
+
+    uploader = uploader_from_env(base_url, token)
+    uploads = uploader.upload_many(file_path for _, file_path, _, _ in pending)
 
-        media, upload_err = upload_media(base_url, token, file_path)
+    # Entries are created in folder order so sort_order stays stable.
+    for processed, (rel, file_path, title, color) in enumerate(pending, start=1):
+        media, upload_err = uploads[file_path]
         if upload_err:
             failed += 1
             errors.append((rel, upload_err))
-            if processed % 25 == 0:
-                print(
-                    f"progress processed={processed} uploaded={uploaded} created={created} "
-                    f"skipped={skipped} failed={failed}",
-                    flush=True,
-                )
             continue
-        uploaded += 1
-
         media_id = media.get("id")
         media_url = media.get("url", "")
+        if media_id in existing_media_ids:
+            # Identical content is already in the gallery under another file name.
+            skipped += 1
+            continue
+        uploaded += 1
+
         ok, create_err = create_gallery_entry(base_url, collection, token, media_id, title, sort_order, color)
         if not ok:
             failed += 1
@@ -180,6 +165,7 @@ def main():
             continue
 
         created += 1
+        existing_media_ids.add(media_id)
         if media_url:
             existing_urls.add(str(media_url))
         sort_order += 1
@@ -1,9 +1,10 @@
-import mimetypes
 import os
 from pathlib import Path
 
 import requests
 
+from strapi_uploader import uploader_from_env
+
 
 ROOT = Path(__file__).resolve().parents[1]
 
@@ -20,15 +21,15 @@ def load_env():
         os.environ.setdefault(k.strip(), v.strip())
 
 
-def upload_image(base_url, token, file_path):
-    mime = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
-    headers = {"Authorization": f"Bearer {token}"}
-    with open(file_path, "rb") as fh:
-        files = {"files": (file_path.name, fh, mime)}
-        resp = requests.post(f"{base_url}/api/upload", headers=headers, files=files, timeout=90)
-    if resp.status_code not in (200, 201):
-        raise RuntimeError(f"Upload failed for {file_path.name}: {resp.status_code} {resp.text[:180]}")
-    return resp.json()[0]["id"]
+def upload_images(base_url, token, file_paths):
+    """Upload ``file_paths`` concurrently and return ``{path: media id}``."""
+    results = uploader_from_env(base_url, token).upload_many(file_paths)
+    media_ids = {}
+    for file_path, (media, error) in results.items():
+        if error:
+            raise RuntimeError(f"Upload failed for {file_path.name}: {error}")
+        media_ids[file_path] = media["id"]
+    return media_ids
 
 
 def main():
@@ -60,7 +61,7 @@ def main():
     allowed_fields = {k for k in allowed_fields if k not in blocked}
 
     hero_paths = [ROOT / "static" / "hero_mac" / "1.png", ROOT / "static" / "hero_mac" / "2.png", ROOT / "static" / "hero_mac" / "3.png"]
-    hero_ids = [upload_image(base_url, token, p) for p in hero_paths if p.exists()]
+    hero_paths = [p for p in hero_paths if p.exists()]
 
     service_defs = [
         (
@@ -79,11 +80,16 @@ def main():
             ROOT / "static" / "services" / "3.svg",
         ),
     ]
+    media_ids = upload_images(
+        base_url, token, hero_paths + [image_path for _, _, image_path in service_defs if image_path.exists()]
+    )
+    hero_ids = [media_ids[p] for p in hero_paths]
+
     common = []
     for title, description, image_path in service_defs:
         entry = {"title": title, "description": description}
-        if image_path.exists():
-            entry["image"] = upload_image(base_url, token, image_path)
+        if image_path in media_ids:
+            entry["image"] = media_ids[image_path]
         common.append(entry)
 
     data = {
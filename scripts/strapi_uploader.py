@@ -0,0 +1,294 @@
+"""Shared bounded-concurrency media uploader for the Strapi sync scripts.
+
+    uploader = uploader_from_env(base_url, token)
+    results = uploader.upload_many(paths)      # {path: (media_dict, error)}
+    media, err = uploader.upload(path)         # single file, same retry/dedup logic
+
+- one pooled keep-alive ``requests.Session`` shared by all workers
+- ``STRAPI_UPLOAD_WORKERS`` concurrent uploads (default 4)
+- retries on 429/5xx and connection errors, with jittered exponential
+  backoff that honours ``Retry-After``
+- content de-duplication by SHA-256. Uploads carry ``caption: sha256:<hex>``,
+  and a local index (``STRAPI_UPLOAD_MANIFEST``, JSON lines, per CMS URL)
+  maps hashes to media. The index is seeded once per run from
+  ``/api/upload/files``: exactly via that caption, or by name and size for
+  media uploaded before hashing. Identical files reuse the existing media
+  id, so re-runs and interrupted runs send no bytes for unchanged files.
+- a progress line every ``progress_every`` files
+- an optional optimization stage (``image_optimizer``, enabled with
+  ``STRAPI_UPLOAD_OPTIMIZE=1``) that shrinks images before they are hashed and
+  sent; results stay keyed by the original paths
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from image_optimizer import optimizer_from_env
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MANIFEST = PROJECT_ROOT / ".strapi_upload_manifest.jsonl"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HASH_CAPTION_PREFIX = "sha256:"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _size_kb(size_bytes):
+    # Strapi stores file sizes in KB rounded to two decimals.
+    return round(size_bytes / 1024, 2)
+
+
+def make_session(token, pool_size=4):
+    """Keep-alive session with room for ``pool_size`` concurrent connections."""
+    session = requests.Session()
+    session.headers["Accept"] = "application/json"
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class MediaUploader:
+    def __init__(self, base_url, token, workers=4, retries=4, timeout=120, backoff=1.0,
+                 manifest_path=DEFAULT_MANIFEST, progress_every=25, optimizer=None):
+        self.base_url = base_url.rstrip("/")
+        self.workers = max(1, int(workers))
+        self.retries = max(0, int(retries))
+        self.timeout = timeout
+        self.backoff = backoff
+        self.progress_every = progress_every
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.optimizer = optimizer
+
+        self.session = make_session(token, self.workers)
+
+        self._lock = threading.Lock()
+        self._by_hash = self._load_manifest()
+        self._remote_by_name = None
+        self.stats = {
+            "uploaded": 0, "known": 0, "reused": 0, "failed": 0, "retries": 0, "bytes": 0, "bytes_saved": 0,
+        }
+
+    # -- hash index -----------------------------------------------------------
+
+    def _load_manifest(self):
+        entries = {}
+        if not self.manifest_path or not self.manifest_path.exists():
+            return entries
+        with self.manifest_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if record["cms"] == self.base_url:
+                        entries[record["sha256"]] = record["media"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # a line cut short by an interrupted run, or an older format
+        return entries
+
+    def _remember(self, digest, media):
+        media = {k: media.get(k) for k in ("id", "documentId", "url", "name", "size")}
+        self._by_hash[digest] = media
+        if not self.manifest_path:
+            return
+        with self.manifest_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"cms": self.base_url, "sha256": digest, "media": media}) + "\n")
+
+    def seed_from_remote(self, page_size=100):
+        """Index media already in Strapi: by ``sha256:`` caption, else by ``(name, size)``."""
+        by_name = {}
+        seen_ids = set()
+        page = 1
+        complete = False
+        while True:
+            try:
+                response = self.session.get(
+                    f"{self.base_url}/api/upload/files",
+                    params={"pagination[page]": page, "pagination[pageSize]": page_size, "sort": "id:asc"},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as exc:
+                print(f"media index: could not list /api/upload/files ({exc}); continuing without it", flush=True)
+                break
+            if response.status_code != 200:
+                print(f"media index: /api/upload/files returned {response.status_code}; continuing without it", flush=True)
+                break
+            payload = response.json()
+            rows = payload if isinstance(payload, list) else payload.get("results") or payload.get("data") or []
+            fresh = [row for row in rows if isinstance(row, dict) and row.get("id") not in seen_ids]
+            for row in fresh:
+                seen_ids.add(row.get("id"))
+                caption = str(row.get("caption") or "")
+                if caption.startswith(HASH_CAPTION_PREFIX):
+                    self._by_hash.setdefault(caption[len(HASH_CAPTION_PREFIX):], row)
+                else:
+                    by_name.setdefault((row.get("name"), row.get("size")), []).append(row)
+            # Older Strapi versions ignore pagination and return everything at once.
+            if len(rows) < page_size or not fresh:
+                complete = True
+                break
+            page += 1
+        if complete:
+            # Forget local entries whose media has since been deleted in Strapi.
+            for digest in [d for d, media in self._by_hash.items() if media.get("id") not in seen_ids]:
+                del self._by_hash[digest]
+        # Name/size matches are only trusted when unambiguous.
+        self._remote_by_name = {key: rows[0] for key, rows in by_name.items() if len(rows) == 1}
+        print(f"media index: {len(self._by_hash)} hashed, {len(self._remote_by_name)} legacy remote files", flush=True)
+
+    def _existing(self, path, digest):
+        """Return ``(media, source)`` for content already in Strapi, or ``(None, None)``."""
+        media = self._by_hash.get(digest)
+        if media is not None:
+            return media, "known"
+        if self._remote_by_name:
+            media = self._remote_by_name.get((path.name, _size_kb(path.stat().st_size)))
+            if media is not None:
+                self._remember(digest, media)
+                return media, "reused"
+        return None, None
+
+    # -- uploads --------------------------------------------------------------
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    def _post(self, path, digest):
+        mime = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+        file_info = json.dumps({"caption": HASH_CAPTION_PREFIX + digest})
+        last_error = "unknown"
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with open(path, "rb") as fh:
+                    response = self.session.post(
+                        f"{self.base_url}/api/upload",
+                        files={"files": (path.name, fh, mime)},
+                        data={"fileInfo": file_info},
+                        timeout=self.timeout,
+                    )
+            except requests.RequestException as exc:
+                last_error = f"upload failed: {exc}"
+            else:
+                if response.status_code in (200, 201):
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        return None, "upload failed: invalid JSON response"
+                    if not data:
+                        return None, "upload failed: empty response"
+                    return data[0], None
+                last_error = f"upload failed ({response.status_code}): {response.text[:250]}"
+                if response.status_code not in RETRY_STATUSES:
+                    break
+            if attempt < self.retries:
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(self._retry_delay(attempt, response))
+        return None, last_error
+
+    def upload(self, path):
+        """Upload one file unless identical content is known; returns ``(media, None)`` or ``(None, error)``."""
+        path = Path(path)
+        if self.optimizer is not None:
+            path = self.optimizer.optimize_many([path])[path]
+        return self._upload(path)
+
+    def _upload(self, path, digest=None):
+        if self._remote_by_name is None:
+            with self._lock:
+                if self._remote_by_name is None:
+                    self.seed_from_remote()
+        digest = digest or file_sha256(path)
+        with self._lock:
+            media, source = self._existing(path, digest)
+            if media is not None:
+                self.stats[source] += 1
+                self.stats["bytes_saved"] += path.stat().st_size
+                return media, None
+
+        media, error = self._post(path, digest)
+        with self._lock:
+            if error:
+                self.stats["failed"] += 1
+            else:
+                self.stats["uploaded"] += 1
+                self.stats["bytes"] += path.stat().st_size
+                self._remember(digest, media)
+        return media, error
+
+    def upload_many(self, paths):
+        """Upload ``paths`` concurrently; returns ``{path: (media, error)}`` in input order.
+
+        Files with identical content are uploaded once and share the media.
+        """
+        unique = list(dict.fromkeys(Path(p) for p in paths))
+        if self.optimizer is not None:
+            prepared = self.optimizer.optimize_many(unique)
+        else:
+            prepared = {path: path for path in unique}
+        if self._remote_by_name is None:
+            self.seed_from_remote()
+        results = {}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            digests = dict(zip(unique, pool.map(file_sha256, (prepared[path] for path in unique))))
+            by_digest = {}
+            for path in unique:
+                by_digest.setdefault(digests[path], []).append(path)
+            futures = {
+                pool.submit(self._upload, prepared[paths[0]], digest): digest for digest, paths in by_digest.items()
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                outcome = future.result()
+                for path in by_digest[futures[future]]:
+                    results[path] = outcome
+                if self.progress_every and (done % self.progress_every == 0 or done == len(futures)):
+                    self._report(done, len(futures), started)
+        return {path: results[path] for path in unique}
+
+    def _report(self, done, total, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        stats = self.stats
+        print(
+            f"upload progress {done}/{total} uploaded={stats['uploaded']} known={stats['known']} "
+            f"reused={stats['reused']} failed={stats['failed']} retries={stats['retries']} "
+            f"{stats['bytes'] / elapsed / 1024:.0f} KiB/s, {stats['bytes_saved'] / 1024:.0f} KiB not re-sent",
+            flush=True,
+        )
+
+
+def uploader_from_env(base_url, token):
+    manifest = os.getenv("STRAPI_UPLOAD_MANIFEST")
+    return MediaUploader(
+        base_url,
+        token,
+        workers=int(os.getenv("STRAPI_UPLOAD_WORKERS", "4")),
+        retries=int(os.getenv("STRAPI_UPLOAD_RETRIES", "4")),
+        timeout=int(os.getenv("STRAPI_UPLOAD_TIMEOUT", "120")),
+        manifest_path=DEFAULT_MANIFEST if manifest is None else manifest.strip(),
+        optimizer=optimizer_from_env(),
+    )
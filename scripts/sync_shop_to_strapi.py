@@ -1,12 +1,16 @@
+import argparse
+import hashlib
 import json
 import os
-from urllib.error import HTTPError
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from strapi_uploader import make_session
 
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 SHOP_JSON_PATH = os.path.join(PROJECT_ROOT, "content", "shop.json")
+DEFAULT_STATE_PATH = os.path.join(PROJECT_ROOT, ".strapi_sync_state.json")
 DEFAULT_PRODUCT_FIELDS = {
     "external_id",
     "name",
@@ -31,24 +35,59 @@ DEFAULT_PRODUCT_FIELDS = {
 }
 
 
-def http_json(url, method="GET", token="", payload=None):
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    data = json.dumps(payload).encode("utf-8") if payload is not None else None
-    req = Request(url=url, method=method, headers=headers, data=data)
-    with urlopen(req, timeout=15) as res:
-        return json.loads(res.read().decode("utf-8"))
+class StrapiHTTPError(Exception):
+    def __init__(self, code, body):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.body = body
 
+    def invalid_key(self):
+        """Field named by a Strapi 400 "Invalid key" validation error, if any."""
+        try:
+            return json.loads(self.body).get("error", {}).get("details", {}).get("key")
+        except (ValueError, AttributeError):
+            return None
+
+
+def http_json(session, url, method="GET", payload=None):
+    res = session.request(method, url, json=payload, timeout=15)
+    if res.status_code >= 400:
+        raise StrapiHTTPError(res.status_code, res.text)
+    return res.json()
+
+
+def list_existing_products(session, strapi_url, collection, page_size=100):
+    """One paged listing pass: ``{external_id: {"key", "updatedAt"}}`` for every entry."""
+    existing = {}
+    page = 1
+    while True:
+        params = {
+            "fields[0]": "external_id",
+            "fields[1]": "updatedAt",
+            "pagination[page]": page,
+            "pagination[pageSize]": page_size,
+        }
+        res = session.get(f"{strapi_url}/api/{collection}", params=params, timeout=30)
+        if res.status_code >= 400:
+            raise StrapiHTTPError(res.status_code, res.text)
+        payload = res.json()
+        rows = payload.get("data", [])
+        for row in rows:
+            attrs = row.get("attributes", row)
+            external_id = attrs.get("external_id")
+            if external_id not in (None, ""):
+                existing[str(external_id)] = {
+                    "key": row.get("documentId") or row.get("id"),
+                    "updatedAt": attrs.get("updatedAt"),
+                }
 
-def find_existing_product(strapi_url, collection, token, external_id):
-    query = urlencode({"filters[external_id][$eq]": external_id, "pagination[pageSize]": 1})
-    url = f"{strapi_url}/api/{collection}?{query}"
-    data = http_json(url, token=token).get("data", [])
-    if data:
-        row = data[0]
-        return row.get("documentId") or row.get("id")
-    return None
+        page_count = payload.get("meta", {}).get("pagination", {}).get("pageCount")
+        if page_count is not None and page >= page_count:
+            break
+        if len(rows) < page_size:
+            break
+        page += 1
+    return existing
 
 
 def build_product_payload(product_id, product):
@@ -76,13 +115,13 @@ def as_blocks_text(text):
     ]
 
 
-def get_allowed_fields(strapi_url, collection, token):
+def get_allowed_fields(session, strapi_url, collection):
     forced = os.getenv("STRAPI_ALLOWED_PRODUCT_FIELDS", "").strip()
     if forced:
         return {x.strip() for x in forced.split(",") if x.strip()}
 
     url = f"{strapi_url}/api/{collection}?pagination[pageSize]=1"
-    data = http_json(url, token=token).get("data", [])
+    data = http_json(session, url).get("data", [])
     if not data:
         # First sync may hit an empty collection; use safe defaults from our schema.
         return set(DEFAULT_PRODUCT_FIELDS)
@@ -103,51 +142,161 @@ def filter_payload_fields(payload, allowed_fields):
     return filtered
 
 
-def detect_description_mode(strapi_url, collection, token):
+def detect_description_mode(session, strapi_url, collection):
     forced = os.getenv("STRAPI_DESCRIPTION_MODE", "").strip().lower()
     if forced in {"text", "blocks"}:
         return forced
 
-    # Probe one existing entry. If text write doesn't persist, use blocks format.
-    query = urlencode({"pagination[pageSize]": 1})
-    url = f"{strapi_url}/api/{collection}?{query}"
-    rows = http_json(url, token=token).get("data", [])
-    if not rows:
-        return "text"
+    # Read-only: infer the format from a stored description instead of writing a probe.
+    url = f"{strapi_url}/api/{collection}?fields[0]=description&filters[description][$notNull]=true&pagination[pageSize]=1"
+    try:
+        rows = http_json(session, url).get("data", [])
+    except StrapiHTTPError as exc:
+        raise SystemExit(
+            f"Could not read a stored description to detect its format ({exc}). "
+            "Set STRAPI_DESCRIPTION_MODE=text or STRAPI_DESCRIPTION_MODE=blocks."
+        ) from exc
+    for row in rows:
+        description = row.get("attributes", row).get("description")
+        if isinstance(description, list):
+            return "blocks"
+        if isinstance(description, str):
+            return "text"
+    raise SystemExit(
+        f"No {collection} entry has a description to detect its format from. "
+        "Set STRAPI_DESCRIPTION_MODE=text or STRAPI_DESCRIPTION_MODE=blocks."
+    )
 
-    row = rows[0]
-    row_key = row.get("documentId") or row.get("id")
-    if not row_key:
-        return "text"
 
-    probe_text = "Description probe for sync"
-    put_url = f"{strapi_url}/api/{collection}/{row_key}"
+class SyncSchema:
+    """Schema facts discovered once per run and shared by all upsert workers."""
 
-    # Try plain text first.
-    try:
-        http_json(put_url, method="PUT", token=token, payload={"data": {"description": probe_text}})
-        check = http_json(f"{strapi_url}/api/{collection}/{row_key}", token=token).get("data", {})
-        if check.get("description") == probe_text:
-            return "text"
-    except HTTPError:
-        pass
+    def __init__(self, allowed_fields, description_mode):
+        self.allowed_fields = allowed_fields
+        self.description_mode = description_mode
+        self._lock = threading.Lock()
 
-    # Try blocks format.
-    try:
-        http_json(put_url, method="PUT", token=token, payload={"data": {"description": as_blocks_text(probe_text)}})
-        check = http_json(f"{strapi_url}/api/{collection}/{row_key}", token=token).get("data", {})
-        if isinstance(check.get("description"), list):
-            return "blocks"
-    except HTTPError:
-        pass
+    def prepare(self, product_id, product):
+        payload = build_product_payload(product_id, product)
+        if "description" in payload["data"]:
+            raw_desc = payload["data"].get("description") or payload["data"].get("desc") or ""
+            if self.description_mode == "blocks":
+                payload["data"]["description"] = as_blocks_text(str(raw_desc))
+            else:
+                payload["data"]["description"] = str(raw_desc)
+        with self._lock:
+            payload["data"] = filter_payload_fields(payload["data"], self.allowed_fields)
+        return payload
 
-    return "text"
+    def reject(self, key):
+        """Drop a field Strapi reported as invalid so later payloads skip it."""
+        with self._lock:
+            if isinstance(self.allowed_fields, set):
+                self.allowed_fields.discard(key)
+
+
+def upsert_product(session, strapi_url, collection, schema, product_id, product, existing_key):
+    """Create or update one product; returns ``(outcome, message, stored_entry)``."""
+    payload = schema.prepare(product_id, product)
+    method = "PUT" if existing_key else "POST"
+    url = f"{strapi_url}/api/{collection}/{existing_key}" if existing_key else f"{strapi_url}/api/{collection}"
+
+    # Retry loop for "Invalid key <field>" errors on first-time schema mismatches.
+    for _ in range(5):
+        try:
+            stored = http_json(session, url, method=method, payload=payload).get("data") or {}
+            return ("updated" if method == "PUT" else "created"), None, stored
+        except StrapiHTTPError as exc:
+            invalid_key = exc.invalid_key()
+            if exc.code == 400 and invalid_key and invalid_key in payload["data"]:
+                payload["data"].pop(invalid_key, None)
+                schema.reject(invalid_key)
+                continue
+            if exc.body:
+                return "failed", f"Failed for product {product_id}: {exc} | {exc.body}", None
+            return "failed", f"Failed for product {product_id}: {exc}", None
+        except Exception as exc:
+            return "failed", f"Failed for product {product_id}: {exc}", None
+    return "failed", f"Failed for product {product_id}: too many retries", None
+
+
+def payload_hash(product_id, product, description_mode):
+    """Canonical hash of what a product would send, independent of key order."""
+    canonical = json.dumps(
+        [description_mode, build_product_payload(product_id, product)],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_state(path, strapi_url, collection):
+    """Per-product ``{hash, updatedAt, key}`` from the last sync against this CMS collection."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("cms") != strapi_url or state.get("collection") != collection:
+        return {}
+    return state.get("products", {})
+
+
+def save_state(path, strapi_url, collection, products):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"cms": strapi_url, "collection": collection, "products": products}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_sync(shop_data, remote, state, description_mode, force=False):
+    """Diff the catalog against the CMS listing and the last sync state.
+
+    Returns ``{product_id: (action, remote_key, hash)}`` where action is one of
+    ``create``, ``update``, ``unchanged`` or ``deleted_upstream`` (synced
+    before but missing from the CMS now; it is created again).
+    """
+    plan = {}
+    for product_id, product in shop_data.items():
+        product_id = str(product_id)
+        digest = payload_hash(product_id, product, description_mode)
+        known = state.get(product_id)
+        current = remote.get(product_id)
+        if current is None:
+            action = "deleted_upstream" if known else "create"
+        elif (
+            not force
+            and known
+            and known.get("hash") == digest
+            and known.get("updatedAt") == current.get("updatedAt")
+        ):
+            action = "unchanged"
+        else:
+            action = "update"
+        plan[product_id] = (action, current and current.get("key"), digest)
+    return plan
+
+
+def print_plan(plan):
+    totals = {}
+    for product_id, (action, _, _) in sorted(plan.items()):
+        totals[action] = totals.get(action, 0) + 1
+        if action != "unchanged":
+            print(f"  {action:<16} {product_id}")
+    summary = ", ".join(f"{action}={totals.get(action, 0)}" for action in ("create", "update", "deleted_upstream", "unchanged"))
+    print(f"Sync plan: {summary}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Push changed products from content/shop.json to Strapi.")
+    parser.add_argument("--dry-run", action="store_true", help="print the sync plan without writing to Strapi")
+    parser.add_argument("--force", action="store_true", help="update every existing product, ignoring the sync state")
+    args = parser.parse_args()
+
     strapi_url = os.getenv("STRAPI_URL", "").strip().rstrip("/")
     token = os.getenv("STRAPI_API_TOKEN", "").strip()
     collection = os.getenv("STRAPI_PRODUCTS_COLLECTION", "products").strip("/")
+    workers = max(1, int(os.getenv("STRAPI_SYNC_WORKERS", "8")))
+    state_path = os.getenv("STRAPI_SYNC_STATE", "").strip() or DEFAULT_STATE_PATH
 
     if not strapi_url:
         raise SystemExit("Missing STRAPI_URL environment variable.")
@@ -157,74 +306,52 @@ def main():
     with open(SHOP_JSON_PATH, "r", encoding="utf-8") as f:
         shop_data = json.load(f)
 
-    created = 0
-    updated = 0
-    failed = 0
-    allowed_fields = get_allowed_fields(strapi_url, collection, token)
-    description_mode = detect_description_mode(strapi_url, collection, token)
-
-    for product_id, product in shop_data.items():
-        payload = build_product_payload(product_id, product)
-        if "description" in payload["data"]:
-            raw_desc = payload["data"].get("description") or payload["data"].get("desc") or ""
-            if description_mode == "blocks":
-                payload["data"]["description"] = as_blocks_text(str(raw_desc))
-            else:
-                payload["data"]["description"] = str(raw_desc)
-        payload["data"] = filter_payload_fields(payload["data"], allowed_fields)
-        try:
-            existing_key = find_existing_product(strapi_url, collection, token, product_id)
-            method = "PUT" if existing_key else "POST"
-            url = f"{strapi_url}/api/{collection}/{existing_key}" if existing_key else f"{strapi_url}/api/{collection}"
-
-            # Retry loop for "Invalid key <field>" errors on first-time schema mismatches.
-            for _ in range(5):
-                try:
-                    http_json(url, method=method, token=token, payload=payload)
-                    if method == "PUT":
-                        updated += 1
-                    else:
-                        created += 1
-                    break
-                except HTTPError as exc:
-                    error_body = ""
-                    try:
-                        error_body = exc.read().decode("utf-8", errors="replace")
-                    except Exception:
-                        pass
-
-                    invalid_key = None
-                    if error_body:
-                        try:
-                            parsed = json.loads(error_body)
-                            invalid_key = (
-                                parsed.get("error", {})
-                                .get("details", {})
-                                .get("key")
-                            )
-                        except Exception:
-                            invalid_key = None
-
-                    if exc.code == 400 and invalid_key and invalid_key in payload["data"]:
-                        payload["data"].pop(invalid_key, None)
-                        if isinstance(allowed_fields, set):
-                            allowed_fields.discard(invalid_key)
-                        continue
-
-                    failed += 1
-                    if error_body:
-                        print(f"Failed for product {product_id}: {exc} | {error_body}")
-                    else:
-                        print(f"Failed for product {product_id}: {exc}")
-                    break
-            else:
-                failed += 1
-                print(f"Failed for product {product_id}: too many retries")
-        except HTTPError as exc:
-            failed += 1
-            print(f"Failed for product {product_id}: {exc}")
+    session = make_session(token, workers)
+    description_mode = detect_description_mode(session, strapi_url, collection)
+    remote = list_existing_products(session, strapi_url, collection)
+    state = load_state(state_path, strapi_url, collection)
+    plan = plan_sync(shop_data, remote, state, description_mode, force=args.force)
+    print_plan(plan)
+    if args.dry_run:
+        return
+    if all(action == "unchanged" for action, _, _ in plan.values()):
+        print(f"Sync complete. Nothing to push; unchanged={len(plan)}")
+        return
+
+    schema = SyncSchema(get_allowed_fields(session, strapi_url, collection), description_mode)
+    # Entries that vanished both locally and upstream are forgotten.
+    next_state = {product_id: entry for product_id, entry in state.items() if product_id in remote}
+    counts = {"created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for product_id, (action, remote_key, digest) in plan.items():
+            if action == "unchanged":
+                counts["unchanged"] += 1
+                next_state[product_id] = state[product_id]
+                continue
+            future = pool.submit(
+                upsert_product, session, strapi_url, collection, schema,
+                product_id, shop_data[product_id], remote_key,
+            )
+            futures[future] = (product_id, digest)
+        for future, (product_id, digest) in futures.items():
+            outcome, message, stored = future.result()
+            counts[outcome] += 1
+            if message:
+                print(message)
+            if stored:
+                attrs = stored.get("attributes", stored)
+                next_state[product_id] = {
+                    "hash": digest,
+                    "updatedAt": attrs.get("updatedAt"),
+                    "key": stored.get("documentId") or stored.get("id"),
+                }
 
-    print(f"Sync complete. created={created}, updated={updated}, failed={failed}")
+    save_state(state_path, strapi_url, collection, next_state)
+    print(
+        f"Sync complete. created={counts['created']}, updated={counts['updated']}, "
+        f"unchanged={counts['unchanged']}, failed={counts['failed']}"
+    )
 
 
 if __name__ == "__main__":
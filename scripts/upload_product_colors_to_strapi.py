@@ -1,10 +1,11 @@
 import json
-import mimetypes
 import os
 from pathlib import Path
 
 import requests
 
+from strapi_uploader import uploader_from_env
+
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SHOP_JSON_PATH = PROJECT_ROOT / "content" / "shop.json"
@@ -26,20 +27,6 @@ def load_shop_data():
         return json.load(f)
 
 
-def upload_file(base_url, token, file_path):
-    mime = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
-    headers = {"Authorization": f"Bearer {token}"}
-    with open(file_path, "rb") as fh:
-        files = {"files": (file_path.name, fh, mime)}
-        resp = requests.post(f"{base_url}/api/upload", headers=headers, files=files, timeout=90)
-    if resp.status_code not in (200, 201):
-        return None, f"upload failed ({resp.status_code}): {resp.text[:250]}"
-    data = resp.json()
-    if not data:
-        return None, "upload failed: empty response"
-    return data[0]["id"], None
-
-
 def fetch_product(base_url, collection, token, external_id):
     headers = {"Authorization": f"Bearer {token}"}
     params = {
@@ -86,6 +73,16 @@ def main():
 
     shop_data = load_shop_data()
 
+    # Upload every referenced color image up front through the shared worker pool.
+    local_files = [
+        PROJECT_ROOT / "static" / img["image_path"]
+        for product in shop_data.values()
+        for img in (product.get("images") or [])
+        if img.get("image_path") and (PROJECT_ROOT / "static" / img["image_path"]).is_file()
+    ]
+    uploader = uploader_from_env(base_url, token)
+    uploads = uploader.upload_many(local_files)
+
     product_ok = 0
     product_failed = 0
     total_colors_uploaded = 0
@@ -110,10 +107,11 @@ def main():
             if not file_path.is_file():
                 continue
 
-            media_id, upload_err = upload_file(base_url, token, file_path)
+            media, upload_err = uploads[file_path]
             if upload_err:
                 errors.append((external_id, upload_err))
                 continue
+            media_id = media["id"]
 
             image_items.append(
                 {
@@ -0,0 +1,132 @@
+"""Per-request timing spans emitted as a ``Server-Timing`` response header.
+
+Code that may be slow wraps itself in ``span(name)``::
+
+    with server_timing.span("cms"):
+        payload = _fetch_json(...)
+
+Durations for the same name are summed per request and reported as
+``cms;dur=12.4;desc="3 calls", norm;dur=3.1, render;dur=8.7, total;dur=31.0``.
+When timing is disabled ``span()`` returns a shared no-op context manager, so the
+instrumentation costs a single context-variable lookup.
+"""
+
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+_current = ContextVar("server_timing", default=None)
+_NOOP = nullcontext()
+
+
+class _Span:
+    __slots__ = ("totals", "name", "started")
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        entry = self.totals.get(self.name)
+        if entry is None:
+            entry = self.totals[self.name] = [0.0, 0]
+        entry[0] += time.perf_counter() - self.started
+        entry[1] += 1
+        return False
+
+
+def span(name):
+    totals = _current.get()
+    if totals is None:
+        return _NOOP
+    return _Span(totals, name)
+
+
+def timed(name):
+    """Decorator form of ``span``."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            totals = _current.get()
+            if totals is None:
+                return fn(*args, **kwargs)
+            with _Span(totals, name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def begin():
+    """Start collecting spans for the current context; returns a token for ``end``."""
+    return _current.set({})
+
+
+def end(token):
+    """Stop collecting and return ``{name: [seconds, count]}`` for the finished context."""
+    totals = _current.get()
+    _current.reset(token)
+    return totals or {}
+
+
+def header_value(totals, total_seconds=None):
+    parts = []
+    for name, (seconds, count) in totals.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app, enabled=True):
+    """Collect spans for every request of ``app`` and add the ``Server-Timing`` header.
+
+    Call this before registering other ``before_request`` hooks so their work is
+    included. Does nothing when ``enabled`` is false.
+    """
+    if not enabled:
+        return
+
+    from flask import before_render_template, g, template_rendered
+
+    @app.before_request
+    def _server_timing_begin():
+        g._server_timing = (begin(), time.perf_counter())
+
+    @app.after_request
+    def _server_timing_header(response):
+        state = g.pop("_server_timing", None)
+        if state is not None:
+            token, started = state
+            totals = end(token)
+            response.headers["Server-Timing"] = header_value(totals, time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def _server_timing_teardown(exc):
+        state = g.pop("_server_timing", None)
+        if state is not None:
+            end(state[0])
+
+    def _render_started(sender, template, context, **extra):
+        totals = _current.get()
+        if totals is not None:
+            g.setdefault("_server_timing_render", []).append(_Span(totals, "render").__enter__())
+
+    def _render_finished(sender, template, context, **extra):
+        pending = g.get("_server_timing_render")
+        if pending:
+            pending.pop().__exit__(None, None, None)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
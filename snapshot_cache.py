@@ -0,0 +1,60 @@
+"""Process-local cache for derived CMS snapshots (gallery ordering, indexes).
+
+A ``SnapshotCache`` holds one value built by ``loader`` and rebuilds it after
+``ttl`` seconds. Only one thread rebuilds; the others keep serving the previous
+value meanwhile. When the loader returns ``None`` (CMS unreachable) the last
+good snapshot is kept and retried after ``retry_seconds``.
+"""
+
+import threading
+import time
+
+import metrics
+
+
+class SnapshotCache:
+    def __init__(self, name, loader, ttl=300, retry_seconds=30):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_seconds = retry_seconds
+        self._value = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        value = self._value
+        if value is not None and now < self._expires:
+            metrics.record_cache(self.name, "hit")
+            return value
+
+        if value is not None and not self._lock.acquire(blocking=False):
+            # Another thread is already rebuilding; serve the stale snapshot.
+            metrics.record_cache(self.name, "stale")
+            return value
+        if value is None:
+            self._lock.acquire()
+        try:
+            if self._value is not None and time.monotonic() < self._expires:
+                metrics.record_cache(self.name, "hit")
+                return self._value
+            metrics.record_cache(self.name, "miss", evictions=1 if self._value is not None else 0)
+            fresh = self.loader()
+            if fresh is None:
+                self._expires = time.monotonic() + self.retry_seconds
+                return self._value
+            self._value = fresh
+            self._expires = time.monotonic() + self.ttl
+            return fresh
+        finally:
+            self._lock.release()
+
+    @property
+    def populated(self):
+        return self._value is not None
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._expires = 0.0
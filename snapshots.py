@@ -0,0 +1,201 @@
+"""Host-wide CMS snapshot shared by all worker processes.
+
+``SNAPSHOT_DIR`` holds two files. ``catalog.bin`` is the normalized catalog
+with its indexes (``mapped_catalog``). Every worker maps it read-only, so one
+copy in the page cache serves the whole host, and a product is decoded only
+when it is read. ``snapshot.json`` holds the gallery images and homepage
+content. With ``wsgi.py`` and ``gunicorn.conf.py`` the gunicorn master loads
+both before forking, so workers make no CMS calls of their own.
+
+Exactly one process per host refreshes the file. Each worker runs a refresher
+thread, but only the holder of an exclusive ``flock`` on ``refresh.lock``
+fetches. When it dies, the next worker to try takes over. Every other
+worker only stats the file (at most every ``check_seconds``) and reloads it
+when a new version is published, swapping to the new catalog mapping in one
+assignment. A kind the CMS fails to return keeps its previous value.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; SNAPSHOT_DIR is for POSIX hosts
+    fcntl = None
+
+import cms_journal
+import json_codec
+import mapped_catalog
+from strapi_client import get_gallery_images, get_homepage_content, get_shop_products
+
+logger = logging.getLogger(__name__)
+
+# Set by ``wsgi.py`` before importing the app: refresher threads then start in
+# each forked worker (``post_fork``) instead of in the master.
+PREFORK = False
+
+FETCHERS = {
+    "catalog": get_shop_products,
+    "gallery": get_gallery_images,
+    "homepage": get_homepage_content,
+}
+
+
+CATALOG = "catalog"
+
+
+class SnapshotStore:
+    """``catalog_options`` are passed to ``mapped_catalog.write`` (``search_text``, ``indexes``)."""
+
+    def __init__(self, directory, refresh_seconds=300, check_seconds=5, fetchers=None, catalog_options=None):
+        if fcntl is None:
+            raise RuntimeError("SNAPSHOT_DIR needs a POSIX host (fcntl.flock)")
+        self.directory = directory
+        self.path = os.path.join(directory, "snapshot.json")
+        self.catalog_path = os.path.join(directory, "catalog.bin")
+        self.lock_path = os.path.join(directory, "refresh.lock")
+        self.refresh_seconds = refresh_seconds
+        self.check_seconds = check_seconds
+        self.fetchers = fetchers or FETCHERS
+        self.catalog_options = catalog_options or {}
+        self._data = {}
+        self._mtime = None
+        self._catalog = None
+        self._catalog_mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._refresher = None
+        os.makedirs(directory, exist_ok=True)
+
+    # -- readers --------------------------------------------------------------
+
+    def get(self, kind):
+        """Latest published value of ``kind`` (``None`` until something is published)."""
+        now = time.monotonic()
+        if now - self._checked >= self.check_seconds:
+            self._checked = now
+            self._reload_if_changed()
+        if kind == CATALOG and self._catalog is not None:
+            return self._catalog
+        return self._data.get(kind)
+
+    @property
+    def version(self):
+        return self._data.get("version")
+
+    def _reload_if_changed(self):
+        catalog_changed = self._remap_catalog_if_changed()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return catalog_changed
+        # os.replace publishes a new inode, so this changes even within one mtime tick.
+        mtime = (st.st_ino, st.st_mtime_ns)
+        if mtime == self._mtime:
+            return catalog_changed
+        with self._lock:
+            if mtime == self._mtime:
+                return catalog_changed
+            try:
+                with open(self.path, "rb") as f:
+                    data = json_codec.loads(f.read())
+            except (OSError, ValueError) as exc:
+                logger.warning("Could not read snapshot %s: %s", self.path, exc)
+                return catalog_changed
+            self._data, self._mtime = data, mtime
+        return True
+
+    def _remap_catalog_if_changed(self):
+        try:
+            st = os.stat(self.catalog_path)
+        except FileNotFoundError:
+            return False
+        mtime = (st.st_ino, st.st_mtime_ns)
+        if mtime == self._catalog_mtime:
+            return False
+        with self._lock:
+            if mtime == self._catalog_mtime:
+                return False
+            try:
+                catalog = mapped_catalog.MappedCatalog(self.catalog_path)
+            except (OSError, ValueError) as exc:
+                logger.warning("Could not map catalog %s: %s", self.catalog_path, exc)
+                return False
+            # Requests still holding the old mapping keep it alive until they finish.
+            self._catalog, self._catalog_mtime = catalog, mtime
+        return True
+
+    # -- refresher ------------------------------------------------------------
+
+    def age(self):
+        try:
+            return time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Fetch every kind from the CMS and publish new snapshot files."""
+        self._reload_if_changed()
+        data = {"version": int(time.time() * 1000)}
+        # Workers keep serving the published snapshot while this refetches it.
+        outcome = "stale" if self.version else "miss"
+        for kind, fetch in self.fetchers.items():
+            with cms_journal.cache_outcome(outcome):
+                value = fetch()
+            if kind == CATALOG:
+                if value is not None:
+                    mapped_catalog.write(self.catalog_path, value, data["version"], **self.catalog_options)
+                continue
+            data[kind] = value if value is not None else self._data.get(kind)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json_codec.dumps_bytes(data))
+        os.replace(tmp_path, self.path)
+        self._reload_if_changed()
+        return data
+
+    def load(self):
+        """Use the published snapshot if it is fresh, else refresh it (under the host lock)."""
+        age = self.age()
+        if age is None or age >= self.refresh_seconds:
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # Another process may have refreshed while we waited for the lock.
+                    age = self.age()
+                    if age is None or age >= self.refresh_seconds:
+                        self.refresh()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._reload_if_changed()
+        self._checked = time.monotonic()
+        return self._data
+
+    def start_refresher(self):
+        """Start this process's refresher thread; only the lock holder ever fetches."""
+        if self._refresher is None or not self._refresher.is_alive():
+            self._refresher = threading.Thread(target=self._refresh_loop, name="snapshot-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        lock_file = open(self.lock_path, "a")
+        interval = max(1.0, min(self.refresh_seconds / 4, 30.0))
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                time.sleep(interval)  # another process refreshes this host
+                continue
+            try:
+                while True:
+                    age = self.age()
+                    if age is None or age >= self.refresh_seconds:
+                        try:
+                            self.refresh()
+                        except Exception as exc:
+                            logger.warning("Snapshot refresh failed: %s", exc)
+                    time.sleep(interval)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
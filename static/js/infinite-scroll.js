@@ -0,0 +1,122 @@
+/*
+ * Opt-in infinite scroll for paginated listings (INFINITE_SCROLL_ENABLED).
+ *
+ * A container opts in with:
+ *   data-infinite-scroll="/api/shop?category=Polo"   JSON endpoint (current filters)
+ *   data-next-cursor="12"                            cursor for the next page
+ *   data-item-template="shop-item-template"          id of a <template> for one item
+ *   data-pagination="#shop-pagination"               pager to hide while scrolling
+ *
+ * Inside the <template>, [data-field="name"] receives item.name as text,
+ * [data-attr="href:url,src:image"] sets attributes from item fields and
+ * [data-repeat="rating"] is repeated item.rating times.
+ * Without IntersectionObserver or on a failed request the regular pager stays.
+ */
+(function () {
+    'use strict';
+
+    function fill(template, item) {
+        var node = template.content.cloneNode(true);
+
+        node.querySelectorAll('[data-field]').forEach(function (el) {
+            var value = item[el.dataset.field];
+            el.textContent = value == null ? '' : value;
+        });
+
+        node.querySelectorAll('[data-attr]').forEach(function (el) {
+            el.dataset.attr.split(',').forEach(function (pair) {
+                var parts = pair.split(':');
+                var value = item[parts[1]];
+                if (value != null && value !== '') {
+                    el.setAttribute(parts[0], value);
+                }
+            });
+        });
+
+        node.querySelectorAll('[data-repeat]').forEach(function (el) {
+            var count = parseInt(item[el.dataset.repeat], 10) || 0;
+            for (var i = 1; i < count; i++) {
+                el.parentNode.insertBefore(el.cloneNode(true), el);
+            }
+            if (count < 1) {
+                el.remove();
+            }
+        });
+
+        node.querySelectorAll('[data-hide-empty]').forEach(function (el) {
+            if (!item[el.dataset.hideEmpty]) {
+                el.remove();
+            }
+        });
+
+        return node;
+    }
+
+    function init(container) {
+        var source = container.dataset.infiniteScroll;
+        var cursor = container.dataset.nextCursor;
+        var template = document.getElementById(container.dataset.itemTemplate);
+        var pager = container.dataset.pagination ? document.querySelector(container.dataset.pagination) : null;
+
+        if (!source || !cursor || !template || !('IntersectionObserver' in window) || !window.fetch) {
+            return;
+        }
+        if (pager) {
+            pager.style.display = 'none';
+        }
+
+        var sentinel = document.createElement('div');
+        sentinel.className = 'infinite-scroll-sentinel';
+        container.parentNode.insertBefore(sentinel, container.nextSibling);
+
+        var loading = false;
+        var observer = new IntersectionObserver(function (entries) {
+            if (entries[0].isIntersecting) {
+                load();
+            }
+        }, { rootMargin: '600px 0px' });
+
+        function stop(showPager) {
+            observer.disconnect();
+            sentinel.remove();
+            if (showPager && pager) {
+                pager.style.display = '';
+            }
+        }
+
+        function load() {
+            if (loading || !cursor) {
+                return;
+            }
+            loading = true;
+            var url = source + (source.indexOf('?') === -1 ? '?' : '&') + 'cursor=' + encodeURIComponent(cursor);
+            fetch(url, { headers: { Accept: 'application/json' }, credentials: 'same-origin' })
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function (data) {
+                    data.items.forEach(function (item) {
+                        container.appendChild(fill(template, item));
+                    });
+                    cursor = data.next_cursor;
+                    loading = false;
+                    if (!cursor) {
+                        stop(false);
+                    }
+                })
+                .catch(function () {
+                    loading = false;
+                    stop(true);
+                });
+        }
+
+        observer.observe(sentinel);
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-infinite-scroll]').forEach(init);
+    });
+})();
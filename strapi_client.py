@@ -1,10 +1,19 @@
-import json
 import logging
 import os
+import time
+from functools import lru_cache
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote, urlencode, urljoin
 from urllib.request import Request, urlopen
 
+import requests
+from requests.adapters import HTTPAdapter
+
+import cms_journal
+import json_codec
+import metrics
+import server_timing
+
 logger = logging.getLogger(__name__)
 
 
@@ -163,6 +172,7 @@ def _normalize_product(entry, fallback_id, strapi_url):
 
     return {
         "id": product_id,
+        "documentId": _safe_get(entry, "documentId", default="") if isinstance(entry, dict) else "",
         "_cms_source": "strapi",
         "external_id": external_id,
         "name": _safe_get(attrs, "name", "title", default=f"Product {product_id}"),
@@ -187,11 +197,35 @@ def _normalize_product(entry, fallback_id, strapi_url):
     }
 
 
-def _fetch_json(url, headers, timeout):
-    req = Request(url=url, headers=headers)
-    with urlopen(req, timeout=timeout) as response:
-        payload = response.read().decode("utf-8")
-        return json.loads(payload)
+def _fetch_json(url, headers, timeout, session=None):
+    """GET ``url`` and decode JSON; HTTP and connection failures raise ``HTTPError`` / ``URLError``."""
+    started = time.perf_counter()
+    status, body = "error", b""
+    try:
+        with server_timing.span("cms"):
+            if session is None:
+                with urlopen(Request(url=url, headers=headers), timeout=timeout) as response:
+                    body = response.read()
+                    status = response.status
+            else:
+                try:
+                    response = session.get(url, headers=headers, timeout=timeout)
+                except requests.Timeout as exc:
+                    raise TimeoutError(str(exc)) from exc
+                except requests.RequestException as exc:
+                    raise URLError(exc) from exc
+                body = response.content
+                status = response.status_code
+                if status >= 400:
+                    raise HTTPError(url, status, response.reason, response.headers, None)
+    except HTTPError as exc:
+        status = exc.code
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe_cms_call(url, elapsed, status, len(body))
+        cms_journal.record(url, status, len(body), elapsed)
+    return json_codec.loads(body)
 
 
 def _media_urls_from_value(value, strapi_url):
@@ -269,193 +303,138 @@ def _normalize_footer_columns(value):
     return columns
 
 
-def get_homepage_content():
-    strapi_url = os.getenv("STRAPI_URL", "").strip().rstrip("/")
-    if not strapi_url:
-        return None
-
-    collection = os.getenv("STRAPI_HOME_COLLECTION", "homepages").strip("/") or "homepages"
-    token = os.getenv("STRAPI_API_TOKEN", "").strip()
-    timeout = int(os.getenv("STRAPI_TIMEOUT_SECONDS", "8"))
-
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {token}",
-        "User-Agent": "Mozilla/5.0"
-    }
-
-    candidates = [collection]
-    if collection.endswith("ies"):
-        candidates.append(collection[:-3] + "y")
-    elif collection.endswith("y"):
-        candidates.append(collection[:-1] + "ies")
-    elif collection.endswith("s"):
-        candidates.append(collection[:-1])
-    else:
-        candidates.append(collection + "s")
-
-    for coll in list(dict.fromkeys(candidates)):
-        try:
-            query = urlencode(
-                {
-                    "populate": "*",
-                    "populate[common][populate]": "*",
-                    "populate[services][populate]": "*",
-                    "populate[nav_links][populate]": "*",
-                    "populate[navbar_links][populate]": "*",
-                    "populate[footer_columns][populate]": "*",
-                    "populate[footer_links][populate]": "*",
-                    "pagination[page]": 1,
-                    "pagination[pageSize]": 1,
-                }
-            )
-            endpoint = f"{strapi_url}/api/{coll}?{query}"
-            payload = _fetch_json(endpoint, headers, timeout)
-            data = payload.get("data", [])
-            if not isinstance(data, list) or not data:
-                continue
-            row = data[0]
-            attrs = row.get("attributes", row) if isinstance(row, dict) else {}
-
-            hero_urls = []
-            for key in ["hero_images", "hero_banners", "images", "banners", "hero"]:
-                hero_urls = _media_urls_from_value(_safe_get(attrs, key, default=None), strapi_url)
-                if hero_urls:
-                    break
-            if not hero_urls:
-                hero_urls = _media_urls_from_value(_safe_get(attrs, "image", "image_path", default=None), strapi_url)
-
-            def _service_image(*keys, default=""):
-                for key in keys:
-                    val = _safe_get(attrs, key, default=None)
-                    media_url = _media_url_from_value(val, strapi_url)
-                    if media_url:
-                        return media_url
-                    if isinstance(val, str) and val.strip():
-                        return val.strip()
-                return default
-
-            common_items = _safe_get(attrs, "common", "services", "service_cards", default=[])
-            if not isinstance(common_items, list):
-                common_items = []
-
-            def _component_title(i, default):
-                if i < len(common_items) and isinstance(common_items[i], dict):
-                    return _safe_get(common_items[i], "title", "name", default=default)
-                return default
-
-            def _component_description(i, default):
-                if i < len(common_items) and isinstance(common_items[i], dict):
-                    return _safe_get(common_items[i], "description", "desc", default=default)
-                return default
-
-            def _component_image(i, default):
-                if i < len(common_items) and isinstance(common_items[i], dict):
-                    media_url = _media_url_from_value(
-                        _safe_get(common_items[i], "image", "media", "file", default=None),
-                        strapi_url,
-                    )
-                    if media_url:
-                        return media_url
-                return default
-
-            service_cards = []
-            for item in common_items:
-                if not isinstance(item, dict):
-                    continue
-                title = _safe_get(item, "title", "name", default="").strip()
-                description = _safe_get(item, "description", "desc", default="").strip()
-                image = _media_url_from_value(_safe_get(item, "image", default=None), strapi_url)
-                if not title and not description and not image:
-                    continue
-                service_cards.append(
-                    {
-                        "title": title or "Service",
-                        "description": description,
-                        "image": image or "/static/images/logo.png",
-                    }
-                )
-
-            trusted_brand_images = _media_urls_from_value(
-                _safe_get(attrs, "trusted_brand_images", "trusted_images", "brand_images", "brands", default=None),
+def _normalize_homepage(row, strapi_url):
+    attrs = row.get("attributes", row) if isinstance(row, dict) else {}
+
+    hero_urls = []
+    for key in ["hero_images", "hero_banners", "images", "banners", "hero"]:
+        hero_urls = _media_urls_from_value(_safe_get(attrs, key, default=None), strapi_url)
+        if hero_urls:
+            break
+    if not hero_urls:
+        hero_urls = _media_urls_from_value(_safe_get(attrs, "image", "image_path", default=None), strapi_url)
+
+    def _service_image(*keys, default=""):
+        for key in keys:
+            val = _safe_get(attrs, key, default=None)
+            media_url = _media_url_from_value(val, strapi_url)
+            if media_url:
+                return media_url
+            if isinstance(val, str) and val.strip():
+                return val.strip()
+        return default
+
+    common_items = _safe_get(attrs, "common", "services", "service_cards", default=[])
+    if not isinstance(common_items, list):
+        common_items = []
+
+    def _component_title(i, default):
+        if i < len(common_items) and isinstance(common_items[i], dict):
+            return _safe_get(common_items[i], "title", "name", default=default)
+        return default
+
+    def _component_description(i, default):
+        if i < len(common_items) and isinstance(common_items[i], dict):
+            return _safe_get(common_items[i], "description", "desc", default=default)
+        return default
+
+    def _component_image(i, default):
+        if i < len(common_items) and isinstance(common_items[i], dict):
+            media_url = _media_url_from_value(
+                _safe_get(common_items[i], "image", "media", "file", default=None),
                 strapi_url,
             )
-            nav_links = _normalize_nav_links(
-                _safe_get(attrs, "nav_links", "navbar_links", "menu_links", default=[])
-            )
-            footer_columns = _normalize_footer_columns(
-                _safe_get(attrs, "footer_columns", "footer_links", default=[])
-            )
-            logo_url = _media_url_from_value(
-                _safe_get(attrs, "logo", "logo_image", "brand_logo", default=None),
-                strapi_url,
-            )
-            footer_brand_logo_url = _media_url_from_value(
-                _safe_get(attrs, "footer_brand_logo", "footer_logo", default=None),
-                strapi_url,
-            )
-            footer_payment_image_url = _media_url_from_value(
-                _safe_get(attrs, "footer_payment_image", "payment_image", default=None),
-                strapi_url,
-            )
-            header_ticker_items = _as_list(
-                _safe_get(attrs, "header_ticker_items", "ticker_items", "announcement_items", default=[])
-            )
+            if media_url:
+                return media_url
+        return default
 
-            return {
-                "hero_images": hero_urls,
-                "logo_url": logo_url,
-                "header_ticker_items": [str(x) for x in header_ticker_items if str(x).strip()],
-                "nav_links": nav_links,
-                "hero_subtitle": _safe_get(attrs, "hero_subtitle", "banner_subtitle", default="Perfect for Summer Evenings"),
-                "hero_title": _safe_get(attrs, "hero_title", "banner_title", default="Casual and Stylish for All Seasons"),
-                "hero_price_text": _safe_get(attrs, "hero_price_text", "banner_price_text", default="Starting From"),
-                "hero_price_value": _safe_get(attrs, "hero_price_value", "banner_price_value", default="$129"),
-                "hero_cta_text": _safe_get(attrs, "hero_cta_text", "banner_cta_text", default="SHOP NOW"),
-                "hero_cta_link": _safe_get(attrs, "hero_cta_link", "banner_cta_link", default="/shop"),
-                "trusted_title": _safe_get(attrs, "trusted_title", default="our work is trusted by big brands"),
-                "trusted_description": _safe_get(
-                    attrs,
-                    "trusted_description",
-                    default="We've supplied clothing and merchandise to some of the largest organisations over the last 5 years. Check out the services we've supplied brands of all sizes below.",
-                ),
-                "trusted_brand_images": trusted_brand_images,
-                "exclusive_offer_subtitle": _safe_get(attrs, "exclusive_offer_subtitle", "offer_subtitle", default="Services"),
-                "exclusive_offer_title": _safe_get(attrs, "exclusive_offer_title", "offer_title", default="Discover Our Exclusive Offerings"),
-                "exclusive_offer_cta_text": _safe_get(attrs, "exclusive_offer_cta_text", "offer_cta_text", default="Make a enquiry"),
-                "exclusive_offer_cta_link": _safe_get(attrs, "exclusive_offer_cta_link", "offer_cta_link", default="#"),
-                "services": service_cards,
-                "service_1_title": _safe_get(attrs, "service_1_title", "white_label_title", default=_component_title(0, "White Label Clothing")),
-                "service_1_description": _safe_get(attrs, "service_1_description", "white_label_description", default=_component_description(0, "Just starting out? Select from our catalogue of products, add your branding and you're good to go. A great solution for small businesses & startup clothing brands.")),
-                "service_1_image": _service_image("service_1_image", "white_label_image", default=_component_image(0, "/static/services/1.svg")),
-                "service_2_title": _safe_get(attrs, "service_2_title", "custom_manufacturing_title", default=_component_title(1, "Custom Clothing Manufacturing")),
-                "service_2_description": _safe_get(attrs, "service_2_description", "custom_manufacturing_description", default=_component_description(1, "Looking for something unique? With our expert guidance, you can design fully custom products, selecting everything from fabrics and sizing to adding your own creative twist. We'll support you every step of the way.")),
-                "service_2_image": _service_image("service_2_image", "custom_manufacturing_image", default=_component_image(1, "/static/services/2.svg")),
-                "service_3_title": _safe_get(attrs, "service_3_title", "garment_design_title", default=_component_title(2, "Garment Design Services")),
-                "service_3_description": _safe_get(attrs, "service_3_description", "garment_design_description", default=_component_description(2, "Need assistance with bringing your ideas to life? We cover everything from start to finish and help businesses with their brand development.")),
-                "service_3_image": _service_image("service_3_image", "garment_design_image", default=_component_image(2, "/static/services/3.svg")),
-                "footer_columns": footer_columns,
-                "footer_connect_title": _safe_get(attrs, "footer_connect_title", default="Connect with us"),
-                "footer_support_title": _safe_get(attrs, "footer_support_title", default="Need help? Call now!"),
-                "footer_phone": _safe_get(attrs, "footer_phone", default="9876543210"),
-                "footer_brand_logo_url": footer_brand_logo_url,
-                "footer_copyright": _safe_get(
-                    attrs,
-                    "footer_copyright",
-                    default="Apparel Branding Company - All Rights Reserved; Created with love by Platfware",
-                ),
-                "footer_payment_image_url": footer_payment_image_url,
+    service_cards = []
+    for item in common_items:
+        if not isinstance(item, dict):
+            continue
+        title = _safe_get(item, "title", "name", default="").strip()
+        description = _safe_get(item, "description", "desc", default="").strip()
+        image = _media_url_from_value(_safe_get(item, "image", default=None), strapi_url)
+        if not title and not description and not image:
+            continue
+        service_cards.append(
+            {
+                "title": title or "Service",
+                "description": description,
+                "image": image or "/static/images/logo.png",
             }
-        except HTTPError as exc:
-            if exc.code == 404:
-                continue
-            logger.warning("Homepage fetch failed from Strapi: %s", exc)
-            return None
-        except (URLError, TimeoutError, ValueError) as exc:
-            logger.warning("Homepage fetch failed from Strapi: %s", exc)
-            return None
+        )
+
+    trusted_brand_images = _media_urls_from_value(
+        _safe_get(attrs, "trusted_brand_images", "trusted_images", "brand_images", "brands", default=None),
+        strapi_url,
+    )
+    nav_links = _normalize_nav_links(
+        _safe_get(attrs, "nav_links", "navbar_links", "menu_links", default=[])
+    )
+    footer_columns = _normalize_footer_columns(
+        _safe_get(attrs, "footer_columns", "footer_links", default=[])
+    )
+    logo_url = _media_url_from_value(
+        _safe_get(attrs, "logo", "logo_image", "brand_logo", default=None),
+        strapi_url,
+    )
+    footer_brand_logo_url = _media_url_from_value(
+        _safe_get(attrs, "footer_brand_logo", "footer_logo", default=None),
+        strapi_url,
+    )
+    footer_payment_image_url = _media_url_from_value(
+        _safe_get(attrs, "footer_payment_image", "payment_image", default=None),
+        strapi_url,
+    )
+    header_ticker_items = _as_list(
+        _safe_get(attrs, "header_ticker_items", "ticker_items", "announcement_items", default=[])
+    )
 
-    return None
+    return {
+        "hero_images": hero_urls,
+        "logo_url": logo_url,
+        "header_ticker_items": [str(x) for x in header_ticker_items if str(x).strip()],
+        "nav_links": nav_links,
+        "hero_subtitle": _safe_get(attrs, "hero_subtitle", "banner_subtitle", default="Perfect for Summer Evenings"),
+        "hero_title": _safe_get(attrs, "hero_title", "banner_title", default="Casual and Stylish for All Seasons"),
+        "hero_price_text": _safe_get(attrs, "hero_price_text", "banner_price_text", default="Starting From"),
+        "hero_price_value": _safe_get(attrs, "hero_price_value", "banner_price_value", default="$129"),
+        "hero_cta_text": _safe_get(attrs, "hero_cta_text", "banner_cta_text", default="SHOP NOW"),
+        "hero_cta_link": _safe_get(attrs, "hero_cta_link", "banner_cta_link", default="/shop"),
+        "trusted_title": _safe_get(attrs, "trusted_title", default="our work is trusted by big brands"),
+        "trusted_description": _safe_get(
+            attrs,
+            "trusted_description",
+            default="We've supplied clothing and merchandise to some of the largest organisations over the last 5 years. Check out the services we've supplied brands of all sizes below.",
+        ),
+        "trusted_brand_images": trusted_brand_images,
+        "exclusive_offer_subtitle": _safe_get(attrs, "exclusive_offer_subtitle", "offer_subtitle", default="Services"),
+        "exclusive_offer_title": _safe_get(attrs, "exclusive_offer_title", "offer_title", default="Discover Our Exclusive Offerings"),
+        "exclusive_offer_cta_text": _safe_get(attrs, "exclusive_offer_cta_text", "offer_cta_text", default="Make a enquiry"),
+        "exclusive_offer_cta_link": _safe_get(attrs, "exclusive_offer_cta_link", "offer_cta_link", default="#"),
+        "services": service_cards,
+        "service_1_title": _safe_get(attrs, "service_1_title", "white_label_title", default=_component_title(0, "White Label Clothing")),
+        "service_1_description": _safe_get(attrs, "service_1_description", "white_label_description", default=_component_description(0, "Just starting out? Select from our catalogue of products, add your branding and you're good to go. A great solution for small businesses & startup clothing brands.")),
+        "service_1_image": _service_image("service_1_image", "white_label_image", default=_component_image(0, "/static/services/1.svg")),
+        "service_2_title": _safe_get(attrs, "service_2_title", "custom_manufacturing_title", default=_component_title(1, "Custom Clothing Manufacturing")),
+        "service_2_description": _safe_get(attrs, "service_2_description", "custom_manufacturing_description", default=_component_description(1, "Looking for something unique? With our expert guidance, you can design fully custom products, selecting everything from fabrics and sizing to adding your own creative twist. We'll support you every step of the way.")),
+        "service_2_image": _service_image("service_2_image", "custom_manufacturing_image", default=_component_image(1, "/static/services/2.svg")),
+        "service_3_title": _safe_get(attrs, "service_3_title", "garment_design_title", default=_component_title(2, "Garment Design Services")),
+        "service_3_description": _safe_get(attrs, "service_3_description", "garment_design_description", default=_component_description(2, "Need assistance with bringing your ideas to life? We cover everything from start to finish and help businesses with their brand development.")),
+        "service_3_image": _service_image("service_3_image", "garment_design_image", default=_component_image(2, "/static/services/3.svg")),
+        "footer_columns": footer_columns,
+        "footer_connect_title": _safe_get(attrs, "footer_connect_title", default="Connect with us"),
+        "footer_support_title": _safe_get(attrs, "footer_support_title", default="Need help? Call now!"),
+        "footer_phone": _safe_get(attrs, "footer_phone", default="9876543210"),
+        "footer_brand_logo_url": footer_brand_logo_url,
+        "footer_copyright": _safe_get(
+            attrs,
+            "footer_copyright",
+            default="Apparel Branding Company - All Rights Reserved; Created with love by Platfware",
+        ),
+        "footer_payment_image_url": footer_payment_image_url,
+    }
 
 
 def _gallery_item_to_image(entry, strapi_url):
@@ -481,55 +460,618 @@ def _gallery_item_to_image(entry, strapi_url):
     }
 
 
-def get_gallery_images():
-    strapi_url = os.getenv("STRAPI_URL", "").strip().rstrip("/")
-    if not strapi_url:
+def _first_present(keys, *aliases):
+    for key in aliases:
+        if key in keys:
+            return key
+    return None
+
+
+def _absolute_media_url(url, strapi_url):
+    url = str(url)
+    if url.startswith("http://") or url.startswith("https://"):
+        return url
+    return urljoin(strapi_url + "/", url.lstrip("/"))
+
+
+@lru_cache(maxsize=8)
+def _media_url_joiner(strapi_url):
+    """Return a ``url -> absolute url`` function equivalent to ``_absolute_media_url``.
+
+    Plain upload paths are concatenated onto the base; anything ``urljoin`` would
+    rewrite (dot or empty segments, schemes, params, queries, control characters) still goes
+    through ``urljoin``.
+    """
+    base = strapi_url + "/"
+    if "?" in base or "#" in base:
+        return lambda url: _absolute_media_url(url, strapi_url)
+
+    def join(url):
+        url = str(url)
+        if url.startswith("http://") or url.startswith("https://"):
+            return url
+        relative = url.lstrip("/")
+        if (
+            not relative
+            or relative[0] <= " "
+            or relative[0] == "."
+            or ":" in relative
+            or "?" in relative
+            or "#" in relative
+            or ";" in relative
+            or "//" in relative
+            or "/." in relative
+            or "\t" in relative
+            or "\r" in relative
+            or "\n" in relative
+        ):
+            return urljoin(base, relative)
+        return base + relative
+
+    return join
+
+
+def _compile_media_urls(sample, strapi_url):
+    """Return a ``value -> [url, ...]`` extractor specialised for the shape of ``sample``.
+
+    Values that do not match the detected shape fall back to ``_media_urls_from_value``,
+    so the result is always identical to the generic walker.
+    """
+    join = _media_url_joiner(strapi_url)
+
+    def generic(value):
+        return _media_urls_from_value(value, strapi_url)
+
+    def file_urls(item):
+        if item.__class__ is dict and "data" not in item:
+            url = item.get("url")
+            return [join(url)] if url else []
+        return _media_urls_from_value(item, strapi_url)
+
+    if isinstance(sample, list):
+        # Strapi v5: multi media is a plain list of file objects.
+        def from_file_list(value):
+            if value.__class__ is not list:
+                return _media_urls_from_value(value, strapi_url)
+            urls = []
+            for item in value:
+                if item:
+                    urls.extend(file_urls(item))
+            return urls
+
+        return from_file_list
+
+    if isinstance(sample, dict):
+        data = sample.get("data")
+        if isinstance(data, list):
+            # Strapi v4: {"data": [{"id": .., "attributes": {...}}]}
+            def from_data_list(value):
+                if value.__class__ is not dict or value.get("data").__class__ is not list:
+                    return _media_urls_from_value(value, strapi_url)
+                urls = []
+                for item in value["data"]:
+                    if isinstance(item, dict):
+                        urls.extend(file_urls(item.get("attributes", item)))
+                return urls
+
+            return from_data_list
+        if "data" not in sample:
+            # Strapi v5: single media is a bare file object.
+            def from_file(value):
+                return file_urls(value) if value else []
+
+            return from_file
+
+    return generic
+
+
+def _compile_media_url(sample, strapi_url):
+    """Single-URL counterpart of ``_compile_media_urls`` (mirrors ``_media_url_from_value``)."""
+    join = _media_url_joiner(strapi_url)
+
+    def file_url(item):
+        if item.__class__ is dict and "data" not in item:
+            url = item.get("url")
+            return join(url) if url else ""
+        return _media_url_from_value(item, strapi_url)
+
+    if isinstance(sample, dict) and "data" not in sample:
+        return file_url
+
+    if isinstance(sample, dict) and isinstance(sample.get("data"), dict) and "url" not in sample:
+        # Strapi v4: {"data": {"id": .., "attributes": {...}}}
+        def from_data(value):
+            if value.__class__ is not dict or "url" in value or value.get("data").__class__ is not dict:
+                return _media_url_from_value(value, strapi_url)
+            data = value["data"]
+            return file_url(data.get("attributes", data))
+
+        return from_data
+
+    if isinstance(sample, list):
+        # A bare list is never a media shape for the single-URL walker.
+        def from_list(value):
+            if value.__class__ is list:
+                return ""
+            return _media_url_from_value(value, strapi_url)
+
+        return from_list
+
+    def generic(value):
+        return _media_url_from_value(value, strapi_url)
+
+    return generic
+
+
+def _color_name(value):
+    if isinstance(value, dict):
+        return _safe_get(value, "name", "color", default="default")
+    if isinstance(value, list):
+        names = []
+        for entry in value:
+            if isinstance(entry, dict):
+                name = _safe_get(entry, "name", "color", default="")
+                if name:
+                    names.append(str(name))
+            elif entry:
+                names.append(str(entry))
+        return names[0] if names else "default"
+    return value
+
+
+def _row_attributes(row):
+    if not isinstance(row, dict):
+        return None
+    attrs = row.get("attributes", row)
+    if not isinstance(attrs, dict):
+        return None
+    return attrs
+
+
+def _compiled_for(row, cache, compile_fn, strapi_url):
+    """Return the compiled normalizer for ``row``'s shape, building it on first sight.
+
+    Rows are keyed on their (outer, attributes) key tuples, so a homogeneous Strapi
+    response compiles exactly once and mixed shapes still normalize correctly.
+    Returns ``None`` for rows the compiled path does not handle.
+    """
+    attrs = _row_attributes(row)
+    if attrs is None:
+        return None
+    signature = (tuple(row), None if attrs is row else tuple(attrs))
+    normalizer = cache.get(signature)
+    if normalizer is None:
+        normalizer = cache[signature] = compile_fn(row, strapi_url)
+    return normalizer
+
+
+def _compile_image_item_normalizer(item, strapi_url):
+    attrs = _row_attributes(item)
+    wrapped = attrs is not item
+    color_key = _first_present(attrs, "color", "name")
+    alt_key = _first_present(attrs, "image_alt", "alt", "alternativeText", "name")
+    image_key = _first_present(attrs, "image_path", "image", "media", "photo")
+    has_url = "url" in attrs
+    sample = attrs[image_key] if image_key else ""
+    media_urls = _compile_media_urls(sample, strapi_url)
+    media_url = _compile_media_url(sample, strapi_url)
+
+    def normalize(item):
+        attrs = item["attributes"] if wrapped else item
+        color = str(_color_name(attrs[color_key] if color_key else "default") or "default")
+        image_alt = attrs[alt_key] if alt_key else ""
+        image_value = attrs[image_key] if image_key else ""
+        image_urls = media_urls(image_value) if image_value else []
+
+        if not image_urls:
+            image_url = media_url(image_value) if image_value else ""
+            if image_url:
+                image_urls = [image_url]
+        if not image_urls and has_url:
+            image_url = _media_url_from_value(attrs, strapi_url)
+            if image_url:
+                image_urls = [image_url]
+
+        return [
+            {
+                "image_path": image_url,
+                "image_alt": image_alt,
+                "color": color,
+            }
+            for image_url in image_urls
+        ]
+
+    return normalize
+
+
+def _compile_images_normalizer(sample, strapi_url):
+    """Compiled counterpart of ``_normalize_images`` for one product collection."""
+    item_cache = {}
+
+    def normalize_item(item):
+        compiled = _compiled_for(item, item_cache, _compile_image_item_normalizer, strapi_url)
+        if compiled is None:
+            return _normalize_image_item(item, strapi_url)
+        return compiled(item)
+
+    def normalize_items(items):
+        images = []
+        for item in items:
+            normalized_items = normalize_item(item)
+            if normalized_items:
+                images.extend(normalized_items)
+        return images
+
+    if isinstance(sample, list):
+        def from_list(value):
+            if value.__class__ is list:
+                return normalize_items(value)
+            return _normalize_images(value, strapi_url)
+
+        return from_list
+
+    if isinstance(sample, dict) and isinstance(sample.get("data"), list):
+        def from_data_list(value):
+            if value.__class__ is dict and value.get("data").__class__ is list:
+                return normalize_items(value["data"])
+            return _normalize_images(value, strapi_url)
+
+        return from_data_list
+
+    def generic(value):
+        return _normalize_images(value, strapi_url)
+
+    return generic
+
+
+def _compile_product_normalizer(row, strapi_url):
+    """Resolve field aliases and media shapes once for rows shaped like ``row``."""
+    attrs = _row_attributes(row)
+    wrapped = attrs is not row
+
+    def key(*aliases):
+        return _first_present(attrs, *aliases)
+
+    id_key = _first_present(row, "id", "documentId")
+    document_id_key = _first_present(row, "documentId")
+    external_id_key = key("external_id")
+    images_key = key("images", "gallery_images")
+    image_key = key("image")
+    color_key = key("color")
+    fallback_alt_key = key("image_alt", "alt_text", "name")
+    primary_key = key("image_path", "image", "thumbnail")
+    desc_key = key("desc", "short_description", "summary")
+    description_key = key("description", "long_description")
+    price_key = key("price", "delivery_time")
+    sizes_key = key("Sizes", "sizes")
+    extended_sizes_key = key("extended_sizes", "extendedSizes")
+    name_key = key("name", "title")
+    category_key = key("category")
+    keywords_key = key("keywords", "tags")
+    extended_moq_key = key("extended_moq", "extendedMoq")
+    image_alt_key = key("image_alt", "alt_text")
+    decorations_key = key("decorations")
+    delivery_time_key = key("delivery_time")
+    instructions_key = key("instructions")
+    discount_key = key("discount")
+    colors_available_key = key("colors_available", "colorsAvailable")
+    custom_color_key = key("custom_color", "customColor")
+    product_details_key = key("product_details", "productDetails")
+
+    images_normalizer = _compile_images_normalizer(attrs[images_key] if images_key else [], strapi_url)
+    fallback_media_urls = _compile_media_urls(attrs[image_key] if image_key else None, strapi_url)
+    primary_media_url = _compile_media_url(attrs[primary_key] if primary_key else "", strapi_url)
+
+    def normalize(entry, fallback_id):
+        attrs = entry["attributes"] if wrapped else entry
+        raw_id = entry[id_key] if id_key else None
+        external_id = attrs[external_id_key] if external_id_key else ""
+        product_id = str(external_id or raw_id or fallback_id)
+
+        images = images_normalizer(attrs[images_key] if images_key else [])
+        if not images:
+            fallback_urls = fallback_media_urls(attrs[image_key]) if image_key and attrs[image_key] else []
+            if fallback_urls:
+                color_names = []
+                for value in _as_list(attrs[color_key] if color_key else []):
+                    if isinstance(value, dict):
+                        color_name = _safe_get(value, "name", "color", default="")
+                        if color_name:
+                            color_names.append(str(color_name))
+                    elif value:
+                        color_names.append(str(value))
+                fallback_alt = attrs[fallback_alt_key] if fallback_alt_key else ""
+                for index, image_url in enumerate(fallback_urls):
+                    color_name = "default"
+                    if color_names:
+                        color_name = color_names[index] if index < len(color_names) else color_names[0]
+                    images.append(
+                        {
+                            "image_path": image_url,
+                            "image_alt": fallback_alt,
+                            "color": color_name or "default",
+                        }
+                    )
+        primary_value = attrs[primary_key] if primary_key else ""
+        primary_image = primary_media_url(primary_value) if primary_value else ""
+        if not primary_image and images:
+            primary_image = images[0]["image_path"]
+
+        desc = attrs[desc_key] if desc_key else ""
+        name = attrs[name_key] if name_key else None
+        return {
+            "id": product_id,
+            "documentId": entry[document_id_key] if document_id_key else "",
+            "_cms_source": "strapi",
+            "external_id": external_id,
+            "name": name if name_key else f"Product {product_id}",
+            "category": attrs[category_key] if category_key else "Custom",
+            "keywords": _as_list(attrs[keywords_key] if keywords_key else []),
+            "desc": desc,
+            "description": attrs[description_key] if description_key else desc,
+            "price": str(attrs[price_key] if price_key else "72 Hours Delivery"),
+            "Sizes": [str(s) for s in _as_list(attrs[sizes_key] if sizes_key else [])],
+            "extended_sizes": [str(s) for s in _as_list(attrs[extended_sizes_key] if extended_sizes_key else [])],
+            "extended_moq": attrs[extended_moq_key] if extended_moq_key else "100 MOQ",
+            "image_alt": attrs[image_alt_key] if image_alt_key else (name if name_key else "Product"),
+            "decorations": [str(x) for x in _as_list(attrs[decorations_key] if decorations_key else [])],
+            "delivery_time": attrs[delivery_time_key] if delivery_time_key else "72 Hours Delivery",
+            "instructions": [str(x) for x in _as_list(attrs[instructions_key] if instructions_key else [])],
+            "discount": attrs[discount_key] if discount_key else "",
+            "colors_available": attrs[colors_available_key] if colors_available_key else "",
+            "custom_color": attrs[custom_color_key] if custom_color_key else "",
+            "product_details": [
+                str(x) for x in _as_list(attrs[product_details_key] if product_details_key else [])
+            ],
+            "images": images,
+            "image_path": primary_image,
+        }
+
+    return normalize
+
+
+def _compile_gallery_normalizer(row, strapi_url):
+    """Compiled counterpart of ``_gallery_item_to_image`` for rows shaped like ``row``."""
+    attrs = _row_attributes(row)
+    wrapped = attrs is not row
+    image_key = _first_present(attrs, "image", "file", "media", "photo")
+    url_key = _first_present(attrs, "url", "image_path")
+    label_key = _first_present(attrs, "color", "title", "name", "alt_text")
+    order_key = _first_present(attrs, "sort_order", "order")
+    image_media_url = _compile_media_url(attrs[image_key] if image_key else None, strapi_url)
+
+    def normalize(entry):
+        attrs = entry["attributes"] if wrapped else entry
+        image_value = attrs[image_key] if image_key else None
+        image_url = image_media_url(image_value) if image_value else ""
+        if not image_url:
+            image_url = _media_url_from_value(attrs[url_key] if url_key else "", strapi_url)
+        if not image_url:
+            return None
+
+        order = attrs[order_key] if order_key else 0
+        try:
+            order = int(order)
+        except Exception:
+            order = 0
+
+        return {
+            "url": image_url,
+            "color": str(attrs[label_key] if label_key else "Gallery"),
+            "sort_order": order,
+        }
+
+    return normalize
+
+
+class StrapiClient:
+    """Strapi access with configuration read once and a pooled keep-alive session.
+
+    Create one at startup (``StrapiClient.from_env()``) and install it with
+    ``set_client``. The client remembers which singular/plural collection name
+    answered, so a misnamed collection costs one 404 probe per process, and a
+    collection that answered 404 under every candidate is not probed again for
+    ``MISSING_RETRY_SECONDS``.
+    """
+
+    MISSING_RETRY_SECONDS = 300
+
+    def __init__(self, base_url, token="", timeout=8, collections=None, pool_size=10):
+        self.base_url = str(base_url or "").strip().rstrip("/")
+        self.timeout = timeout
+        self.collections = {"products": "products", "galleries": "galleries", "homepages": "homepages"}
+        self.collections.update({k: v for k, v in (collections or {}).items() if v})
+        self.headers = {"Accept": "application/json", "User-Agent": "Mozilla/5.0"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._resolved = {}
+        self._missing = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv("STRAPI_URL", ""),
+            token=os.getenv("STRAPI_API_TOKEN", "").strip(),
+            timeout=int(os.getenv("STRAPI_TIMEOUT_SECONDS", "8")),
+            collections={
+                "products": os.getenv("STRAPI_PRODUCTS_COLLECTION", "products").strip("/"),
+                "galleries": os.getenv("STRAPI_GALLERY_COLLECTION", "galleries").strip("/"),
+                "homepages": os.getenv("STRAPI_HOME_COLLECTION", "homepages").strip("/"),
+            },
+        )
+
+    @property
+    def configured(self):
+        return bool(self.base_url)
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, url):
+        return _fetch_json(url, self.headers, self.timeout, session=self.session)
+
+    def _candidates(self, kind):
+        collection = self.collections[kind]
+        if kind in self._resolved:
+            return [self._resolved[kind]]
+        missing_since = self._missing.get(kind)
+        if missing_since is not None and time.monotonic() - missing_since < self.MISSING_RETRY_SECONDS:
+            return []
+        candidates = [collection]
+        if collection.endswith("ies"):
+            candidates.append(collection[:-3] + "y")
+        elif collection.endswith("y"):
+            candidates.append(collection[:-1] + "ies")
+        elif collection.endswith("s"):
+            candidates.append(collection[:-1])
+        else:
+            candidates.append(collection + "s")
+        return list(dict.fromkeys(candidates))
+
+    def _resolved_as(self, kind, collection):
+        self._resolved[kind] = collection
+        self._missing.pop(kind, None)
+
+    def _not_found(self, kind):
+        self._resolved.pop(kind, None)
+        self._missing[kind] = time.monotonic()
+
+    def homepage(self):
+        if not self.configured:
+            return None
+
+        query = urlencode(
+            {
+                "populate": "*",
+                "populate[common][populate]": "*",
+                "populate[services][populate]": "*",
+                "populate[nav_links][populate]": "*",
+                "populate[navbar_links][populate]": "*",
+                "populate[footer_columns][populate]": "*",
+                "populate[footer_links][populate]": "*",
+                "pagination[page]": 1,
+                "pagination[pageSize]": 1,
+            }
+        )
+        for coll in self._candidates("homepages"):
+            try:
+                payload = self._get(f"{self.base_url}/api/{coll}?{query}")
+                self._resolved_as("homepages", coll)
+                data = payload.get("data", [])
+                if not isinstance(data, list) or not data:
+                    continue
+                row = data[0]
+                with server_timing.span("norm"):
+                    return _normalize_homepage(row, self.base_url)
+            except HTTPError as exc:
+                if exc.code == 404:
+                    continue
+                logger.warning("Homepage fetch failed from Strapi: %s", exc)
+                return None
+            except (URLError, TimeoutError, ValueError) as exc:
+                logger.warning("Homepage fetch failed from Strapi: %s", exc)
+                return None
+
+        if "homepages" not in self._resolved:
+            self._not_found("homepages")
         return None
 
-    collection = os.getenv("STRAPI_GALLERY_COLLECTION", "galleries").strip("/")
-    if not collection:
-        collection = "galleries"
+    def gallery_images(self):
+        if not self.configured:
+            return None
 
-    token = os.getenv("STRAPI_API_TOKEN", "").strip()
-    timeout = int(os.getenv("STRAPI_TIMEOUT_SECONDS", "8"))
+        for coll in self._candidates("galleries"):
+            page = 1
+            page_size = 100
+            images = []
+            normalizers = {}
+            try:
+                while True:
+                    query = urlencode(
+                        {
+                            "populate": "*",
+                            "pagination[page]": page,
+                            "pagination[pageSize]": page_size,
+                        }
+                    )
+                    payload = self._get(f"{self.base_url}/api/{coll}?{query}")
+                    self._resolved_as("galleries", coll)
+                    data = payload.get("data", [])
+                    if not isinstance(data, list):
+                        break
+
+                    with server_timing.span("norm"):
+                        for row in data:
+                            compiled = _compiled_for(row, normalizers, _compile_gallery_normalizer, self.base_url)
+                            normalized = compiled(row) if compiled else _gallery_item_to_image(row, self.base_url)
+                            if normalized:
+                                images.append(normalized)
+
+                    pagination = payload.get("meta", {}).get("pagination", {})
+                    page_count = pagination.get("pageCount")
+                    if page_count is not None and page >= page_count:
+                        break
+                    if len(data) < page_size:
+                        break
+                    page += 1
+            except HTTPError as exc:
+                if exc.code == 404:
+                    continue
+                logger.warning("Gallery fetch failed from Strapi: %s", exc)
+                return None
+            except (URLError, TimeoutError, ValueError) as exc:
+                logger.warning("Gallery fetch failed from Strapi: %s", exc)
+                return None
+
+            images.sort(key=lambda x: x.get("sort_order", 0))
+            metrics.record_snapshot("gallery", len(images))
+            return images
 
-    headers = {"Accept": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+        self._not_found("galleries")
+        logger.warning("Gallery fetch failed from Strapi: collection not found (%s)", self.collections["galleries"])
+        return None
 
-    candidates = [collection]
-    if collection.endswith("ies"):
-        candidates.append(collection[:-3] + "y")
-    elif collection.endswith("y"):
-        candidates.append(collection[:-1] + "ies")
-    elif collection.endswith("s"):
-        candidates.append(collection[:-1])
-    else:
-        candidates.append(collection + "s")
+    def shop_products(self):
+        if not self.configured:
+            return None
 
-    for coll in list(dict.fromkeys(candidates)):
+        collection = self.collections["products"]
         page = 1
         page_size = 100
-        images = []
+        all_products = {}
+        normalizers = {}
+
         try:
             while True:
                 query = urlencode(
                     {
                         "populate": "*",
+                        "populate[images][populate]": "*",
+                        "sort[0]": "updatedAt:desc",
                         "pagination[page]": page,
                         "pagination[pageSize]": page_size,
                     }
                 )
-                endpoint = f"{strapi_url}/api/{coll}?{query}"
-                payload = _fetch_json(endpoint, headers, timeout)
+                payload = self._get(f"{self.base_url}/api/{collection}?{query}")
                 data = payload.get("data", [])
                 if not isinstance(data, list):
                     break
 
-                for row in data:
-                    normalized = _gallery_item_to_image(row, strapi_url)
-                    if normalized:
-                        images.append(normalized)
+                with server_timing.span("norm"):
+                    for index, row in enumerate(data, start=1):
+                        compiled = _compiled_for(row, normalizers, _compile_product_normalizer, self.base_url)
+                        if compiled:
+                            product = compiled(row, f"{page}-{index}")
+                        else:
+                            product = _normalize_product(row, fallback_id=f"{page}-{index}", strapi_url=self.base_url)
+                        raw_strapi_id = str(_safe_get(row, "id", default=f"{page}-{index}"))
+                        external_id = str(product.get("external_id", "")).strip()
+                        product_key = external_id if external_id and external_id not in ("None", "") else raw_strapi_id
+                        all_products[product_key] = product
 
                 pagination = payload.get("meta", {}).get("pagination", {})
                 page_count = pagination.get("pageCount")
@@ -538,80 +1080,38 @@ def get_gallery_images():
                 if len(data) < page_size:
                     break
                 page += 1
-        except HTTPError as exc:
-            if exc.code == 404:
-                continue
-            logger.warning("Gallery fetch failed from Strapi: %s", exc)
-            return None
-        except (URLError, TimeoutError, ValueError) as exc:
-            logger.warning("Gallery fetch failed from Strapi: %s", exc)
+        except (HTTPError, URLError, TimeoutError, ValueError) as exc:
+            logger.warning("Falling back to local shop.json because Strapi fetch failed: %s", exc)
             return None
 
-        images.sort(key=lambda x: x.get("sort_order", 0))
-        return images
+        metrics.record_snapshot("products", len(all_products))
+        return all_products
 
-    logger.warning("Gallery fetch failed from Strapi: collection not found (%s)", collection)
-    return None
 
+_default_client = None
 
-def get_shop_products():
-    strapi_url = os.getenv("STRAPI_URL", "").strip().rstrip("/")
-    if not strapi_url:
-        return None
 
-    collection = os.getenv("STRAPI_PRODUCTS_COLLECTION", "products").strip("/")
-    if not collection:
-        collection = "products"
+def get_client():
+    """The installed client, created from the environment on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = StrapiClient.from_env()
+    return _default_client
 
-    token = os.getenv("STRAPI_API_TOKEN", "").strip()
-    timeout = int(os.getenv("STRAPI_TIMEOUT_SECONDS", "8"))
 
-    headers = {"Accept": "application/json"}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+def set_client(client):
+    """Install ``client`` for the module-level helpers; ``None`` re-reads the environment on next use."""
+    global _default_client
+    _default_client = client
 
-    page = 1
-    page_size = 100
-    all_products = {}
 
-    try:
-        while True:
-            query = urlencode(
-<<<<<<< HEAD
-                {
-                    "populate": "*",
-                    "populate[images][populate]": "*",
-=======
-                {   
-                    "populate": "*",
->>>>>>> f3025387d8e2326436640e00906cf1ef18ad292d
-                    "sort[0]": "updatedAt:desc",
-                    "pagination[page]": page,
-                    "pagination[pageSize]": page_size,
-                }   
-            )
-            endpoint = f"{strapi_url}/api/{collection}?{query}"
-            payload = _fetch_json(endpoint, headers, timeout)
-            data = payload.get("data", [])
-            if not isinstance(data, list):
-                break
-
-            for index, row in enumerate(data, start=1):
-                product = _normalize_product(row, fallback_id=f"{page}-{index}", strapi_url=strapi_url)
-                raw_strapi_id = str(_safe_get(row, "id", default=f"{page}-{index}"))
-                external_id = str(product.get("external_id", "")).strip()
-                product_key = external_id if external_id and external_id not in ("None", "") else raw_strapi_id
-                all_products[product_key] = product
-
-            pagination = payload.get("meta", {}).get("pagination", {})
-            page_count = pagination.get("pageCount")
-            if page_count is not None and page >= page_count:
-                break
-            if len(data) < page_size:
-                break
-            page += 1
-    except (HTTPError, URLError, TimeoutError, ValueError) as exc:
-        logger.warning("Falling back to local shop.json because Strapi fetch failed: %s", exc)
-        return None
+def get_homepage_content():
+    return get_client().homepage()
+
 
-    return all_products
+def get_gallery_images():
+    return get_client().gallery_images()
+
+
+def get_shop_products():
+    return get_client().shop_products()
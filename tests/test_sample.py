@@ -1,9 +1,38 @@
+import atexit
+import json
 import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from pathlib import Path
+from unittest.mock import Mock, patch
 
 import app
+import assets
+import build_assets
+import cache
+import cms_journal
+import gallery
+import json_codec
+import mapped_catalog
+import metrics
+import profiling
+import related
+import server_timing
+import snapshots
 import strapi_client
+import verify_images
+import warmup
+from benchmarks.fake_strapi import FakeStrapi
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import abc_matcher  # noqa: E402
+import image_optimizer  # noqa: E402
+import strapi_uploader  # noqa: E402
+import sync_shop_to_strapi  # noqa: E402
 
 
 class AppHelpersTests(unittest.TestCase):
@@ -21,6 +50,18 @@ class AppHelpersTests(unittest.TestCase):
                 "/static/abc_upload/item/image.png",
             )
 
+    def test_resolve_media_url_for_cms_upload_uses_client_base_url(self):
+        client = strapi_client.StrapiClient("http://cms.internal:1337/")
+        with app.app.test_request_context("/"), patch.object(strapi_client, "_default_client", client), \
+                patch.dict(os.environ, {"STRAPI_URL": "http://stale.example.com"}):
+            self.assertEqual(app.resolve_media_url("/uploads/tee.png"), "http://cms.internal:1337/uploads/tee.png")
+        with app.app.test_request_context("/"), patch.object(
+            strapi_client, "_default_client", strapi_client.StrapiClient("")
+        ):
+            self.assertEqual(
+                app.resolve_media_url("/uploads/tee.png"), "https://cms.apparelbrandingcompany.in/uploads/tee.png"
+            )
+
     def test_resolve_media_url_for_absolute_url(self):
         with app.app.test_request_context("/"):
             url = "https://cdn.example.com/image.png"
@@ -28,7 +69,7 @@ class AppHelpersTests(unittest.TestCase):
 
 
 class StrapiClientTests(unittest.TestCase):
-    @patch.dict(os.environ, {"STRAPI_URL": "http://localhost:1337", "STRAPI_PRODUCTS_COLLECTION": "products"}, clear=False)
+    @patch.object(strapi_client, "_default_client", strapi_client.StrapiClient("http://localhost:1337"))
     @patch("strapi_client._fetch_json")
     def test_get_shop_products_includes_entries_without_external_id(self, mock_fetch_json):
         mock_fetch_json.return_value = {
@@ -55,6 +96,953 @@ class StrapiClientTests(unittest.TestCase):
         self.assertTrue(any(p.get("name") == "Keep Me" for p in products.values()))
         self.assertTrue(any(p.get("name") == "Skip Me" for p in products.values()))
 
+    def test_get_shop_products_against_fake_strapi(self):
+        for shape in ("v4", "v5"):
+            with FakeStrapi(products=150, galleries=5, shape=shape) as cms:
+                with patch.object(strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)):
+                    products = strapi_client.get_shop_products()
+                    gallery = strapi_client.get_gallery_images()
+            self.assertEqual(len(products), 150)
+            self.assertEqual(cms.requests["/api/products"], 2)
+            product = products["000001"]
+            self.assertTrue(product["image_path"].startswith(cms.url + "/uploads/"))
+            self.assertTrue(product["images"])
+            self.assertEqual(len(gallery), 5)
+
+    def test_client_remembers_resolved_collection_name(self):
+        with FakeStrapi(products=0, galleries=2) as cms:
+            client = strapi_client.StrapiClient(cms.url, collections={"galleries": "gallery", "homepages": "pages"})
+            for _ in range(3):
+                self.assertEqual(len(client.gallery_images()), 2)
+                self.assertIsNone(client.homepage())
+        # One 404 probe for the misspelled name; the missing homepage collection is probed once.
+        self.assertEqual(cms.requests["/api/gallery"], 1)
+        self.assertEqual(cms.requests["/api/galleries"], 3)
+        self.assertEqual(cms.requests["/api/pages"] + cms.requests["/api/page"], 2)
+
+    def test_compiled_normalizers_match_per_row_normalizers(self):
+        v5_row = {
+            "id": 7,
+            "documentId": "doc7",
+            "name": "Flat Polo",
+            "short_description": "Short",
+            "sizes": "S, M",
+            "images": [
+                {"color": "Navy", "image_alt": "Navy", "image": [{"url": "/uploads/navy.png"}]},
+                {"color": {"name": "Black"}, "image": {"url": "https://cdn.example.com/black.png"}},
+            ],
+            "image_path": {"url": "/uploads/cover.png"},
+        }
+        v4_row = {
+            "id": 8,
+            "attributes": {
+                "external_id": "000008",
+                "title": "Wrapped Tee",
+                "image": {"data": [{"id": 1, "attributes": {"url": "/uploads/a.png"}}]},
+                "color": [{"name": "White"}],
+            },
+        }
+        for row in (v5_row, v4_row):
+            compiled = strapi_client._compiled_for(
+                row, {}, strapi_client._compile_product_normalizer, "http://localhost:1337"
+            )
+            self.assertEqual(
+                compiled(row, "1-1"),
+                strapi_client._normalize_product(row, "1-1", "http://localhost:1337"),
+            )
+
+        gallery_row = {"id": 1, "attributes": {"color": "Navy", "order": "3", "image": {"data": {"attributes": {"url": "/uploads/g.png"}}}}}
+        compiled = strapi_client._compiled_for(
+            gallery_row, {}, strapi_client._compile_gallery_normalizer, "http://localhost:1337"
+        )
+        self.assertEqual(
+            compiled(gallery_row),
+            strapi_client._gallery_item_to_image(gallery_row, "http://localhost:1337"),
+        )
+
+
+class JsonCodecTests(unittest.TestCase):
+    def test_loads_accepts_bytes_and_raises_value_error(self):
+        self.assertEqual(json_codec.loads(b'{"data": [1, "\xc3\xa9"]}'), {"data": [1, "\u00e9"]})
+        with self.assertRaises(ValueError):
+            json_codec.loads(b"{not json")
+
+    def test_provider_response_round_trips(self):
+        payload = [{"name": "Polo", "price": "\u20b9499", "id": "000001"}]
+        with app.app.app_context():
+            response = app.app.json.response(payload)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(json.loads(response.get_data()), payload)
+
+
+class ServerTimingTests(unittest.TestCase):
+    def test_span_is_noop_outside_a_request(self):
+        self.assertIs(server_timing.span("cms"), server_timing.span("norm"))
+
+    def test_header_aggregates_spans_per_request(self):
+        from flask import Flask, render_template_string
+
+        demo = Flask(__name__)
+        server_timing.init_app(demo, enabled=True)
+
+        @demo.route("/")
+        def index():
+            with server_timing.span("cms"):
+                pass
+            with server_timing.span("cms"):
+                pass
+            return render_template_string("ok")
+
+        header = demo.test_client().get("/").headers["Server-Timing"]
+        self.assertIn('cms;dur=', header)
+        self.assertIn('desc="2 calls"', header)
+        self.assertIn("render;dur=", header)
+        self.assertIn("total;dur=", header)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_metrics_endpoint_merges_worker_snapshots(self):
+        from flask import Flask
+
+        with tempfile.TemporaryDirectory() as tmp, patch.object(metrics, "ENABLED", False):
+            demo = Flask(__name__)
+            metrics.init_app(demo, enabled=True, multiproc_dir=tmp)
+
+            @demo.route("/ping")
+            def ping():
+                metrics.observe_cms_call("http://cms/api/products?page=1", 0.02, 200, 512)
+                metrics.record_snapshot("products", 7)
+                return "pong"
+
+            client = demo.test_client()
+            client.get("/ping")
+            # A second live worker that served one /ping of its own.
+            other = {
+                "pid": os.getppid(),
+                "metrics": {
+                    "http_requests_total": [[["ping", "GET", "200"], 1.0]],
+                    "strapi_response_bytes_total": [[["products"], 100.0]],
+                    "catalog_items": [[["products"], 3.0]],
+                },
+            }
+            with open(os.path.join(tmp, "metrics-other.json"), "w", encoding="utf-8") as f:
+                json.dump(other, f)
+
+            response = client.get("/metrics")
+            body = response.get_data(as_text=True)
+            atexit.unregister(metrics.REGISTRY.flush)
+
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn('http_requests_total{endpoint="ping",method="GET",status="200"} 2', body)
+        self.assertIn('strapi_response_bytes_total{collection="products"} 612', body)
+        self.assertIn('strapi_requests_total{collection="products",outcome="200"}', body)
+        self.assertIn('catalog_items{collection="products"} 7', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="ping",method="GET",le="+Inf"}', body)
+        self.assertIn('catalog_snapshot_age_seconds{collection="products"}', body)
+
+
+class GalleryTests(unittest.TestCase):
+    def test_snapshot_order_is_stable_mixed_and_paginates_without_gaps(self):
+        items = [{"url": f"/uploads/{color}-{i}.png", "color": color} for color in ("Navy", "Red") for i in range(12)]
+        items.append(dict(items[0]))
+        snapshot = gallery.build_snapshot(items)
+        self.assertEqual(snapshot, gallery.build_snapshot(items) | {"built_at": snapshot["built_at"]})
+
+        pages = [gallery.page_of(snapshot["images"], page, 10)[0] for page in (1, 2, 3)]
+        urls = [image["url"] for page in pages for image in page]
+        self.assertEqual(sorted(urls), sorted({item["url"] for item in items}))
+        self.assertEqual(gallery.page_of(snapshot["images"], 1, 10)[1], 3)
+        self.assertEqual({image["color"] for image in pages[0]}, {"Navy", "Red"})
+
+    @patch("app.get_gallery_images")
+    def test_gallery_route_filters_by_color_from_the_index(self, mock_gallery):
+        mock_gallery.return_value = [
+            {"url": f"/uploads/{color}-{i}.png", "color": color} for color in ("Navy", "Red ") for i in range(3)
+        ]
+        app.gallery_cache.clear()
+        cache.get_cache().clear()
+        try:
+            html = app.app.test_client().get("/gallery?color=%20RED").get_data(as_text=True)
+        finally:
+            app.gallery_cache.clear()
+            cache.get_cache().clear()
+        self.assertIn("Navy (3)", html)
+        self.assertNotIn("/uploads/Navy-0.png", html)
+        self.assertEqual(html.count('src="/uploads/Red -'), 3)
+
+
+class PaginationApiTests(unittest.TestCase):
+    @patch("app.load_shop_products")
+    def test_shop_api_cursor_walks_filtered_catalog(self, mock_products):
+        mock_products.return_value = {
+            f"{i:06d}": {"name": f"Item {i}", "category": "Polo" if i % 2 else "Tee", "image_path": "/uploads/x.png"}
+            for i in range(30)
+        }
+        client = app.app.test_client()
+        seen, cursor = [], None
+        while True:
+            url = "/api/shop?category=polo" + (f"&cursor={cursor}" if cursor else "")
+            response = client.get(url)
+            self.assertIn("max-age", response.headers["Cache-Control"])
+            data = response.get_json()
+            seen.extend(item["id"] for item in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+
+        first = client.get("/api/shop?category=polo")
+        again = client.get("/api/shop?category=polo", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+    def test_testimonials_api_pages_match_html_page_size(self):
+        data = app.app.test_client().get("/api/testimonials?page=1").get_json()
+        self.assertLessEqual(len(data["items"]), app.REVIEWS_PER_PAGE)
+        self.assertEqual(data["next_cursor"], app.next_cursor(app.REVIEWS_PER_PAGE, data["total"]))
+
+
+class RelatedProductsTests(unittest.TestCase):
+    def test_neighbours_rank_shared_category_and_keywords_first(self):
+        products = {
+            "1": {"name": "Classic Polo", "category": "Polo", "keywords": ["cotton", "corporate"]},
+            "2": {"name": "Sport Polo", "category": "Polo", "keywords": ["cotton"]},
+            "3": {"name": "Classic Hoodie", "category": "Hoodie", "keywords": ["fleece"]},
+            "4": {"name": "Zip Hoodie", "category": "Hoodie", "keywords": ["fleece", "corporate"]},
+            "5": {"name": "Canvas Tote", "category": "Bags", "keywords": []},
+        }
+        index = related.build_index(products, k=2)
+        self.assertEqual(index["1"][0], "2")
+        self.assertEqual(index["3"], ["4", "1"])
+        self.assertEqual(index["5"], [])
+        products["6"] = dict(products["5"])
+        self.assertEqual(related.build_index(products, k=2)["5"], ["6"])
+
+    @unittest.skipIf(related.np is None, "numpy is not installed")
+    def test_numpy_and_python_scorers_agree(self):
+        import random
+
+        rng = random.Random(7)
+        words = ["polo", "hoodie", "cotton", "zip", "fleece", "sport", "classic", "tote", "cap", "denim"]
+        products = {
+            str(i): {"name": " ".join(rng.sample(words, 2)), "category": rng.choice(["Polo", "Hoodie", "Bags"]),
+                     "keywords": rng.sample(words, rng.randint(0, 3))}
+            for i in range(200)
+        }
+        _, vectors = related._vectors(products, lambda value: str(value or "").lower())
+        self.assertEqual(list(related._group_scores_numpy(vectors, 4, block_cells=1000)),
+                         list(related._group_scores_python(vectors, 4)))
+
+    def test_index_is_hashed_once_per_catalog_object(self):
+        products = {str(i): {"name": f"Polo {i}", "category": "Polo", "keywords": []} for i in range(5)}
+        with patch.object(related, "catalog_version", wraps=related.catalog_version) as version:
+            index = related.related_index(products, k=2)
+            for _ in range(3):
+                self.assertIs(related.related_index(products, k=2), index)
+            self.assertEqual(version.call_count, 1)
+            # An equal catalog fetched again is hashed once and keeps the index.
+            self.assertIs(related.related_index(json.loads(json.dumps(products)), k=2), index)
+            self.assertEqual(version.call_count, 2)
+
+
+class CmsJournalTests(unittest.TestCase):
+    def test_debug_endpoint_lists_redacted_calls_per_route(self):
+        with FakeStrapi(products=3, galleries=0) as cms, patch.dict(
+            os.environ, {"DEBUG_TOKEN": "dbg"}, clear=False
+        ), patch.object(strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)):
+            cache.get_cache().clear()
+            cms_journal.configure(0)  # start from an empty journal
+            cms_journal.configure(500)
+            with app.app.test_request_context("/shop"):
+                app.app.preprocess_request()
+                app.load_shop_products()
+                app.load_shop_products()  # cache hit: no outbound call
+                strapi_client._fetch_json(f"{cms.url}/api/products?access_token=abc", {}, 5)
+            client = app.app.test_client()
+            self.assertEqual(client.get("/debug/strapi-calls").status_code, 404)
+            report = client.get("/debug/strapi-calls", headers={"X-Debug-Token": "dbg"}).get_json()
+
+        latest, catalog_fetch, home_fetch = [entry for entry in report["recent"] if entry["route"] == "shop"][:3]
+        self.assertEqual(latest["url"], f"{cms.url}/api/products?access_token=***")
+        self.assertEqual(latest["status"], 200)
+        self.assertGreater(latest["bytes"], 0)
+        self.assertEqual(latest["cache"], "none")
+        self.assertEqual((catalog_fetch["collection"], catalog_fetch["cache"]), ("products", "miss"))
+        self.assertEqual((home_fetch["collection"], home_fetch["cache"]), ("homepages", "miss"))
+        self.assertEqual(report["by_collection"]["products"]["cache"], {"none": 1, "miss": 1})
+        # Homepage content (before_request), the product catalog and the direct fetch.
+        self.assertEqual(report["by_route"]["shop"]["max_calls_per_request"], 3)
+        self.assertEqual(report["by_collection"]["products"]["errors"], 0)
+
+    def test_product_detail_fetch_is_journaled(self):
+        with FakeStrapi(products=3, galleries=0) as cms, patch.object(
+            strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)
+        ):
+            cache.get_cache().clear()
+            cms_journal.configure(0)
+            cms_journal.configure(500)
+            client = app.app.test_client()
+            self.assertEqual(client.get("/product/000001").status_code, 200)
+            self.assertEqual(client.get("/product/000002").status_code, 200)  # catalog served from the cache
+
+        fetches = [entry for entry in cms_journal.recent() if entry["route"] == "shop_details"]
+        catalog = [entry for entry in fetches if entry["collection"] == "products"]
+        self.assertEqual(len(catalog), 1)
+        self.assertEqual(catalog[0]["url"].split("?")[0], f"{cms.url}/api/products")
+        self.assertEqual((catalog[0]["status"], catalog[0]["cache"]), (200, "miss"))
+        # Related products come from the catalog, not a second CMS query.
+        self.assertEqual(cms.requests["/api/products"], 1)
+
+
+class LoadTestTests(unittest.TestCase):
+    def test_env_overrides_apply_before_the_app_reads_its_config(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, "report.json")
+            cache_dir = os.path.join(tmp, "cache")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.loadtest", "--fake-cms", "--cms-products", "5",
+                 "--cms-galleries", "2", "--mix", "home=1,shop=1", "--requests", "4", "--duration", "0",
+                 "--concurrency", "1", "--env", "CACHE_BACKEND=filesystem", "--env", f"CACHE_DIR={cache_dir}",
+                 "--json", report_path],
+                cwd=root, check=True, capture_output=True, timeout=60,
+                env={**os.environ, "CACHE_BACKEND": "memory", "WARMUP_ENABLED": "0"},
+            )
+            with open(report_path, encoding="utf-8") as f:
+                report = json.load(f)
+            self.assertEqual(report["cache_backend"], "FileCache")
+            self.assertTrue(os.listdir(os.path.join(cache_dir, "entries")))
+
+    def test_env_file_takes_precedence_over_the_environment(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {"ABC_ENV_FILE_TEST": "process"}):
+            path = os.path.join(tmp, ".env")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('# comment\nABC_ENV_FILE_TEST="from file"\n')
+            app.load_env_file(path)
+            self.assertEqual(os.environ["ABC_ENV_FILE_TEST"], "from file")
+
+
+class ProfilingTests(unittest.TestCase):
+    def test_profiles_requested_and_slow_requests(self):
+        import time
+        from flask import Flask
+
+        with tempfile.TemporaryDirectory() as tmp:
+            demo = Flask(__name__)
+            profiling.init_app(demo, directory=tmp, secret="s3cret", slow_ms=30, interval_ms=1)
+
+            @demo.route("/fast")
+            def fast():
+                return "ok"
+
+            @demo.route("/slow")
+            def slow():
+                deadline = time.perf_counter() + 0.06
+                while time.perf_counter() < deadline:
+                    pass
+                return "ok"
+
+            client = demo.test_client()
+            self.assertEqual(client.get("/fast", headers={"X-Profile": "s3cret"}).data, b"ok")
+            client.get("/fast")
+            client.get("/slow")
+            names = sorted(os.listdir(tmp))
+
+        self.assertEqual(len(names), 2)
+        self.assertTrue(any(n.endswith(".prof") and "-fast-GET-" in n for n in names))
+        self.assertTrue(any(n.endswith(".collapsed") and "-slow-GET-" in n for n in names))
+
+
+class AssetCheckTests(unittest.TestCase):
+    def test_reports_missing_and_duplicate_media_and_reuses_etags(self):
+        with tempfile.TemporaryDirectory() as tmp, FakeStrapi(
+            products=4, galleries=3, missing_uploads={"/uploads/hero_1.png"}
+        ) as cms:
+            with patch.object(strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)):
+                refs = verify_images.collect_refs(*verify_images.load_sources())
+            refs["/static/nowhere/missing.png"] = {"test"}
+            cache = os.path.join(tmp, "cache.json")
+            first = verify_images.check_assets(refs, cms.url, max_bytes=50, cache_path=cache)
+            second = verify_images.check_assets(refs, cms.url, max_bytes=50, cache_path=cache)
+
+        remote = [ref for ref in refs if verify_images.resolve(ref, cms.url)[0] == "remote"]
+        self.assertEqual(first["missing"], ["/static/nowhere/missing.png", cms.url + "/uploads/hero_1.png"])
+        self.assertEqual(len(first["oversized"]), len(remote) - 1)
+        self.assertEqual(len(first["duplicates"]), 1)
+        self.assertEqual(first["remote_cached"], 0)
+        self.assertEqual(second["remote_cached"], len(remote) - 1)
+        self.assertEqual(second["missing"], first["missing"])
+
+
+class MediaUploaderTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.manifest = os.path.join(self.dir, "manifest.jsonl")
+        self.cms = FakeStrapi(products=0, galleries=0).start()
+        self.addCleanup(self.cms.stop)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def uploader(self, **kwargs):
+        options = {"manifest_path": self.manifest, "retries": 2, "backoff": 0, "progress_every": 0}
+        options.update(kwargs)
+        return strapi_uploader.MediaUploader(self.cms.url, "token", **options)
+
+    def test_retries_429_and_stops_on_other_client_errors(self):
+        self.cms.upload_statuses = [429]
+        uploader = self.uploader()
+        media, error = uploader.upload(self.write("a.png", b"first"))
+        self.assertIsNone(error)
+        self.assertEqual(media["caption"], "sha256:" + strapi_uploader.file_sha256(os.path.join(self.dir, "a.png")))
+        self.assertEqual((uploader.stats["retries"], self.cms.requests["POST /api/upload"]), (1, 2))
+
+        self.cms.upload_statuses = [400]
+        media, error = uploader.upload(self.write("b.png", b"second"))
+        self.assertIsNone(media)
+        self.assertIn("(400)", error)
+        self.assertEqual((uploader.stats["retries"], self.cms.requests["POST /api/upload"]), (1, 3))
+
+    def test_identical_content_is_sent_once_per_cms(self):
+        paths = [self.write("a.png", b"same"), self.write("copy.png", b"same"), self.write("b.png", b"other")]
+        results = self.uploader().upload_many(paths)
+        self.assertEqual(self.cms.requests["POST /api/upload"], 2)
+        ids = [media["id"] for media, _ in results.values()]
+        self.assertEqual(ids[0], ids[1])
+        self.assertNotEqual(ids[0], ids[2])
+        sent = self.cms.upload_bytes
+
+        # A second run, from the manifest or from the media library's hash captions, sends no bytes.
+        for manifest_path in (self.manifest, None):
+            uploader = self.uploader(manifest_path=manifest_path)
+            results = uploader.upload_many(paths)
+            self.assertEqual(self.cms.upload_bytes, sent)
+            self.assertEqual(uploader.stats["known"], 2)
+            self.assertTrue(all(error is None for _, error in results.values()))
+
+    def test_skips_interrupted_manifest_lines_and_forgets_deleted_media(self):
+        path = self.write("a.png", b"content")
+        self.uploader().upload(path)
+        with open(self.manifest, "a", encoding="utf-8") as f:
+            f.write('{"cms": "%s", "sha256": "abc' % self.cms.url)  # a run killed mid-write
+        uploader = self.uploader()
+        self.assertEqual(len(uploader._by_hash), 1)
+        uploader.upload(path)
+        self.assertEqual(self.cms.requests["POST /api/upload"], 1)
+
+        self.cms.media.clear()  # deleted in Strapi
+        uploader = self.uploader()
+        media, error = uploader.upload(path)
+        self.assertIsNone(error)
+        self.assertEqual((uploader.stats["uploaded"], self.cms.requests["POST /api/upload"]), (1, 2))
+
+
+class AbcMatcherTests(unittest.TestCase):
+    """The indexed matcher must pick what the linear scan it replaced picked, ties included."""
+
+    FOLDERS = [
+        "Premium Polo",       # ties with "Polo Premium Shirt" for products named "Premium Polo ..."
+        "Polo Premium Shirt",
+        "Cotton Tee",
+        "Tee Cotton",
+        "220 GSM",            # digit-only names: matched by GSM, and "gsm" is a token
+        "180",
+        "1800 Hoodie",        # "180" and "18" are both substrings of "1800"
+        "Oversized 240gsm",
+        "XL Cap",             # "xl" is too short to be a token
+        "Jacket",
+    ]
+    PRODUCTS = {
+        "001": {"name": "Premium Polo", "product_details": ["220 GSM cotton"]},
+        "002": {"name": "Premium Polo Shirt"},
+        "003": {"name": "Cotton Tee Round Neck"},
+        "004": {"name": "Classic Round Neck", "product_details": ["Fabric: 180 GSM"]},
+        "005": {"name": "Plain", "product_details": ["Made in India", "180GSM biowash"]},
+        "006": {"name": "Basic", "product_details": ["18 GSM"]},
+        "007": {"name": "Heavy", "product_details": ["240 GSM", "220 GSM"]},
+        "008": {"name": "XL", "product_details": ["no weight given"]},
+        "009": {"name": "Sweatshirt"},
+        "010": {"name": "Heavy Cotton Tee"},
+        "011": {"name": "Tee"},
+        "012": {"name": "Unbranded", "product_details": ["999 GSM"]},
+    }
+
+    @staticmethod
+    def linear_best_folder(folders, product):
+        """update_shop_json_from_abc.py before the indexes."""
+        name_tokens = abc_matcher.tokens(product.get("name", ""))
+        best, best_score = None, 0
+        for folder in folders:
+            score = len(name_tokens & abc_matcher.tokens(folder))
+            if score > best_score:
+                best, best_score = folder, score
+        if not best or best_score == 0:
+            gsm = ""
+            for detail in product.get("product_details", []):
+                m = abc_matcher.GSM_RE.search(detail)
+                if m:
+                    gsm = m.group(1)
+                    break
+            if gsm:
+                for folder in folders:
+                    if gsm in folder:
+                        best = folder
+                        break
+        return best
+
+    @staticmethod
+    def linear_assign(folders, products):
+        """rebuild_shop_from_abc.py before the indexes."""
+        assigned, used = {}, set()
+        for folder in folders:
+            candidates = sorted(
+                ((len(abc_matcher.tokens(folder) & abc_matcher.tokens(prod.get("name", ""))), pid)
+                 for pid, prod in products.items()),
+                reverse=True,
+            )
+            best = None
+            for score, pid in candidates:
+                if score <= 0:
+                    break
+                if pid not in used:
+                    best = pid
+                    break
+            if not best:
+                for pid, prod in products.items():
+                    if pid in used:
+                        continue
+                    for detail in prod.get("product_details", []):
+                        m = abc_matcher.GSM_RE.search(detail)
+                        if m and m.group(1) in folder:
+                            best = pid
+                            break
+                    if best:
+                        break
+            if best:
+                used.add(best)
+            assigned[folder] = best
+        return assigned
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for folder in self.FOLDERS:
+            os.makedirs(os.path.join(tmp.name, folder, "Black"))
+        self.folders = abc_matcher.FolderScanner(tmp.name, cache_path=os.path.join(tmp.name, "scan.json")).folders()
+        self.assertEqual(sorted(self.folders), sorted(self.FOLDERS))
+
+    def test_best_folder_matches_linear_scan(self):
+        matcher = abc_matcher.FolderMatcher(self.folders)
+        for pid, product in self.PRODUCTS.items():
+            with self.subTest(pid):
+                self.assertEqual(matcher.best(product), self.linear_best_folder(self.folders, product))
+        # Ties go to the folder listed first, whichever that is on this filesystem.
+        first = min("Premium Polo", "Polo Premium Shirt", key=self.folders.index)
+        self.assertEqual(matcher.best({"name": "Premium Polo"}), first)
+
+    def test_assignment_matches_linear_scan(self):
+        for folders in (self.folders, self.FOLDERS, self.FOLDERS[::-1]):
+            with self.subTest(first=folders[0]):
+                assigned = abc_matcher.assign_products(folders, self.PRODUCTS)
+                self.assertEqual(assigned, self.linear_assign(folders, self.PRODUCTS))
+                picked = [pid for pid in assigned.values() if pid]
+                self.assertEqual(len(picked), len(set(picked)))
+
+        assigned = abc_matcher.assign_products(self.FOLDERS, self.PRODUCTS)
+        # Equal scores go to the higher product id; a used product falls through to the next.
+        self.assertEqual((assigned["Premium Polo"], assigned["Polo Premium Shirt"]), ("002", "001"))
+        # Digit-only folders: first unused product, in catalog order, whose GSM is in the name.
+        self.assertEqual((assigned["180"], assigned["1800 Hoodie"]), ("004", "005"))
+        self.assertEqual((assigned["XL Cap"], assigned["Jacket"]), (None, None))
+
+
+class ImageOptimizerTests(unittest.TestCase):
+    @unittest.skipIf(image_optimizer.Image is None, "Pillow is not installed")
+    def test_output_is_smaller_and_drops_exif_and_icc(self):
+        from PIL import Image, ImageCms
+
+        icc = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        exif = Image.Exif()
+        exif[0x010E] = "studio shot"  # ImageDescription
+        with tempfile.TemporaryDirectory() as tmp:
+            sources = []
+            for name, fmt in (("tee.jpg", "JPEG"), ("polo.png", "PNG")):
+                path = os.path.join(tmp, name)
+                Image.radial_gradient("L").resize((800, 600)).convert("RGB").save(
+                    path, fmt, icc_profile=icc, exif=exif.tobytes()
+                )
+                with Image.open(path) as image:
+                    self.assertTrue(image.info.get("icc_profile") and image.info.get("exif"))
+                sources.append(path)
+
+            for webp in (False, True):
+                optimizer = image_optimizer.ImageOptimizer(
+                    max_edge=200, webp=webp, workers=1, cache_dir=os.path.join(tmp, f"cache-{webp}")
+                )
+                prepared = optimizer.optimize_many(sources)
+                for source in sources:
+                    with self.subTest(source=os.path.basename(source), webp=webp):
+                        output = str(prepared[Path(source)])
+                        self.assertNotEqual(output, source)
+                        self.assertLess(os.path.getsize(output), os.path.getsize(source))
+                        with Image.open(output) as image:
+                            self.assertFalse(image.info.get("icc_profile"))
+                            self.assertFalse(image.info.get("exif"))
+                            self.assertEqual(dict(image.getexif()), {})
+
+
+class SyncPlanTests(unittest.TestCase):
+    def test_plan_classifies_products_against_remote_and_state(self):
+        product = {"name": "Polo", "price": "10", "desc": "Cotton polo"}
+        digest = sync_shop_to_strapi.payload_hash("p1", product, "text")
+        synced = {"hash": digest, "updatedAt": "t1", "key": "doc1"}
+        remote = {"key": "doc1", "updatedAt": "t1"}
+        cases = [
+            # (name, remote row, state entry, product sent, force, expected action)
+            ("new product", None, None, product, False, "create"),
+            ("in CMS but no sync state", remote, None, product, False, "update"),
+            ("same hash and CMS timestamp", remote, synced, product, False, "unchanged"),
+            ("changed in shop.json", remote, synced, {**product, "price": "12"}, False, "update"),
+            ("edited in the CMS since the sync", {**remote, "updatedAt": "t2"}, synced, product, False, "update"),
+            ("--force", remote, synced, product, True, "update"),
+            ("deleted in the CMS since the sync", None, synced, product, False, "deleted_upstream"),
+            ("deleted in the CMS, --force", None, synced, product, True, "deleted_upstream"),
+        ]
+        for name, row, known, sent, force, expected in cases:
+            with self.subTest(name):
+                plan = sync_shop_to_strapi.plan_sync(
+                    {"p1": sent}, {"p1": row} if row else {}, {"p1": known} if known else {}, "text", force=force
+                )
+                action, key, plan_digest = plan["p1"]
+                self.assertEqual(action, expected)
+                self.assertEqual(key, row and row["key"])
+                self.assertEqual(plan_digest, sync_shop_to_strapi.payload_hash("p1", sent, "text"))
+
+        # Products removed from shop.json are never planned, even when the CMS and the state still have them.
+        self.assertEqual(sync_shop_to_strapi.plan_sync({}, {"p1": remote}, {"p1": synced}, "text"), {})
+        # The hash covers the description mode, so switching it updates everything.
+        plan = sync_shop_to_strapi.plan_sync({"p1": product}, {"p1": remote}, {"p1": synced}, "blocks")
+        self.assertEqual(plan["p1"][0], "update")
+
+    def test_description_mode_is_detected_or_must_be_set(self):
+        def session(status, rows=()):
+            response = Mock(status_code=status, text="error")
+            response.json.return_value = {"data": list(rows)}
+            return Mock(request=Mock(return_value=response))
+
+        detect = sync_shop_to_strapi.detect_description_mode
+        with patch.dict(os.environ, {"STRAPI_DESCRIPTION_MODE": ""}):
+            self.assertEqual(detect(session(200, [{"description": "Soft cotton"}]), "http://cms", "products"), "text")
+            self.assertEqual(detect(session(200, [{"description": [{"type": "paragraph"}]}]), "http://cms", "products"), "blocks")
+            for name, probe in (("probe fails", session(403)), ("no description yet", session(200))):
+                with self.subTest(name), self.assertRaisesRegex(SystemExit, "STRAPI_DESCRIPTION_MODE"):
+                    detect(probe, "http://cms", "products")
+        with patch.dict(os.environ, {"STRAPI_DESCRIPTION_MODE": "blocks"}):
+            self.assertEqual(detect(session(403), "http://cms", "products"), "blocks")
+
+
+class WarmupTests(unittest.TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        app.gallery_cache.clear()
+        self.addCleanup(app.gallery_cache.clear)
+        self.addCleanup(cache.get_cache().clear)
+
+    def test_ready_only_after_warmup_populates_caches(self):
+        with FakeStrapi(products=3, galleries=4) as cms, patch.object(
+            strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)
+        ):
+            client = app.app.test_client()
+            self.assertEqual(client.get("/healthz/live").status_code, 200)
+
+            warmup.run(app.app, app.WARMUP_STEPS, budget_seconds=5)
+            response = client.get("/healthz/ready")
+
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertGreaterEqual(report["steps"]["templates"]["count"], len(os.listdir(app.app.template_folder)) - 1)
+        self.assertTrue(all(report["steps"][name]["ok"] for name in ("homepage", "catalog", "gallery")))
+        self.assertFalse(report["timed_out"])
+        # The probe reads what warm-up loaded instead of fetching again.
+        self.assertEqual(
+            (cms.requests["/api/homepages"], cms.requests["/api/products"], cms.requests["/api/galleries"]), (1, 1, 1)
+        )
+
+    def test_ready_probe_loads_cms_data_without_warmup(self):
+        with FakeStrapi(products=3, galleries=4) as cms, patch.object(
+            strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)
+        ), patch.dict(warmup._state, enabled=False):
+            client = app.app.test_client()
+            first = client.get("/healthz/ready").status_code
+            second = client.get("/healthz/ready").status_code
+            self.assertTrue(app.gallery_cache.populated)
+
+        self.assertEqual((first, second), (200, 200))
+        self.assertEqual(
+            (cms.requests["/api/homepages"], cms.requests["/api/products"], cms.requests["/api/galleries"]), (1, 1, 1)
+        )
+
+    def test_failed_fetches_fail_warmup_and_readiness(self):
+        with FakeStrapi(products=3, galleries=4, error_rate=1.0) as cms, patch.object(
+            strapi_client, "_default_client", strapi_client.StrapiClient(cms.url)
+        ):
+            warmup.run(app.app, app.WARMUP_STEPS, budget_seconds=5)
+            response = app.app.test_client().get("/healthz/ready")
+            # The homepage view still renders from the built-in defaults.
+            self.assertEqual(app.load_home_content(), app.default_home_content())
+
+        self.assertEqual(response.status_code, 503)
+        steps = response.get_json()["steps"]
+        self.assertEqual([steps[name]["ok"] for name in ("homepage", "catalog", "gallery")], [False, False, False])
+
+
+class SnapshotStoreTests(unittest.TestCase):
+    def test_one_fetch_per_host_and_readers_pick_up_new_versions(self):
+        calls = []
+
+        def fetch_catalog():
+            calls.append("catalog")
+            return {"p1": {"name": f"Polo v{len(calls)}"}}
+
+        fetchers = {"catalog": fetch_catalog, "homepage": lambda: None}
+        with tempfile.TemporaryDirectory() as tmp:
+            first = snapshots.SnapshotStore(tmp, refresh_seconds=60, check_seconds=0, fetchers=fetchers)
+            second = snapshots.SnapshotStore(tmp, refresh_seconds=60, check_seconds=0, fetchers=fetchers)
+            first.load()
+            second.load()  # fresh file on disk: no second fetch
+            self.assertEqual(calls, ["catalog"])
+            self.assertEqual(second.get("catalog")["p1"]["name"], "Polo v1")
+
+            first.refresh()
+            self.assertEqual(second.get("catalog")["p1"]["name"], "Polo v2")
+            self.assertIsNone(second.get("homepage"))
+
+    def test_mapped_catalog_matches_in_memory_listing_and_search(self):
+        products = {
+            "p1": {"name": "Polo Shirt", "category": "Men", "Sizes": ["M", "L"], "documentId": "doc-1"},
+            "p2": {"name": "Hoodie", "category": "Women", "Sizes": ["S"], "keywords": ["fleece"]},
+            "p3": {"name": "Kids Polo", "category": "Kids", "Sizes": ["S"], "extended_sizes": ["M"]},
+        }
+        options = {"search_text": app.product_search_text, "indexes": app.catalog_indexes}
+        fetchers = {"catalog": lambda: products}
+        client = app.app.test_client()
+        with tempfile.TemporaryDirectory() as tmp:
+            store = snapshots.SnapshotStore(tmp, check_seconds=0, fetchers=fetchers, catalog_options=options)
+            store.refresh()
+            catalog = store.get("catalog")
+            self.assertIsInstance(catalog, mapped_catalog.MappedCatalog)
+            self.assertEqual(dict(catalog), products)
+            self.assertEqual([catalog.key(i) for i in catalog.search("POLO")], ["p1", "p3"])
+
+            for url in ("/api/shop?size=M", "/api/shop?category=men", "/search/api?q=fleece", "/product/doc-1"):
+                with patch.object(app, "load_shop_products", lambda: products):
+                    expected = client.get(url).data
+                with patch.object(app, "load_shop_products", lambda: catalog):
+                    self.assertEqual(client.get(url).data, expected, url)
+
+            products["p4"] = {"name": "Cap"}
+            store.refresh()
+            self.assertIsNot(store.get("catalog"), catalog)
+            self.assertIn("p4", store.get("catalog"))
+            self.assertEqual(catalog["p1"]["name"], "Polo Shirt")  # old mapping stays readable
+
+    def test_mapped_catalog_keys_and_indexes_are_read_in_place(self):
+        products = {key: {"name": key} for key in ("b", "a", "é", "10", "2")}
+        indexes = {"postings": {"size": {"M": [4, 0], "S": []}}, "related": {"a": ["b"]}, "options": ["x"]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.bin")
+            mapped_catalog.write(path, products, 1, indexes=lambda _: indexes)
+            with patch.object(json_codec, "loads", side_effect=AssertionError("decoded on open")):
+                catalog = mapped_catalog.MappedCatalog(path)
+                self.assertEqual(list(catalog), list(products))
+                self.assertIn("é", catalog)
+                self.assertNotIn("c", catalog)
+                self.assertEqual(list(catalog.indexes["postings"]["size"]["M"]), [4, 0])
+            self.assertEqual({key: catalog[key] for key in products}, products)
+            self.assertEqual(catalog.indexes["postings"]["size"]["S"], [])
+            self.assertEqual(catalog.indexes["related"].get("a"), ["b"])
+            self.assertIsNone(catalog.indexes["related"].get("b"))
+            self.assertEqual(catalog.indexes["options"], ["x"])
+            with self.assertRaises(KeyError):
+                catalog["c"]
+
+
+try:
+    import fakeredis
+except ImportError:  # optional; the Redis backend test runs only where it is installed
+    fakeredis = None
+
+
+class CacheTests(unittest.TestCase):
+    def check_backend(self, store, peer):
+        """``peer`` is a second handle on the same storage (another process, for shared backends)."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        self.assertEqual(store.get_or_compute("cms:home", compute, ttl=60, tags=("cms",)), {"n": 1})
+        self.assertEqual(peer.get_or_compute("cms:home", compute, ttl=60, tags=("cms",)), {"n": 1})
+        peer.invalidate_tag("cms")
+        self.assertIsNone(store.get("cms:home"))
+        self.assertEqual(store.get_or_compute("cms:home", compute, ttl=60, tags=("cms",)), {"n": 2})
+        store.delete("cms:home")
+        self.assertIsNone(peer.get("cms:home"))
+        store.get_or_compute("cms:none", lambda: None)
+        self.assertIs(store.get("cms:none", cache.MISSING), cache.MISSING)
+
+    def check_memo(self, store, peer):
+        """Shared backends: a warm process decodes nothing until another one writes the entry."""
+        store.set("cms:catalog", {"n": 1}, ttl=60)
+        with patch.object(cache.pickle, "loads", side_effect=AssertionError("decoded a warm entry")):
+            first = store.get("cms:catalog")
+            self.assertEqual(first, {"n": 1})
+            self.assertIs(store.get("cms:catalog"), first)
+        self.assertEqual(peer.get("cms:catalog"), {"n": 1})  # decoded once, then memoized
+        peer.set("cms:catalog", {"n": 2}, ttl=60)
+        self.assertEqual(store.get("cms:catalog"), {"n": 2})
+        peer.delete("cms:catalog")
+        self.assertIsNone(store.get("cms:catalog"))
+
+    def test_memory_lru_ttl_tags_and_single_flight(self):
+        store = cache.MemoryCache(max_bytes=1000)
+        self.check_backend(store, store)
+
+        store.set("a", "x" * 400)
+        store.set("b", "y" * 400)
+        store.get("a")
+        store.set("c", "z" * 400)  # over budget: evicts "b", the least recently used
+        self.assertEqual(sorted(store._entries), ["a", "c"])
+        self.assertLessEqual(store.bytes, 1000)
+        store.set("d", "w", ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(store.get("d"))
+
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        threads = [threading.Thread(target=store.get_or_compute, args=("slow", slow)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_memory_reports_values_larger_than_the_cache(self):
+        store = cache.MemoryCache(max_bytes=1000)
+        catalog = {f"p{i}": {"name": "Polo Shirt"} for i in range(100)}
+        with patch.object(metrics, "ENABLED", True), self.assertLogs("cache", "WARNING") as logs:
+            before = metrics.CACHE_OVERSIZE.samples.get(("memory",), 0)
+            store.set("cms:catalog", catalog, ttl=60)
+            store.set("cms:catalog", catalog, ttl=60)
+            after = metrics.CACHE_OVERSIZE.samples.get(("memory",), 0)
+        self.assertIsNone(store.get("cms:catalog"))
+        self.assertEqual(after - before, 2)
+        self.assertEqual(len(logs.output), 1)  # warned once per key, counted every time
+        self.assertIn("cms:catalog", logs.output[0])
+
+    def test_filesystem_backend_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.check_backend(cache.FileCache(tmp), cache.FileCache(tmp))
+            self.check_memo(cache.FileCache(tmp), cache.FileCache(tmp))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_backend(self):
+        server = fakeredis.FakeServer()
+        self.check_backend(
+            cache.RedisCache(client=fakeredis.FakeRedis(server=server)),
+            cache.RedisCache(client=fakeredis.FakeRedis(server=server)),
+        )
+        self.check_memo(
+            cache.RedisCache(client=fakeredis.FakeRedis(server=server)),
+            cache.RedisCache(client=fakeredis.FakeRedis(server=server)),
+        )
+        # A forked worker gets fresh connections and its own lock token.
+        store = cache.RedisCache(client=fakeredis.FakeRedis(server=server))
+        token = store._token
+        store.after_fork()
+        self.assertNotEqual(store._token, token)
+        self.assertEqual(store.get_or_compute("cms:fork", lambda: "ok", ttl=60), "ok")
+
+
+class AssetBuildTests(unittest.TestCase):
+    def test_minifies_rebases_urls_and_extracts_critical_css(self):
+        css = """
+        /* layout */
+        .hero  >  .title , .footer a:hover { color : red ; background: url('../img/a.png?v=1') }
+        .card :first-child { margin: 0 }
+        @media (min-width: 576px) { .hero { padding: 1rem } .footer { padding: 0 } }
+        @font-face { font-family: "Brand"; src: url(../fonts/brand.woff2) }
+        @font-face { font-family: "Unused"; src: url(../fonts/unused.woff2) }
+        @keyframes fade { from { opacity: 0 } to { opacity: 1 } }
+        .hero .title { font-family: Brand; animation: fade 1s; content: "a  b" }
+        """
+        css = build_assets.rebase_urls(css, "css", lambda path: build_assets.posixpath.relpath(path, "dist"))
+        minified = build_assets.serialize(build_assets.parse_css(build_assets.strip_comments(css)))
+        self.assertTrue(minified.startswith(
+            '.hero>.title,.footer a:hover{color:red;background:url("../img/a.png?v=1")}.card :first-child{margin:0}'
+            "@media (min-width:576px){.hero{padding:1rem}.footer{padding:0}}"
+        ))
+        self.assertIn('content:"a  b"', minified)
+
+        html = """<html><body><header class="hero"><h1 class="title">Hi</h1></header>
+        <main><section class="hero"></section><section class="card"></section>
+        <footer class="footer"><a href="#">x</a></footer></main></body></html>"""
+        critical = build_assets.extract_critical(minified, html, 1)
+        self.assertIn('.hero>.title{color:red;background:url("/static/img/a.png?v=1")}', critical)
+        self.assertIn("@media (min-width:576px){.hero{padding:1rem}}", critical)
+        self.assertIn('@font-face{font-family:"Brand";src:url("/static/fonts/brand.woff2")}', critical)
+        self.assertIn("@keyframes fade{", critical)
+        for unused in (".footer", ".card", "Unused"):
+            self.assertNotIn(unused, critical)
+
+    def test_templates_use_sources_until_a_manifest_is_built(self):
+        self.addCleanup(assets.load_manifest)
+        with tempfile.TemporaryDirectory() as tmp:
+            assets.load_manifest(os.path.join(tmp, "missing.json"))
+            with app.app.test_request_context("/"):
+                styles = assets.asset_styles("index")
+                self.assertEqual(styles.count('rel="stylesheet"'), len(assets.BUNDLES["site.css"]))
+                self.assertIn("/static/css/style.css?v=", styles)
+
+            os.makedirs(os.path.join(tmp, "dist"))
+            with open(os.path.join(tmp, "dist", "critical-index.abc.css"), "w") as f:
+                f.write(".hero{color:red}")
+            with open(os.path.join(tmp, "dist", "manifest.json"), "w") as f:
+                json.dump({"version": "v1", "bundles": {"site.css": "dist/site.abc.css", "vendor.js": "dist/vendor.abc.js",
+                                                         "main.js": "dist/main.abc.js", "index.js": "dist/index.abc.js"},
+                           "critical": {"index": "dist/critical-index.abc.css"}}, f)
+            assets.load_manifest(os.path.join(tmp, "dist", "manifest.json"))
+            with app.app.test_request_context("/"):
+                styles = assets.asset_styles("index")
+                scripts = assets.asset_scripts("index")
+            self.assertTrue(styles.startswith("<style>.hero{color:red}</style>"))
+            self.assertIn('<link rel="preload" href="/static/dist/site.abc.css" as="style"', styles)
+            self.assertEqual(scripts.count("<script"), 3)
+            self.assertEqual(assets.version(), "v1")
+
+            # A critical file missing from the deploy falls back to a blocking stylesheet link.
+            os.remove(os.path.join(tmp, "dist", "critical-index.abc.css"))
+            with self.assertLogs("assets", "WARNING"):
+                assets.load_manifest(os.path.join(tmp, "dist", "manifest.json"))
+            with app.app.test_request_context("/"):
+                styles = assets.asset_styles("index")
+            self.assertEqual(styles, '<link rel="stylesheet" href="/static/dist/site.abc.css">')
+
+        response = app.app.test_client().get("/static/css/style.css")
+        self.assertNotIn("immutable", response.headers.get("Cache-Control", ""))
+        response.close()
+
 
 if __name__ == "__main__":
     unittest.main()
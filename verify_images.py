@@ -1,31 +1,224 @@
-import os
+"""Check every image the site references: catalog, gallery and homepage media.
+
+    python verify_images.py [--max-kb 800] [--workers 16] [--no-cache]
+
+Sources are the normalized Strapi catalog, gallery and homepage when
+``STRAPI_URL`` is set, else ``content/shop.json``. Local paths are checked with
+``os.stat``; remote URLs with pooled concurrent ``HEAD`` requests. Remote
+results are cached by URL and ``ETag`` in ``.asset_check_cache.json``
+(``ASSET_CHECK_CACHE``), so unchanged media on a re-run costs a 304.
+
+Reports missing, oversized (``--max-kb``) and duplicate assets (identical local
+content, or remote media sharing a strong ETag and size). Exits 1 when anything
+is missing.
+"""
+
+import argparse
+import hashlib
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import strapi_client
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_ROOT = os.path.join(ROOT, "static")
+SHOP_JSON = os.path.join(ROOT, "content", "shop.json")
+DEFAULT_CACHE = os.path.join(ROOT, ".asset_check_cache.json")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".svg", ".avif")
+
+
+def media_refs(value, source, refs=None):
+    """Collect ``{reference: {sources}}`` for every image-looking string inside ``value``."""
+    refs = {} if refs is None else refs
+    if isinstance(value, dict):
+        for key, item in value.items():
+            media_refs(item, f"{source}.{key}", refs)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            media_refs(item, f"{source}[{index}]", refs)
+    elif isinstance(value, str):
+        cleaned = value.strip()
+        if cleaned.split("?", 1)[0].lower().endswith(IMAGE_EXTENSIONS):
+            refs.setdefault(cleaned, set()).add(source)
+    return refs
+
+
+def load_sources():
+    """``(products, gallery_images, homepage)`` as the site sees them."""
+    products = strapi_client.get_shop_products()
+    if products is None:
+        with open(SHOP_JSON, "r", encoding="utf-8") as f:
+            products = json.load(f)
+    return products, strapi_client.get_gallery_images() or [], strapi_client.get_homepage_content() or {}
+
+
+def collect_refs(products, gallery_images, homepage):
+    refs = {}
+    for product_id, product in products.items():
+        media_refs({"image_path": product.get("image_path"), "images": product.get("images", [])},
+                   f"product:{product_id}", refs)
+    for index, image in enumerate(gallery_images):
+        media_refs(image.get("url"), f"gallery[{index}]", refs)
+    media_refs(homepage, "homepage", refs)
+    return refs
+
+
+def resolve(ref, strapi_url, static_root=STATIC_ROOT):
+    """``("remote", url)`` or ``("local", path)``, mirroring ``app.resolve_media_url``."""
+    if ref.startswith(("http://", "https://")):
+        return "remote", ref
+    if ref.startswith("/uploads/"):
+        return "remote", f"{strapi_url}{ref}"
+    if ref.startswith("/static/"):
+        return "local", os.path.join(static_root, ref[len("/static/"):])
+    return "local", os.path.join(static_root, ref.lstrip("/"))
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_local(path):
+    try:
+        return {"status": "ok", "size": os.stat(path).st_size}
+    except FileNotFoundError:
+        return {"status": "missing", "size": None}
+    except OSError as exc:
+        return {"status": f"error: {exc}", "size": None}
+
+
+def check_remote(session, url, cached=None, timeout=10):
+    """HEAD ``url`` (conditional on a cached ETag); returns ``{status, size, etag}``."""
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    try:
+        response = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if response.status_code == 405:
+            response = session.get(url, headers=headers, timeout=timeout, stream=True)
+            response.close()
+    except requests.RequestException as exc:
+        return {"status": f"error: {exc.__class__.__name__}", "size": None, "etag": None}
+
+    if response.status_code == 304 and cached:
+        return dict(cached, cached=True)
+    if response.status_code in (404, 410):
+        return {"status": "missing", "size": None, "etag": None}
+    if response.status_code >= 400:
+        return {"status": f"error: HTTP {response.status_code}", "size": None, "etag": None}
+    length = response.headers.get("Content-Length")
+    return {
+        "status": "ok",
+        "size": int(length) if length and length.isdigit() else None,
+        "etag": response.headers.get("ETag"),
+    }
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, results):
+    entries = {
+        url: {"status": r["status"], "size": r["size"], "etag": r["etag"]}
+        for url, r in results.items()
+        if r["status"] == "ok" and r.get("etag")
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def check_assets(refs, strapi_url, max_bytes, workers=16, cache_path=DEFAULT_CACHE, static_root=STATIC_ROOT):
+    """Check ``refs`` and return ``{"results", "missing", "oversized", "duplicates"}``.
+
+    ``results`` maps each reference to ``{status, size, target}``; the lists hold
+    references, and ``duplicates`` holds groups of references with the same content.
+    """
+    targets = {ref: resolve(ref, strapi_url, static_root) for ref in refs}
+    local_paths = sorted({path for kind, path in targets.values() if kind == "local"})
+    remote_urls = sorted({url for kind, url in targets.values() if kind == "remote"})
+    cache = load_cache(cache_path) if cache_path else {}
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    with session, ThreadPoolExecutor(max_workers=workers) as pool:
+        remote = dict(zip(remote_urls, pool.map(lambda url: check_remote(session, url, cache.get(url)), remote_urls)))
+        local = dict(zip(local_paths, pool.map(check_local, local_paths)))
+        # Only files whose size collides with another can be duplicates, so only those are hashed.
+        by_size = {}
+        for path, result in local.items():
+            if result["status"] == "ok":
+                by_size.setdefault(result["size"], []).append(path)
+        to_hash = [path for paths in by_size.values() if len(paths) > 1 for path in paths]
+        digests = dict(zip(to_hash, pool.map(_sha256, to_hash)))
+    if cache_path:
+        save_cache(cache_path, remote)
+
+    results = {}
+    groups = {}
+    for ref, (kind, target) in targets.items():
+        result = remote[target] if kind == "remote" else local[target]
+        results[ref] = {"status": result["status"], "size": result["size"], "target": target}
+        if kind == "local" and target in digests:
+            groups.setdefault(("sha256", digests[target]), set()).add(target)
+        elif kind == "remote" and result.get("etag") and not result["etag"].startswith("W/"):
+            groups.setdefault(("etag", result["etag"], result["size"]), set()).add(target)
+
+    return {
+        "results": results,
+        "missing": sorted(ref for ref, r in results.items() if r["status"] != "ok"),
+        "oversized": sorted(ref for ref, r in results.items() if r["size"] is not None and r["size"] > max_bytes),
+        "duplicates": sorted(sorted(targets) for targets in groups.values() if len(targets) > 1),
+        "remote_cached": sum(1 for r in remote.values() if r.get("cached")),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check catalog, gallery and homepage images.")
+    parser.add_argument("--max-kb", type=int, default=int(os.getenv("ASSET_MAX_KB", "800")),
+                        help="report assets larger than this many KiB")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent checks")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not write the ETag cache")
+    args = parser.parse_args(argv)
+
+    strapi_url = os.getenv("STRAPI_URL", "").strip().rstrip("/") or "https://cms.apparelbrandingcompany.in"
+    cache_path = None if args.no_cache else (os.getenv("ASSET_CHECK_CACHE", "").strip() or DEFAULT_CACHE)
+    refs = collect_refs(*load_sources())
+    report = check_assets(refs, strapi_url, args.max_kb * 1024, workers=max(1, args.workers), cache_path=cache_path)
+
+    results = report["results"]
+    print(f"Checked {len(results)} assets ({report['remote_cached']} remote unchanged since last run)")
+    for title, key in (("Missing", "missing"), ("Oversized", "oversized")):
+        if report[key]:
+            print(f"{title} {len(report[key])}:")
+            for ref in report[key]:
+                r = results[ref]
+                detail = r["status"] if key == "missing" else f"{r['size'] / 1024:.0f} KiB"
+                print(f"  {ref} ({detail}) <- {', '.join(sorted(refs[ref])[:3])}")
+    if report["duplicates"]:
+        print(f"Duplicate content in {len(report['duplicates'])} groups:")
+        for group in report["duplicates"]:
+            print("  " + " = ".join(group))
+    if not report["missing"] and not report["oversized"] and not report["duplicates"]:
+        print("All images exist!")
+    return 1 if report["missing"] else 0
+
 
-with open('content/shop.json', 'r', encoding='utf-8') as f:
-    shop = json.load(f)
-
-missing = []
-found = 0
-
-for pid, prod in shop.items():
-    img_path = prod.get('image_path', '')
-    full_path = os.path.join('static', img_path)
-    if not os.path.exists(full_path):
-        missing.append(f"{pid}: {full_path}")
-    else:
-        found += 1
-    
-    # Check images array
-    for img in prod.get('images', []):
-        img_path = img.get('image_path', '')
-        full_path = os.path.join('static', img_path)
-        if not os.path.exists(full_path):
-            missing.append(f"{pid} color: {full_path}")
-
-print(f"Found {found} main images")
-if missing:
-    print(f"Missing {len(missing)} images:")
-    for m in missing[:10]:
-        print(f"  {m}")
-else:
-    print("All images exist!")
+if __name__ == "__main__":
+    raise SystemExit(main())
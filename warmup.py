@@ -0,0 +1,115 @@
+"""Start-up warm-up and health endpoints.
+
+``init_app`` registers ``/healthz/live`` (the process answers) and
+``/healthz/ready``. With ``enabled``, it also starts a warm-up that compiles
+every template and runs the named steps (homepage, catalog and gallery
+prefetches) in a background thread, within a bounded total time. A step still
+running when the budget ends keeps going; the phase is marked finished so
+readiness depends on ``ready_check`` alone.
+
+A step fails when it raises or returns a falsy value (nothing fetched, or a
+fallback in place of CMS data). Readiness is 200 once warm-up has finished and
+``ready_check()`` (CMS data loaded) passes, else 503 with the per-step report.
+With warm-up disabled, readiness is only ``ready_check()``.
+"""
+
+import logging
+import threading
+import time
+
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {"enabled": False, "started_at": None, "finished_at": None, "timed_out": False, "steps": {}}
+_ready_check = None
+
+
+def compile_templates(app):
+    """Load every template once so the first visitor does not pay for Jinja compilation."""
+    env = app.jinja_env
+    count = 0
+    for name in env.list_templates(filter_func=lambda n: n.endswith(".html")):
+        try:
+            env.get_template(name)
+            count += 1
+        except Exception as exc:  # a broken template must not keep the worker out of rotation
+            logger.warning("Template %s failed to compile during warm-up: %s", name, exc)
+    return count
+
+
+def _record(name, **fields):
+    with _lock:
+        _state["steps"][name] = fields
+
+
+def _run_steps(steps):
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception as exc:
+            logger.warning("Warm-up step %s failed: %s", name, exc)
+            _record(name, ok=False, seconds=round(time.perf_counter() - started, 3), error=str(exc))
+            continue
+        _record(name, ok=bool(result), seconds=round(time.perf_counter() - started, 3))
+
+
+def run(app, steps, budget_seconds=10.0):
+    """Warm up synchronously, giving up waiting after ``budget_seconds``."""
+    with _lock:
+        _state.update(enabled=True, started_at=time.time(), finished_at=None, timed_out=False, steps={})
+
+    started = time.perf_counter()
+    _record("templates", ok=True, count=compile_templates(app), seconds=round(time.perf_counter() - started, 3))
+
+    worker = threading.Thread(target=_run_steps, args=(list(steps),), name="warmup", daemon=True)
+    worker.start()
+    worker.join(max(budget_seconds - (time.perf_counter() - started), 0))
+    with _lock:
+        _state["timed_out"] = worker.is_alive()
+        _state["finished_at"] = time.time()
+    if worker.is_alive():
+        logger.warning("Warm-up budget of %.1fs exhausted; remaining steps continue in the background", budget_seconds)
+
+
+def is_ready():
+    with _lock:
+        if _state["enabled"] and _state["finished_at"] is None:
+            return False
+    return _ready_check is None or bool(_ready_check())
+
+
+def report():
+    with _lock:
+        state = {key: value for key, value in _state.items() if key != "steps"}
+        state["steps"] = dict(_state["steps"])
+    state["ready"] = is_ready()
+    return state
+
+
+def init_app(app, steps=(), enabled=False, budget_seconds=10.0, ready_check=None, background=True):
+    global _ready_check
+    _ready_check = ready_check
+
+    @app.route("/healthz/live")
+    def healthz_live():
+        return jsonify({"status": "ok"})
+
+    @app.route("/healthz/ready")
+    def healthz_ready():
+        state = report()
+        response = jsonify(state)
+        response.status_code = 200 if state["ready"] else 503
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    if not enabled:
+        return
+    with _lock:
+        _state["enabled"] = True
+    if background:
+        threading.Thread(target=run, args=(app, steps, budget_seconds), name="warmup-phase", daemon=True).start()
+    else:
+        run(app, steps, budget_seconds)
@@ -0,0 +1,65 @@
+"""Production entrypoint.
+
+    SNAPSHOT_DIR=/run/abc-snapshots gunicorn -c gunicorn.conf.py wsgi:app
+
+``gunicorn.conf.py`` sets ``preload_app``, so this module is imported once in
+the gunicorn master. ``preload()`` runs there before any worker forks:
+
+- it loads the host-wide CMS snapshot (``snapshots.SnapshotStore``; fetched only
+  when the published file is missing or older than
+  ``SNAPSHOT_REFRESH_SECONDS``),
+- it runs the warm-up steps (templates, homepage, catalog and related index,
+  gallery snapshot),
+- it calls ``gc.freeze()``, so the collector never touches, and so never
+  dirties, the pages holding this data in the workers.
+
+Workers start with everything in copy-on-write memory (the catalog itself is a
+shared read-only mapping) and make no CMS calls of their own. ``post_fork``
+gives each worker its own CMS session and cache connections (the master's
+pooled sockets must not be shared), and starts its snapshot refresher; only one
+per host fetches, and the others reload the published file when it changes.
+"""
+
+import gc
+import os
+
+import snapshots
+
+snapshots.PREFORK = True
+
+import app as webapp  # noqa: E402  (PREFORK must be set before the app module runs)
+import cache  # noqa: E402
+import metrics  # noqa: E402
+import strapi_client  # noqa: E402
+import warmup  # noqa: E402
+
+app = webapp.app
+
+
+def preload():
+    if webapp.snapshot_store is not None:
+        webapp.snapshot_store.load()
+    if warmup.report()["finished_at"] is None:
+        warmup.run(app, webapp.WARMUP_STEPS, webapp.WARMUP_BUDGET_SECONDS)
+
+    multiproc_dir = os.getenv("METRICS_MULTIPROC_DIR", "").strip()
+    if metrics.ENABLED and multiproc_dir:
+        # The master keeps its own file; workers start from zero (see post_fork).
+        metrics.REGISTRY.flush(multiproc_dir, force=True)
+
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork():
+    metrics.REGISTRY.reset()
+    # Keep-alive sockets opened by the master during preload must not be shared.
+    inherited = strapi_client.get_client()
+    strapi_client.set_client(strapi_client.StrapiClient.from_env())
+    inherited.close()
+    cache.get_cache().after_fork()
+    if webapp.snapshot_store is not None:
+        webapp.snapshot_store.start_refresher()
+
+
+preload()